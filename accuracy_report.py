@@ -0,0 +1,134 @@
+# accuracy_report.py (두 결과 디렉터리의 취약/비취약 판정 비교: --fast 모드 vs 전체 파이프라인)
+
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from run_manifest import RunManifest
+
+# 결과 파일의 status -> 판정 (True: 취약, False: 비취약, None: 판정 불가)
+VULNERABLE_STATUSES = ("vulnerable", "vulnerable_and_plan_generated", "vulnerable_and_patch_generated")
+NOT_VULNERABLE_STATUSES = ("not_vulnerable",)
+
+
+def load_verdicts(result_dir: str, ids: Iterable = None) -> Dict[str, Optional[bool]]:
+    """result_dir의 <ID>.json 결과 파일에서 ID별 판정을 읽습니다. ids가 주어지면 해당 ID만 읽습니다."""
+    if ids is None:
+        names = [name[:-len(".json")] for name in os.listdir(result_dir) if name.endswith(".json")]
+    else:
+        names = [str(record_id) for record_id in ids]
+
+    verdicts = {}
+    for name in names:
+        path = os.path.join(result_dir, f"{name}.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            status = json.load(f).get("status")
+        if status in VULNERABLE_STATUSES:
+            verdicts[name] = True
+        elif status in NOT_VULNERABLE_STATUSES:
+            verdicts[name] = False
+        else:
+            verdicts[name] = None
+    return verdicts
+
+
+def _mean_elapsed(result_dir: str, ids) -> Optional[float]:
+    """manifest.jsonl에 기록된 ID별 처리 시간(초)의 평균"""
+    manifest_path = os.path.join(result_dir, "manifest.jsonl")
+    if not os.path.exists(manifest_path):
+        return None
+    manifest = RunManifest(manifest_path)
+    elapsed = [entry["elapsed"] for entry in (manifest.get(record_id) for record_id in ids)
+               if entry and entry.get("status") == "done" and entry.get("elapsed") is not None]
+    return sum(elapsed) / len(elapsed) if elapsed else None
+
+
+def compare_result_dirs(reference_dir: str, candidate_dir: str, ids: Iterable = None) -> Dict[str, Any]:
+    """
+    reference_dir(전체 파이프라인)의 판정을 기준으로 candidate_dir(--fast 등)의 판정을 비교합니다.
+    두 디렉터리 모두 판정이 있는 ID만 집계하며, 취약을 양성(positive)으로 봅니다.
+    """
+    ids = None if ids is None else [str(record_id) for record_id in ids]
+    reference = load_verdicts(reference_dir, ids)
+    candidate = load_verdicts(candidate_dir, ids)
+    common = sorted((record_id for record_id in reference
+                     if reference[record_id] is not None and candidate.get(record_id) is not None),
+                    key=lambda record_id: (len(record_id), record_id))
+
+    matrix = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    disagreements = []
+    for record_id in common:
+        expected, actual = reference[record_id], candidate[record_id]
+        key = ("t" if expected == actual else "f") + ("p" if actual else "n")
+        matrix[key] += 1
+        if expected != actual:
+            disagreements.append({"id": record_id, "reference": expected, "candidate": actual})
+
+    total = len(common)
+    predicted_positive = matrix["tp"] + matrix["fp"]
+    actual_positive = matrix["tp"] + matrix["fn"]
+    reference_elapsed = _mean_elapsed(reference_dir, common)
+    candidate_elapsed = _mean_elapsed(candidate_dir, common)
+    return {
+        "reference_dir": reference_dir,
+        "candidate_dir": candidate_dir,
+        "compared": total,
+        "reference_only": sum(1 for record_id in reference if record_id not in candidate),
+        "candidate_only": sum(1 for record_id in candidate if record_id not in reference),
+        "undecided": sum(1 for verdicts in (reference, candidate) for verdict in verdicts.values() if verdict is None),
+        "confusion_matrix": matrix,
+        "accuracy": (matrix["tp"] + matrix["tn"]) / total if total else None,
+        "precision": matrix["tp"] / predicted_positive if predicted_positive else None,
+        "recall": matrix["tp"] / actual_positive if actual_positive else None,
+        "reference_mean_elapsed": reference_elapsed,
+        "candidate_mean_elapsed": candidate_elapsed,
+        "speedup": reference_elapsed / candidate_elapsed if reference_elapsed and candidate_elapsed else None,
+        "disagreements": disagreements,
+    }
+
+
+def _ratio(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    matrix = report["confusion_matrix"]
+    lines = [
+        f"판정 비교: {report['candidate_dir']} (후보) vs {report['reference_dir']} (기준)",
+        f"비교한 ID: {report['compared']}개 (기준에만 있음 {report['reference_only']}, 후보에만 있음 "
+        f"{report['candidate_only']}, 판정 불가 {report['undecided']})",
+        f"일치율(accuracy): {_ratio(report['accuracy'])}, precision: {_ratio(report['precision'])}, "
+        f"recall: {_ratio(report['recall'])}",
+        "                 기준 취약  기준 비취약",
+        f"  후보 취약      {matrix['tp']:>9}  {matrix['fp']:>11}",
+        f"  후보 비취약    {matrix['fn']:>9}  {matrix['tn']:>11}",
+    ]
+    if report["reference_mean_elapsed"] is not None and report["candidate_mean_elapsed"] is not None:
+        lines.append(f"ID당 평균 처리 시간: 기준 {report['reference_mean_elapsed']:.2f}초, "
+                     f"후보 {report['candidate_mean_elapsed']:.2f}초 (x{report['speedup']:.1f})")
+    if report["disagreements"]:
+        lines.append("불일치 ID: " + ", ".join(
+            f"{item['id']}({'취약' if item['candidate'] else '비취약'})" for item in report["disagreements"]))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='두 결과 디렉터리의 취약/비취약 판정을 비교합니다 (예: --fast 모드 vs 전체 파이프라인)')
+    parser.add_argument('--reference', default='./result/RAG', help='기준 결과 디렉터리 (기본값: ./result/RAG)')
+    parser.add_argument('--candidate', default='./result/Fast', help='비교할 결과 디렉터리 (기본값: ./result/Fast)')
+    parser.add_argument('--id-range', help='비교할 ID 범위 (예: "1-79"), 생략하면 두 디렉터리의 모든 결과')
+    parser.add_argument('--json', dest='json_path', help='비교 결과를 JSON으로 저장할 경로')
+    args = parser.parse_args()
+
+    id_list = None
+    if args.id_range:
+        start_id, end_id = (int(value) for value in args.id_range.split('-'))
+        id_list = range(start_id, end_id + 1)
+    report = compare_result_dirs(args.reference, args.candidate, id_list)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
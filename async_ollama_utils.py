@@ -0,0 +1,393 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import httpx
+from config import (
+    OLLAMA_HOSTS,
+    MODEL_NAME,
+    EMBEDDING_MODEL,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_BACKOFF_BASE,
+    OLLAMA_BACKOFF_MAX,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_MAX_INFLIGHT,
+    OLLAMA_EMBED_BATCH_SIZE,
+    OLLAMA_REQUEST_DEADLINE,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_HEALTH_CHECK_TIMEOUT,
+)
+from json_stream import StreamingJSONExtractor
+from ollama_pool import OllamaHostPool, HEALTH_CHECK_PATH, current_affinity, parse_tags
+
+
+class TransportStats:
+    """thread-safe per-endpoint counters (calls, retries, latency, bytes)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _entry(self, path):
+        return self._endpoints.setdefault(path, {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+        })
+
+    def record_retry(self, path):
+        with self._lock:
+            self._entry(path)["retries"] += 1
+
+    def record_call(self, path, latency, bytes_sent, bytes_received, error=False):
+        with self._lock:
+            entry = self._entry(path)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["total_latency"] += latency
+            entry["max_latency"] = max(entry["max_latency"], latency)
+            entry["bytes_sent"] += bytes_sent
+            entry["bytes_received"] += bytes_received
+
+    def record_generation(self, path, ttft, tokens, generation_time, early_stop=False):
+        """record time-to-first-token and token throughput of one streamed generation"""
+        with self._lock:
+            entry = self._entry(path)
+            entry["generations"] = entry.get("generations", 0) + 1
+            entry["early_stops"] = entry.get("early_stops", 0) + int(early_stop)
+            entry["total_ttft"] = entry.get("total_ttft", 0.0) + (ttft or 0.0)
+            entry["generated_tokens"] = entry.get("generated_tokens", 0) + tokens
+            entry["generation_time"] = entry.get("generation_time", 0.0) + generation_time
+
+    def snapshot(self):
+        """return a copy of the counters with the average latency (and ttft / tokens-per-sec) filled in"""
+        with self._lock:
+            result = {}
+            for path, entry in self._endpoints.items():
+                item = dict(entry)
+                item["avg_latency"] = item["total_latency"] / item["calls"] if item["calls"] else 0.0
+                if item.get("generations"):
+                    item["avg_ttft"] = item["total_ttft"] / item["generations"]
+                    item["tokens_per_sec"] = (item["generated_tokens"] / item["generation_time"]
+                                              if item["generation_time"] else 0.0)
+                result[path] = item
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+# 스트림 마지막(done) 메시지에 포함되는 서버 측 통계 (duration 단위는 ns)
+SERVER_STAT_FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+                      "load_duration", "total_duration")
+
+
+def generation_metrics(started, first_token_at, ended, streamed_tokens, final_stats, early_stop):
+    """TTFT, tokens/sec 등 생성 지표를 계산합니다. 서버가 보고한 eval_count/eval_duration이 있으면 우선 사용합니다."""
+    eval_count = final_stats.get("eval_count")
+    eval_duration = final_stats.get("eval_duration")
+    if eval_count and eval_duration:
+        tokens, generation_time = eval_count, eval_duration / 1e9
+    else:
+        tokens = streamed_tokens
+        generation_time = ended - first_token_at if first_token_at is not None else 0.0
+    metrics = {
+        "ttft": first_token_at - started if first_token_at is not None else None,
+        "tokens": tokens,
+        "generation_time": generation_time,
+        "tokens_per_sec": tokens / generation_time if generation_time else 0.0,
+        "early_stop": early_stop,
+    }
+    for key in SERVER_STAT_FIELDS:
+        metrics[key] = final_stats.get(key)
+    return metrics
+
+
+class AsyncOllamaClient:
+    """
+    httpx.AsyncClient 기반 비동기 Ollama 클라이언트.
+    호스트별로 연결 풀을 두고, 요청마다 OllamaHostPool에서 진행 중인 요청이 가장 적은 정상 호스트
+    (요청한 모델이 설치된 호스트)를 고르며, 재시도 시 다른 호스트로 넘어갑니다.
+    deadline(초)은 동시 요청 슬롯을 얻은 시점부터 재시도를 포함한 요청 전체에 적용되며, 취소(CancelledError)는 그대로 전파됩니다.
+    동기 OllamaClient도 OllamaTransport를 통해 이 클라이언트를 백그라운드 이벤트 루프에서 사용합니다.
+    """
+
+    def __init__(self, hosts=None, model=MODEL_NAME, embedding_model=EMBEDDING_MODEL,
+                 connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout=OLLAMA_READ_TIMEOUT,
+                 max_retries=OLLAMA_MAX_RETRIES,
+                 backoff_base=OLLAMA_BACKOFF_BASE,
+                 backoff_max=OLLAMA_BACKOFF_MAX,
+                 pool_size=OLLAMA_POOL_SIZE,
+                 max_inflight=OLLAMA_MAX_INFLIGHT,
+                 deadline=OLLAMA_REQUEST_DEADLINE,
+                 keep_alive=OLLAMA_KEEP_ALIVE,
+                 pool=None):
+        self.pool = pool or OllamaHostPool(hosts or OLLAMA_HOSTS)
+        self.hosts = self.pool.urls
+        self.model = model
+        self.embedding_model = embedding_model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.keep_alive = keep_alive
+        self.stats = TransportStats()
+        self.set_max_inflight(max_inflight)
+        self._health_timeout = httpx.Timeout(OLLAMA_HEALTH_CHECK_TIMEOUT, connect=connect_timeout)
+        self._health_task = None
+        self._health_checked = False
+
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._clients = {host: httpx.AsyncClient(base_url=host, timeout=timeout, limits=limits) for host in self.hosts}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._health_task is not None and not self._health_task.done():
+            self._health_task.cancel()
+        for client in self._clients.values():
+            await client.aclose()
+
+    def set_max_inflight(self, max_inflight):
+        """limit concurrent requests to the server (call before issuing requests)"""
+        self.max_inflight = max_inflight
+        self._semaphore = asyncio.Semaphore(max_inflight)
+
+    def _backoff_delay(self, attempt):
+        """full-jitter exponential backoff"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    async def _backoff(self, attempt):
+        await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def _with_deadline(self, coro, deadline):
+        deadline = self.deadline if deadline is None else deadline
+        if deadline:
+            return await asyncio.wait_for(coro, deadline)
+        return await coro
+
+    async def check_health(self):
+        """
+        헬스 체크 주기가 지난 호스트에 GET /api/tags를 동시에 보내 상태와 설치된 모델 목록을 갱신합니다.
+        첫 체크는 모든 요청이 기다리고(모델별 라우팅에 필요), 이후 주기적인 체크는 백그라운드에서 수행합니다.
+        """
+        async def probe(endpoint):
+            try:
+                response = await self._clients[endpoint.url].get(HEALTH_CHECK_PATH, timeout=self._health_timeout)
+            except httpx.TransportError as e:
+                self.pool.record_health(endpoint, error=e)
+                return
+            try:
+                models = parse_tags(response.json()) if response.status_code == 200 else None
+            except ValueError:
+                models = None
+            self.pool.record_health(endpoint, models)
+
+        if self._health_task is None or self._health_task.done():
+            due = self.pool.due_for_check()
+            if due:
+                self._health_task = asyncio.ensure_future(asyncio.gather(*(probe(endpoint) for endpoint in due)))
+        if not self._health_checked and self._health_task is not None:
+            await asyncio.shield(self._health_task)
+            self._health_checked = True
+
+    async def _request(self, path, body, consume, deadline=None):
+        """
+        동시 요청 슬롯(max_inflight)을 얻은 뒤 재시도 루프를 실행합니다.
+        deadline은 슬롯을 기다린 시간을 빼고, 슬롯을 얻은 시점부터 재시도를 포함한 요청 전체에 적용됩니다.
+        """
+        async with self._semaphore:
+            await self.check_health()
+            return await self._with_deadline(self._attempts(path, body, consume), deadline)
+
+    async def _attempts(self, path, body, consume):
+        """
+        재시도 루프. consume(response)는 응답 본문을 읽어 (결과, 수신 바이트 수)를 반환합니다.
+        5xx 응답과 연결 오류는 (가능하면) 다른 호스트로 넘어가 재시도합니다.
+        """
+        payload = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        attempt = 0
+        failed_hosts = set()
+        while True:
+            endpoint = self.pool.acquire(body.get("model"), exclude=failed_hosts, affinity=current_affinity())
+            client = self._clients[endpoint.url]
+            started = time.perf_counter()
+            error = None
+            try:
+                async with client.stream("POST", path, content=payload, headers=headers) as response:
+                    if response.status_code >= 500 and attempt < self.max_retries:
+                        body_bytes = await response.aread()
+                        self.stats.record_call(path, time.perf_counter() - started, len(payload),
+                                               len(body_bytes), error=True)
+                        error = Exception(f"HTTP {response.status_code}")
+                    elif response.status_code != 200:
+                        body_bytes = await response.aread()
+                        self.stats.record_call(path, time.perf_counter() - started, len(payload),
+                                               len(body_bytes), error=True)
+                        if response.status_code >= 500:
+                            error = Exception(f"HTTP {response.status_code}")
+                        raise Exception(f"Error from {client.base_url}{path}: {body_bytes.decode('utf-8', 'replace')}")
+                    else:
+                        result, received = await consume(response)
+                        self.stats.record_call(path, time.perf_counter() - started, len(payload), received)
+                        return result
+            except httpx.TransportError as e:
+                error = e
+                self.stats.record_call(path, time.perf_counter() - started, len(payload), 0, error=True)
+                if attempt >= self.max_retries:
+                    raise
+            finally:
+                self.pool.release(endpoint, error)
+
+            failed_hosts.add(endpoint.url)
+            self.stats.record_retry(path)
+            await self._backoff(attempt)
+            attempt += 1
+
+    @staticmethod
+    async def _read_json(response):
+        content = await response.aread()
+        return json.loads(content), len(content)
+
+    async def generate_embedding(self, text, deadline=None):
+        """generate embedding for text"""
+        result = await self._request("/api/embeddings", {
+            "model": self.embedding_model,
+            "prompt": text
+        }, self._read_json, deadline)
+        return result['embedding']
+
+    async def generate_embeddings(self, texts, batch_size=OLLAMA_EMBED_BATCH_SIZE, deadline=None):
+        """generate embeddings for many texts via /api/embed; chunks are sent concurrently"""
+        texts = list(texts)
+        chunks = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+
+        async def embed_chunk(chunk):
+            result = await self._request("/api/embed", {
+                "model": self.embedding_model,
+                "input": chunk
+            }, self._read_json, deadline)
+            if len(result['embeddings']) != len(chunk):
+                raise Exception(f"Error generating embeddings: expected {len(chunk)} vectors, got {len(result['embeddings'])}")
+            return result['embeddings']
+
+        results = await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+        return [embedding for chunk in results for embedding in chunk]
+
+    @staticmethod
+    def _stream_collector(extract):
+        # done 메시지 뒤에는 chunked 종료 표시만 남으므로 break하지 않고 끝까지 읽어야 연결이 풀로 돌아간다
+        async def consume(response):
+            parts = []
+            received = 0
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                received += len(line) + 1
+                parts.append(extract(json.loads(line)))
+            return "".join(parts), received
+        return consume
+
+    async def generate_completion(self, prompt, context=None, temperature=0.0, deadline=None, model=None):
+        """generate text completion"""
+        body = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "temperature": temperature,
+        }
+        if context:
+            body["context"] = context
+        if self.keep_alive != "":
+            body["keep_alive"] = self.keep_alive
+        return await self._request("/api/generate", body, self._stream_collector(lambda r: r.get('response', '')),
+                                   deadline)
+
+    async def generate_json(self, prompt, context=None, temperature=0.0, stop_on_json=True, deadline=None, format=None,
+                            model=None):
+        """
+        stream a completion and stop as soon as a complete top-level JSON object has arrived
+        (<think> blocks are skipped). returns (parsed dict or None, raw text received, metrics).
+        with stop_on_json=False the whole generation is read and the first object is still parsed.
+        format is passed to Ollama as-is ("json" or a JSON schema dict for structured output).
+        model overrides the client's default model (per-stage routing).
+        """
+        body = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "temperature": temperature,
+        }
+        if context:
+            body["context"] = context
+        if format:
+            body["format"] = format
+        if self.keep_alive != "":
+            body["keep_alive"] = self.keep_alive
+
+        async def consume(response):
+            started = time.perf_counter()
+            extractor = StreamingJSONExtractor()
+            parts = []
+            received = 0
+            first_token_at = None
+            finished = True
+            final_stats = {}
+            # 조기 종료(break)하면 연결을 닫아 Ollama가 생성을 중단하고, 끝까지 읽으면 연결을 재사용한다
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                received += len(line) + 1
+                json_response = json.loads(line)
+                text = json_response.get('response', '')
+                if text:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(text)
+                    if extractor.feed(text) and stop_on_json and not json_response.get('done', False):
+                        finished = False
+                        break
+                if json_response.get('done', False):
+                    final_stats = {key: json_response.get(key) for key in SERVER_STAT_FIELDS}
+
+            metrics = generation_metrics(started, first_token_at, time.perf_counter(), len(parts),
+                                         final_stats, early_stop=not finished)
+            tokens, generation_time = metrics["tokens"], metrics["generation_time"]
+            self.stats.record_generation("/api/generate", metrics["ttft"], tokens, generation_time, not finished)
+            parsed = extractor.finish()
+            metrics["json_repaired"] = extractor.repaired
+            return (parsed, "".join(parts), metrics), received
+
+        return await self._request("/api/generate", body, consume, deadline)
+
+    async def chat(self, messages, temperature=0.7, deadline=None, model=None):
+        """perform chat-style conversation"""
+        body = {
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if self.keep_alive != "":
+            body["keep_alive"] = self.keep_alive
+        return await self._request(
+            "/api/chat", body, self._stream_collector(lambda r: r.get('message', {}).get('content', '')), deadline)
+
+    def get_stats(self):
+        return self.stats.snapshot()
+
+    def get_host_stats(self):
+        return self.pool.snapshot()
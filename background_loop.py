@@ -0,0 +1,61 @@
+# background_loop.py (동기 API가 비동기 구현을 실행하는 백그라운드 이벤트 루프)
+
+import asyncio
+import threading
+from typing import Any, Awaitable
+
+
+class BackgroundLoop:
+    """
+    데몬 스레드에서 계속 실행되는 asyncio 이벤트 루프 (처음 사용할 때 시작).
+    동기 API(OllamaClient, VulRAG, VulnerabilityProcessor)는 비동기 구현의 코루틴을 이 루프에 넘기고 결과를 기다리므로,
+    여러 스레드에서 동시에 호출해도 LLM 요청은 하나의 루프와 연결 풀에서 처리됩니다.
+    호출한 스레드의 contextvars(trace span, 호스트 affinity, 샘플별 로그)는 코루틴에 그대로 전달됩니다.
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self._name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def is_current(self) -> bool:
+        """현재 스레드가 이 루프의 스레드이면 True"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """코루틴을 루프에서 실행하고 결과를 반환합니다 (예외는 그대로 전파)."""
+        loop = self._ensure_started()
+        if self.is_current():
+            coro.close()
+            raise RuntimeError("백그라운드 이벤트 루프 안에서는 동기 API를 호출할 수 없습니다 (비동기 API를 await 하세요)")
+        # call_soon_threadsafe가 호출한 스레드의 contextvars를 복사하므로 태스크도 같은 컨텍스트에서 실행된다
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result()
+        except BaseException:
+            # KeyboardInterrupt 등으로 기다림을 멈추면 코루틴도 취소 (이미 끝났으면 아무 일도 없음)
+            future.cancel()
+            raise
+
+
+_default_loop = BackgroundLoop()
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """프로세스 공용 백그라운드 이벤트 루프에서 코루틴을 실행하고 결과를 기다립니다."""
+    return _default_loop.run(coro)
+
+
+def in_background_loop() -> bool:
+    """현재 코드가 공용 백그라운드 이벤트 루프에서 실행 중이면 True"""
+    return _default_loop.is_current()
@@ -0,0 +1,88 @@
+# batch_utils.py (대량 처리 보조 유틸리티)
+
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+def atomic_write_json(path: str, data) -> str:
+    """
+    임시 파일에 먼저 쓴 뒤 os.replace로 교체하여, 중단되더라도 반쪽짜리 결과 파일이 남지 않도록 합니다.
+    기록한 내용의 sha256 해시를 반환합니다.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    content = json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return hashlib.sha256(content).hexdigest()
+
+
+class _TaskRoutedStream(io.TextIOBase):
+    """현재 작업(스레드 또는 asyncio 태스크)의 버퍼가 설정되어 있으면 그곳으로, 아니면 원래 스트림으로 출력을 보냅니다."""
+
+    def __init__(self, target, buffer_var):
+        self._target = target
+        self._buffer_var = buffer_var
+
+    def write(self, text):
+        buffer = self._buffer_var.get()
+        if buffer is not None:
+            return buffer.write(text)
+        return self._target.write(text)
+
+    def flush(self):
+        if self._buffer_var.get() is None:
+            self._target.flush()
+
+
+class OrderedTaskOutput:
+    """
+    워커 스레드나 asyncio 태스크가 출력하는 로그를 작업(ID) 단위로 모았다가, 작업이 끝나면 한 번에 출력합니다.
+    버퍼는 ContextVar에 두므로 asyncio.to_thread로 넘긴 작업의 출력도 호출한 태스크의 버퍼로 모입니다.
+    여러 ID를 동시에 처리해도 각 ID의 로그가 서로 섞이지 않습니다.
+    """
+
+    def __init__(self):
+        self._buffer_var = ContextVar("task_output_buffer", default=None)
+        self._print_lock = threading.Lock()
+        self._original_stdout = None
+        self._original_stderr = None
+
+    def __enter__(self):
+        self._original_stdout, self._original_stderr = sys.stdout, sys.stderr
+        sys.stdout = _TaskRoutedStream(self._original_stdout, self._buffer_var)
+        sys.stderr = _TaskRoutedStream(self._original_stderr, self._buffer_var)
+        return self
+
+    def __exit__(self, *exc):
+        sys.stdout, sys.stderr = self._original_stdout, self._original_stderr
+        return False
+
+    @contextmanager
+    def capture(self):
+        """현재 작업의 출력을 버퍼에 모으고, 블록이 끝나면 원래 stdout에 한 번에 기록합니다."""
+        buffer = io.StringIO()
+        token = self._buffer_var.set(buffer)
+        try:
+            yield
+        finally:
+            self._buffer_var.reset(token)
+            text = buffer.getvalue()
+            with self._print_lock:
+                self._original_stdout.write(text)
+                self._original_stdout.flush()
@@ -0,0 +1,766 @@
+# benchmark.py (결정적인 로컬 Ollama 대역 서버 + 내장 검색 인덱스로 파이프라인 성능/탐지 정확도 측정, 결과 디렉터리 비교)
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from accuracy_report import compare_result_dirs, load_verdicts
+from dataset_loader import get_dataset
+from embedding_reducer import get_embedding_reducer
+from log_utils import configure_logging
+from ollama_stub import OllamaResponder, OllamaStubServer
+from ollama_utils import OllamaClient, OllamaTransport
+from process import VulnerabilityProcessor
+from rag import VulRAG
+from run_manifest import RunManifest
+from start import process_single_id, run_batch_async
+from tracing import TraceProfile
+from vector_store import EmbeddedKnowledgeIndex, build_embedded_index, tokenize
+from config import MODEL_NAME, EMBEDDING_MODEL, STAGE_MODELS, RETRIEVAL_MODE
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_MODES = ("rag", "no-rag", "fast")
+DEFAULT_LABEL_KEY = "vulnerable"
+STUB_EMBEDDING_DIM = 64
+
+# 대역 서버가 취약하다고 판단하는 코드 패턴: (유형, 정규식, 설명)
+_SINKS = (
+    ("sql_injection", re.compile(r'(?i)"\s*(?:SELECT|INSERT|UPDATE|DELETE)\b[^"]*"\s*\+'),
+     "SQL injection: user input is concatenated into the SQL query string."),
+    ("injection", re.compile(r'\.exec\s*\((?!\s*"[^"]*"\s*\))'),
+     "OS command injection: a non-constant command is passed to Runtime.exec."),
+    ("path_traversal", re.compile(r'new\s+File(?:InputStream|OutputStream|Reader|Writer)?\s*\([^;]*\+'),
+     "Path traversal: a file path is built from unvalidated input."),
+    ("deserialization", re.compile(r'\.readObject\s*\('),
+     "Insecure deserialization: untrusted data is deserialized with ObjectInputStream."),
+)
+_API_HINTS = (
+    (re.compile(r'executeQuery|prepareStatement|createStatement'), "query a database"),
+    (re.compile(r'\bexec\s*\(|ProcessBuilder'), "run an operating system command"),
+    (re.compile(r'\bFile\b|Paths\.get'), "read a file"),
+    (re.compile(r'ObjectInputStream|readValue'), "deserialize an object"),
+)
+_METHOD = re.compile(r'^\s*(?:(?:public|private|protected|static|final|synchronized)\s+)*[\w<>\[\],\s]+?\s+(\w+)\s*\([^;]*$')
+_CLASS = re.compile(r'\b(?:class|interface|enum)\s+(\w+)')
+_CONCATENATED = re.compile(r'\+\s*(\w+)')
+_SQL_LITERAL_CONCAT = re.compile(r"'\"\s*\+\s*(\w+)\s*\+\s*\"'")
+# 각 단계 프롬프트에서 CODE_PREFIX의 코드 다음에 오는 부분의 시작 (prompt.py)
+_PROMPT_CODE_ENDS = ("\n[Previously Analyzed Functional Semantics]", "\n[Reference Vulnerability Information]",
+                     "\n[Vulnerability Analysis]", "\nYou are a system that converts", "\nYour SOLE task")
+
+
+def extract_prompt_code(prompt: str) -> str:
+    """단계 프롬프트(CODE_PREFIX + 지시문)에서 분석 대상 코드를 꺼냅니다."""
+    start = prompt.find("[Code]\n")
+    if start == -1:
+        return prompt
+    start += len("[Code]\n")
+    ends = [index for index in (prompt.find(marker, start) for marker in _PROMPT_CODE_ENDS) if index != -1]
+    return prompt[start:min(ends) if ends else len(prompt)].rstrip("\n")
+
+
+def find_vulnerabilities(code: str) -> List[Dict[str, Any]]:
+    """_SINKS에 해당하는 줄 목록 [{"line", "kind", "text", "reason"}] (줄 번호는 1부터)"""
+    findings = []
+    for number, line in enumerate(code.split("\n"), start=1):
+        stripped = line.strip()
+        if stripped.startswith(("//", "*", "/*")):
+            continue
+        for kind, pattern, reason in _SINKS:
+            if pattern.search(line):
+                findings.append({"line": number, "kind": kind, "text": line, "reason": reason})
+                break
+    return findings
+
+
+class DeterministicOllama(OllamaResponder):
+    """
+    같은 프롬프트에는 항상 같은 응답을 돌려주는 Ollama 대역 응답기.
+    - 단계(의미 추출/분석/수리/--fast 통합)는 요청의 format 스키마(없으면 프롬프트 내용)로 구분합니다.
+    - 분석은 코드에서 _SINKS 패턴을 찾아 취약 줄을 보고하고, 수리는 그 줄에 대해 적용 가능/구문 오류/중복/범위 밖
+      후보가 섞인 10개의 연산을 만듭니다 (후보 평가 단계까지 실행되도록).
+    - error_rate 비율의 코드(코드 해시로 결정)는 판정을 뒤집어 탐지 지표가 실제처럼 100%가 아니게 합니다.
+    - 임베딩은 토큰 해시 bag-of-words라 같은 단어를 공유하는 텍스트끼리 가깝습니다.
+    """
+
+    def __init__(self, error_rate: float = 0.0, embedding_dim: int = STUB_EMBEDDING_DIM):
+        self.error_rate = error_rate
+        self.embedding_dim = embedding_dim
+
+    def models(self) -> Optional[List[str]]:
+        return sorted({MODEL_NAME, EMBEDDING_MODEL, *STAGE_MODELS.values()})
+
+    @staticmethod
+    def _stage(body: Dict[str, Any]) -> str:
+        schema = body.get("format")
+        keys = set(schema.get("properties", {})) if isinstance(schema, dict) else set()
+        prompt = str(body.get("prompt", ""))
+        if "repair_operations" in keys or (not keys and '"repair_operations"' in prompt):
+            return "repair"
+        if "vulnerable_sections" in keys:
+            return "fast" if "purpose" in keys else "analysis"
+        if not keys and '"vulnerable_sections"' in prompt:
+            return "fast" if '"purpose"' in prompt else "analysis"
+        return "semantics"
+
+    def _flipped(self, code: str) -> bool:
+        if self.error_rate <= 0:
+            return False
+        digest = hashlib.blake2b(code.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64 < self.error_rate
+
+    def _findings(self, code: str) -> List[Dict[str, Any]]:
+        findings = find_vulnerabilities(code)
+        if not self._flipped(code):
+            return findings
+        if findings:
+            return []
+        # 오탐: 첫 번째 실행문을 SQL injection으로 보고
+        lines = code.split("\n")
+        number = next((idx for idx, line in enumerate(lines, start=1) if line.strip().endswith(";")), 1)
+        return [{"line": number, "kind": "sql_injection", "text": lines[number - 1], "reason": _SINKS[0][2]}]
+
+    @staticmethod
+    def _semantics(code: str) -> Dict[str, Any]:
+        methods = [match.group(1) for match in map(_METHOD.match, code.split("\n")) if match]
+        owner = _CLASS.search(code)
+        hints = [hint for pattern, hint in _API_HINTS if pattern.search(code)]
+        subject = f"{owner.group(1)}.{methods[0]}" if owner and methods else (methods[0] if methods else "the code")
+        return {
+            "purpose": f"To {' and '.join(hints) or 'process input data'} in {subject}.",
+            "behavior": f"It defines {len(methods)} method(s) over {len(code.splitlines())} lines"
+                        f"{' and ' + ', '.join(hints) if hints else ''}.",
+        }
+
+    @staticmethod
+    def _analysis(findings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if not findings:
+            return {"analysis_summary": "No vulnerability was found in the code.", "severity": "Not Vulnerable",
+                    "vulnerable_sections": []}
+        kinds = sorted({finding["kind"].replace("_", " ") for finding in findings})
+        return {
+            "analysis_summary": f"The code is vulnerable to {', '.join(kinds)}.",
+            "severity": "High",
+            "vulnerable_sections": [{"vulnerable_lines": f"{finding['line']}-{finding['line']}",
+                                     "code_snippet": finding["text"].strip(), "reason": finding["reason"]}
+                                    for finding in findings],
+        }
+
+    @staticmethod
+    def _repair(code: str, findings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        lines = code.split("\n")
+        finding = findings[0] if findings else {"line": 1, "kind": "", "text": lines[0]}
+        number, text = finding["line"], finding["text"]
+        indent = text[:len(text) - len(text.lstrip())]
+        variable = (_CONCATENATED.findall(text) or ["input"])[0]
+        sanitized = _CONCATENATED.sub(lambda m: f"+ sanitize({m.group(1)})", text)
+        fixed = _SQL_LITERAL_CONCAT.sub("?", text) if finding["kind"] == "sql_injection" else sanitized
+        operations = [
+            {"type": "Update", "line_number": number, "code_to_update": fixed, "complexity": 3},
+            {"type": "Update", "line_number": number, "code_to_update": sanitized, "complexity": 2},
+            {"type": "Insert", "line_number": number, "complexity": 2,
+             "code_to_add": f'{indent}if ({variable} == null) {{ throw new IllegalArgumentException("invalid input"); }}'},
+            {"type": "Insert", "line_number": number, "code_to_add": f"{indent}if (!isValid({variable})) {{", "complexity": 4},
+            {"type": "Update", "line_number": number, "code_to_update": fixed, "complexity": 5},
+            {"type": "Delete", "line_number": number, "code_to_delete": text.strip(), "complexity": 1},
+            {"type": "Update", "line_number": len(lines) + 1000, "code_to_update": fixed, "complexity": 2},
+            {"type": "Insert", "line_number": number, "code_to_add": f"{indent}// TODO: validate {variable}", "complexity": 1},
+            {"type": "Update", "line_number": f"Line {number}", "code_to_update": f"{fixed} // fixed", "complexity": 3},
+            {"type": "Insert", "line_number": number + 1, "code_to_add": f'{indent}audit("{variable}");', "complexity": 1},
+        ]
+        return {"repair_operations": operations}
+
+    def generate(self, body: Dict[str, Any]) -> str:
+        stage = self._stage(body)
+        code = extract_prompt_code(str(body.get("prompt", "")))
+        if stage == "semantics":
+            result = self._semantics(code)
+        elif stage == "analysis":
+            result = self._analysis(self._findings(code))
+        elif stage == "fast":
+            result = dict(self._semantics(code), **self._analysis(self._findings(code)))
+        else:
+            result = self._repair(code, self._findings(code))
+        return json.dumps(result)
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = np.zeros(self.embedding_dim, dtype=np.float32)
+            for token in tokenize(text):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest()
+                vector[int.from_bytes(digest[:3], "big") % self.embedding_dim] += 1.0 if digest[3] & 1 else -1.0
+            vectors.append(vector.tolist())
+        return vectors
+
+
+# --- 합성 데이터셋 / 지식 베이스 ---
+
+_VULNERABLE_TEMPLATES = {
+    "sql_injection": """public class UserDao{i} {{
+    private Connection connection;
+
+    public ResultSet findUser(String name) throws SQLException {{
+        Statement statement = connection.createStatement();
+        String query = "SELECT * FROM users WHERE name = '" + name + "'";
+        return statement.executeQuery(query);
+    }}
+}}""",
+    "injection": """public class NetworkTool{i} {{
+    public int ping(String host) throws IOException, InterruptedException {{
+        Process process = Runtime.getRuntime().exec("ping -c 1 " + host);
+        return process.waitFor();
+    }}
+}}""",
+    "path_traversal": """public class FileService{i} {{
+    private final String baseDir = "/var/data";
+
+    public byte[] read(String fileName) throws IOException {{
+        FileInputStream input = new FileInputStream(baseDir + "/" + fileName);
+        return input.readAllBytes();
+    }}
+}}""",
+    "deserialization": """public class SessionLoader{i} {{
+    public Object load(InputStream input) throws IOException, ClassNotFoundException {{
+        ObjectInputStream stream = new ObjectInputStream(input);
+        return stream.readObject();
+    }}
+}}""",
+}
+
+_SAFE_TEMPLATES = {
+    "sql_injection": """public class UserDao{i} {{
+    private Connection connection;
+
+    public ResultSet findUser(String name) throws SQLException {{
+        PreparedStatement statement = connection.prepareStatement("SELECT * FROM users WHERE name = ?");
+        statement.setString(1, name);
+        return statement.executeQuery();
+    }}
+}}""",
+    "injection": """public class NetworkTool{i} {{
+    public int ping(String host) throws IOException, InterruptedException {{
+        Process process = new ProcessBuilder("ping", "-c", "1", validateHost(host)).start();
+        return process.waitFor();
+    }}
+}}""",
+    "path_traversal": """public class FileService{i} {{
+    private final Path baseDir = Paths.get("/var/data");
+
+    public byte[] read(String fileName) throws IOException {{
+        Path path = baseDir.resolve(fileName).normalize();
+        if (!path.startsWith(baseDir)) {{
+            throw new SecurityException("invalid path");
+        }}
+        return Files.readAllBytes(path);
+    }}
+}}""",
+    "deserialization": """public class SessionLoader{i} {{
+    private final ObjectMapper mapper = new ObjectMapper();
+
+    public Session load(InputStream input) throws IOException {{
+        return mapper.readValue(input, Session.class);
+    }}
+}}""",
+}
+
+_FILLER_METHOD = """
+    public int helper{j}(int value) {{
+        int result = value * {j};
+        if (result > 100) {{
+            result -= {j};
+        }}
+        return result;
+    }}
+"""
+
+_KNOWLEDGE = (
+    ("CVE-STUB-0001", "sql_injection", "query a database with user supplied names",
+     "SQL query built by concatenating untrusted input into the query string", "Use PreparedStatement with bound parameters"),
+    ("CVE-STUB-0002", "injection", "run an operating system command such as ping",
+     "Operating system command built from untrusted input and executed with Runtime exec",
+     "Use ProcessBuilder with a fixed argument list and validate the input"),
+    ("CVE-STUB-0003", "path_traversal", "read a file from a base directory",
+     "File path built from untrusted input allows directory traversal outside the base directory",
+     "Normalize the resolved path and check that it stays under the base directory"),
+    ("CVE-STUB-0004", "deserialization", "deserialize an object from a stream",
+     "Untrusted data is deserialized with ObjectInputStream readObject",
+     "Use a data format such as JSON or an ObjectInputFilter allow list"),
+)
+
+
+def make_synthetic_dataset(samples: int, vulnerable_ratio: float = 0.5, large_every: int = 10) -> List[Dict[str, Any]]:
+    """
+    start.py 형식의 합성 데이터셋 (id, files[0].code_before, vulnerable, kind).
+    large_every번째마다 메소드가 많은 큰 파일을 만들어 메소드 단위 청킹 경로도 측정합니다 (0이면 만들지 않음).
+    """
+    kinds = list(_VULNERABLE_TEMPLATES)
+    records = []
+    for record_id in range(1, samples + 1):
+        kind = kinds[(record_id - 1) % len(kinds)]
+        # 앞에서부터 비율을 맞추도록 결정적으로 배치 (예: 0.5이면 홀수 ID가 취약)
+        vulnerable = int(record_id * vulnerable_ratio) != int((record_id - 1) * vulnerable_ratio)
+        code = (_VULNERABLE_TEMPLATES if vulnerable else _SAFE_TEMPLATES)[kind].format(i=record_id)
+        if large_every and record_id % large_every == 0:
+            fillers = "".join(_FILLER_METHOD.format(j=j) for j in range(1, 40))
+            code = code[:code.rindex("}")] + fillers + "}"
+        records.append({"id": record_id, "vulnerable": vulnerable, "kind": kind, "files": [{"code_before": code}]})
+    return records
+
+
+def write_dataset(records: List[Dict[str, Any]], path: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+
+def build_stub_index(index_dir: str, responder: DeterministicOllama) -> EmbeddedKnowledgeIndex:
+    """대역 응답기의 임베딩으로 합성 지식 베이스의 내장 검색 인덱스를 만듭니다 (ES 대신 사용)."""
+    documents = []
+    for cve_id, kind, purpose, cause, solution in _KNOWLEDGE:
+        metadata = {
+            "cve_id": cve_id,
+            "functional_semantics": {"purpose": f"To {purpose}.", "behavior": f"It uses {kind.replace('_', ' ')} prone APIs."},
+            "vulnerability_causes": {"abstract_description": cause},
+            "fixing_solutions": {"abstract_description": solution},
+        }
+        text = f"CVE ID: {cve_id}\n목적: {purpose}\n취약점 원인: {cause}\n해결 방안: {solution}"
+        documents.append((cve_id, text, metadata))
+    vectors = get_embedding_reducer().transform(np.asarray(responder.embed([text for _, text, _ in documents], ""),
+                                                           dtype=np.float32))
+    build_embedded_index(((doc_id, text, metadata, vector) for (doc_id, text, metadata), vector
+                          in zip(documents, vectors)), index_dir=index_dir)
+    return EmbeddedKnowledgeIndex(index_dir)
+
+
+# --- 실행 / 보고서 ---
+
+def load_labels(json_path: str, ids: Iterable, label_key: str = DEFAULT_LABEL_KEY,
+                labels_path: str = None) -> Dict[str, bool]:
+    """ID별 정답(취약 여부). labels_path(JSON {id: bool})가 있으면 그것을, 없으면 데이터셋 레코드의 label_key를 사용합니다."""
+    if labels_path:
+        with open(labels_path, "r", encoding="utf-8") as f:
+            return {str(key): bool(value) for key, value in json.load(f).items()}
+    dataset = get_dataset(json_path)
+    labels = {}
+    for record_id in ids:
+        record = dataset.get(record_id)
+        if record is not None and isinstance(record.get(label_key), bool):
+            labels[str(record_id)] = record[label_key]
+    return labels
+
+
+def detection_metrics(result_dir: str, labels: Dict[str, bool]) -> Dict[str, Any]:
+    """결과 파일의 판정을 정답과 비교한 혼동 행렬과 accuracy / precision / recall / F1"""
+    verdicts = load_verdicts(result_dir, labels.keys())
+    matrix = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    undecided, errors = 0, []
+    for record_id, expected in labels.items():
+        actual = verdicts.get(record_id)
+        if actual is None:
+            undecided += 1
+            continue
+        matrix[("t" if expected == actual else "f") + ("p" if actual else "n")] += 1
+        if expected != actual:
+            errors.append({"id": record_id, "expected": expected, "actual": actual})
+    decided = sum(matrix.values())
+    precision = matrix["tp"] / (matrix["tp"] + matrix["fp"]) if matrix["tp"] + matrix["fp"] else None
+    recall = matrix["tp"] / (matrix["tp"] + matrix["fn"]) if matrix["tp"] + matrix["fn"] else None
+    return {
+        "labeled": len(labels),
+        "undecided": undecided,
+        "confusion_matrix": matrix,
+        "accuracy": (matrix["tp"] + matrix["tn"]) / decided if decided else None,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision and recall else None,
+        "errors": errors,
+    }
+
+
+def _result_statuses(result_dir: str, ids: Iterable) -> Counter:
+    statuses = Counter()
+    for record_id in ids:
+        path = os.path.join(result_dir, f"{record_id}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                statuses[json.load(f).get("status")] += 1
+        else:
+            statuses["missing"] += 1
+    return statuses
+
+
+def _token_totals(stages: Dict[str, Dict[str, Any]], server: OllamaStubServer = None) -> Dict[str, Any]:
+    """
+    토큰 수는 LLM을 호출한 단계 span에 누적되므로 루트(analysis_pipeline)를 제외하고 합산합니다.
+    스트림을 조기 종료(LLM_STREAM_EARLY_STOP)하면 prompt_eval_count가 담긴 마지막 메시지를 받지 못하므로,
+    대역 서버를 사용했으면 prompt 토큰 수는 서버가 집계한 값을 사용합니다 (prompt_tokens_source).
+    """
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "prompt_chars": 0, "prompt_tokens_source": "spans"}
+    for name, item in stages.items():
+        if name == "analysis_pipeline":
+            continue
+        totals["prompt_tokens"] += int(item.get("prompt_eval_count", 0))
+        totals["completion_tokens"] += int(item.get("eval_count", 0))
+        totals["prompt_chars"] += int(item.get("prompt_chars", 0))
+    if server is not None:
+        totals["prompt_tokens"] = server.tokens["prompt_eval_count"]
+        totals["prompt_tokens_source"] = "stub"
+    return totals
+
+
+def run_benchmark(json_path: str, ids: List, result_dir: str, mode: str = "rag", workers: int = 1,
+                  use_async: bool = False, responder: DeterministicOllama = None, ttft: float = 0.0,
+                  tokens_per_sec: float = 0.0, with_repair: bool = False, ollama_url: str = None,
+                  index_dir: str = None, labels: Dict[str, bool] = None) -> Dict[str, Any]:
+    """
+    데이터셋의 ids를 VulnerabilityProcessor로 처리하고 성능/정확도 보고서를 반환합니다.
+    ollama_url이 없으면 responder로 로컬 대역 서버를 띄우고, RAG 모드는 index_dir(없으면 합성 지식 베이스)의
+    내장 인덱스를 검색합니다. 결과 파일과 manifest.jsonl은 start.py와 같은 형식으로 result_dir에 저장합니다.
+    """
+    if mode not in BENCHMARK_MODES:
+        raise ValueError(f"지원하지 않는 모드입니다: {mode} (가능: {', '.join(BENCHMARK_MODES)})")
+    responder = responder or DeterministicOllama()
+    os.makedirs(result_dir, exist_ok=True)
+    manifest_path = os.path.join(result_dir, "manifest.jsonl")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    server = None if ollama_url else OllamaStubServer(responder, ttft=ttft, tokens_per_sec=tokens_per_sec).start()
+    url = ollama_url or server.url
+    temp_index_dir = None
+    try:
+        client = OllamaClient(OllamaTransport(hosts=[url]))
+        embedded_index = None
+        if mode == "rag":
+            if index_dir is None:
+                temp_index_dir = index_dir = tempfile.mkdtemp(prefix="benchmark_index_")
+                embedded_index = build_stub_index(index_dir, responder)
+            else:
+                embedded_index = EmbeddedKnowledgeIndex(index_dir)
+        rag_system = VulRAG(enable_rag=mode == "rag", backend="embedded", ollama_client=client,
+                            embedded_index=embedded_index)
+        if server is None and rag_system.stream_early_stop:
+            logger.warning("LLM_STREAM_EARLY_STOP이 켜져 있어 조기 종료된 호출의 prompt 토큰 수는 집계되지 않습니다.")
+        processor = VulnerabilityProcessor(enable_rag=mode == "rag", retrieval_mode=RETRIEVAL_MODE,
+                                           fast=mode == "fast", fast_repair=with_repair, rag_system=rag_system)
+        manifest = RunManifest(manifest_path)
+        profile = TraceProfile()
+
+        started = time.perf_counter()
+        if use_async:
+            asyncio.run(run_batch_async(processor, json_path, ids, result_dir, workers, manifest=manifest,
+                                        profile=profile, hosts=[url]))
+        elif workers == 1:
+            for record_id in ids:
+                process_single_id(processor, json_path, record_id, result_dir, manifest=manifest, profile=profile)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda record_id: process_single_id(processor, json_path, record_id, result_dir,
+                                                                      manifest=manifest, profile=profile), ids))
+        wall_time = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.stop()
+        if temp_index_dir is not None:
+            shutil.rmtree(temp_index_dir, ignore_errors=True)
+
+    stages = profile.summary()
+    run_statuses = manifest.summary()
+    completed = run_statuses.get("done", 0)
+    return {
+        "config": {"mode": mode, "samples": len(ids), "workers": workers, "async": use_async, "ttft": ttft,
+                   "tokens_per_sec": tokens_per_sec, "with_repair": with_repair, "ollama_url": ollama_url,
+                   "error_rate": getattr(responder, "error_rate", None)},
+        "result_dir": result_dir,
+        "wall_time": wall_time,
+        "throughput": completed / wall_time if wall_time else None,
+        "run_statuses": run_statuses,
+        "result_statuses": dict(_result_statuses(result_dir, ids)),
+        "stages": stages,
+        "tokens": _token_totals(stages, server),
+        "stub_requests": dict(server.requests) if server is not None else None,
+        "detection": detection_metrics(result_dir, labels) if labels else None,
+    }
+
+
+def config_differences(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """두 보고서의 실행 설정(config)에서 값이 다른 항목 목록"""
+    config, base_config = report.get("config") or {}, baseline.get("config") or {}
+    return [f"{key}: {base_config.get(key)!r} -> {config.get(key)!r}"
+            for key in sorted(set(config) | set(base_config)) if config.get(key) != base_config.get(key)]
+
+
+def check_regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[str]:
+    """
+    baseline 보고서보다 단계별 p50/p95가 tolerance 비율 넘게 느려졌거나, 처리량/F1이 줄어든 항목 목록.
+    실행 설정(모드, 샘플 수, 워커, 지연 시간 등)이 다르면 비교할 수 없으므로 ValueError를 발생시킵니다.
+    """
+    differences = config_differences(report, baseline)
+    if differences:
+        raise ValueError("기준 보고서와 실행 설정이 달라 비교할 수 없습니다: " + ", ".join(differences))
+    regressions = []
+    for name, item in report["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50", "p95"):
+            # 1ms 미만의 차이는 측정 오차로 보고 무시
+            if base[key] > 0 and item[key] > base[key] * (1 + tolerance) and item[key] - base[key] > 0.001:
+                regressions.append(f"{name} {key}: {base[key] * 1000:.1f}ms -> {item[key] * 1000:.1f}ms")
+    if baseline.get("throughput") and report.get("throughput") and \
+            report["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['throughput']:.2f} -> {report['throughput']:.2f} samples/s")
+    base_f1 = (baseline.get("detection") or {}).get("f1")
+    f1 = (report.get("detection") or {}).get("f1")
+    if base_f1 is not None and (f1 is None or f1 < base_f1 - 1e-9):
+        regressions.append(f"f1: {base_f1:.3f} -> {'-' if f1 is None else f'{f1:.3f}'}")
+    return regressions
+
+
+def _ratio(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+
+def format_benchmark(report: Dict[str, Any]) -> str:
+    config = report["config"]
+    lines = [
+        f"벤치마크: 모드 {config['mode']}, 샘플 {config['samples']}개, 워커 {config['workers']}"
+        f"{' (async)' if config['async'] else ''}, ttft {config['ttft'] * 1000:.0f}ms, "
+        f"생성 속도 {config['tokens_per_sec'] or '무제한'} tok/s",
+        f"소요 시간 {report['wall_time']:.2f}초, 처리량 {report['throughput'] or 0:.2f} samples/s, "
+        f"실행 결과 {report['run_statuses']}, 판정 {report['result_statuses']}",
+        f"토큰: prompt {report['tokens']['prompt_tokens']} ({report['tokens']['prompt_chars']}자, "
+        f"{report['tokens'].get('prompt_tokens_source', 'spans')}), "
+        f"completion {report['tokens']['completion_tokens']}",
+        f"{'stage':<22}{'count':>7}{'mean(ms)':>10}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    for name, item in sorted(report["stages"].items(), key=lambda kv: -kv[1]["total"]):
+        lines.append(f"{name:<22}{item['count']:>7}" + "".join(
+            f"{item[key] * 1000:>{10 if key == 'mean' else 9}.1f}" for key in ("mean", "p50", "p90", "p95", "p99", "max")))
+    detection = report.get("detection")
+    if detection:
+        matrix = detection["confusion_matrix"]
+        lines.append(f"탐지: accuracy {_ratio(detection['accuracy'])}, precision {_ratio(detection['precision'])}, "
+                     f"recall {_ratio(detection['recall'])}, F1 {_ratio(detection['f1'])} "
+                     f"(TP {matrix['tp']}, FP {matrix['fp']}, FN {matrix['fn']}, TN {matrix['tn']}, "
+                     f"판정 불가 {detection['undecided']})")
+    return "\n".join(lines)
+
+
+# --- 결과 디렉터리 비교 ---
+
+def _load_result(result_dir: str, record_id: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(result_dir, f"{record_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _repair_operation_count(result: Dict[str, Any]) -> Optional[int]:
+    details = result.get("details") if isinstance(result, dict) else None
+    repair = (details.get("repair_plan", details.get("patch")) if isinstance(details, dict) else None)
+    operations = repair.get("repair_operations") if isinstance(repair, dict) else None
+    return len(operations) if isinstance(operations, list) else None
+
+
+def _stage_means(result_dir: str, ids: Iterable[str]) -> Tuple[Dict[str, float], Optional[float]]:
+    """manifest.jsonl의 완료된 ID별 단계 소요 시간 평균과 전체 처리 시간 평균"""
+    manifest_path = os.path.join(result_dir, "manifest.jsonl")
+    if not os.path.exists(manifest_path):
+        return {}, None
+    manifest = RunManifest(manifest_path)
+    totals: Dict[str, List[float]] = {}
+    elapsed = []
+    for record_id in ids:
+        entry = manifest.get(record_id)
+        if not entry or entry.get("status") != "done":
+            continue
+        if entry.get("elapsed") is not None:
+            elapsed.append(entry["elapsed"])
+        for stage, seconds in (entry.get("stage_timings") or {}).items():
+            totals.setdefault(stage, []).append(seconds)
+    return ({stage: sum(values) / len(values) for stage, values in totals.items()},
+            sum(elapsed) / len(elapsed) if elapsed else None)
+
+
+def diff_result_dirs(base_dir: str, new_dir: str, ids: Iterable = None) -> Dict[str, Any]:
+    """
+    두 결과 디렉터리(예: result/RAG vs result/No-RAG, 변경 전/후 벤치마크)를 ID별로 비교합니다.
+    판정 일치율(base 기준), status가 바뀐 ID, 수리 연산 수, manifest의 단계별 평균 소요 시간을 보고합니다.
+    """
+    if ids is None:
+        names = {name[:-len(".json")] for directory in (base_dir, new_dir) if os.path.isdir(directory)
+                 for name in os.listdir(directory) if name.endswith(".json")}
+        ids = sorted(names, key=lambda name: (len(name), name))
+    ids = [str(record_id) for record_id in ids]
+
+    status_changes, operations = [], {"base": 0, "new": 0, "changed": []}
+    for record_id in ids:
+        base, new = _load_result(base_dir, record_id), _load_result(new_dir, record_id)
+        base_status = base.get("status") if base else None
+        new_status = new.get("status") if new else None
+        if base_status != new_status:
+            status_changes.append({"id": record_id, "base": base_status, "new": new_status})
+        base_ops, new_ops = _repair_operation_count(base), _repair_operation_count(new)
+        operations["base"] += base_ops or 0
+        operations["new"] += new_ops or 0
+        if base_ops != new_ops:
+            operations["changed"].append({"id": record_id, "base": base_ops, "new": new_ops})
+
+    base_stages, base_elapsed = _stage_means(base_dir, ids)
+    new_stages, new_elapsed = _stage_means(new_dir, ids)
+    stage_timings = {
+        stage: {"base": base_stages.get(stage), "new": new_stages.get(stage),
+                "change": new_stages[stage] / base_stages[stage] - 1
+                if base_stages.get(stage) and stage in new_stages else None}
+        for stage in sorted(set(base_stages) | set(new_stages))
+    }
+    return {
+        "base_dir": base_dir,
+        "new_dir": new_dir,
+        "ids": len(ids),
+        "verdicts": compare_result_dirs(base_dir, new_dir, ids),
+        "status_changes": status_changes,
+        "repair_operations": operations,
+        "stage_timings": stage_timings,
+        "mean_elapsed": {"base": base_elapsed, "new": new_elapsed},
+    }
+
+
+def format_diff(diff: Dict[str, Any]) -> str:
+    verdicts = diff["verdicts"]
+    lines = [
+        f"결과 비교: {diff['new_dir']} (new) vs {diff['base_dir']} (base), ID {diff['ids']}개",
+        f"판정 일치율 {_ratio(verdicts['accuracy'])} ({verdicts['compared']}개 비교, 불일치 {len(verdicts['disagreements'])}개)",
+        f"status 변경 {len(diff['status_changes'])}개" + (": " + ", ".join(
+            f"{item['id']}({item['base']} -> {item['new']})" for item in diff["status_changes"][:20])
+            if diff["status_changes"] else ""),
+        f"수리 연산 수: base {diff['repair_operations']['base']}, new {diff['repair_operations']['new']} "
+        f"(바뀐 ID {len(diff['repair_operations']['changed'])}개)",
+    ]
+    elapsed = diff["mean_elapsed"]
+    if elapsed["base"] is not None and elapsed["new"] is not None:
+        lines.append(f"ID당 평균 처리 시간: base {elapsed['base']:.3f}초, new {elapsed['new']:.3f}초")
+    for stage, item in diff["stage_timings"].items():
+        base = "-" if item["base"] is None else f"{item['base'] * 1000:.1f}ms"
+        new = "-" if item["new"] is None else f"{item['new'] * 1000:.1f}ms"
+        change = "" if item["change"] is None else f" ({item['change']:+.0%})"
+        lines.append(f"  {stage:<22}{base:>12} -> {new:>12}{change}")
+    return "\n".join(lines)
+
+
+def _parse_id_range(value: str) -> List[int]:
+    start_id, end_id = (int(part) for part in value.split("-"))
+    return list(range(start_id, end_id + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='로컬 Ollama 대역 서버로 파이프라인 성능/탐지 정확도를 측정하고 결과 디렉터리를 비교합니다',
+        formatter_class=argparse.RawTextHelpFormatter,
+        epilog="""
+사용 예시:
+  1. 합성 데이터셋 200개로 RAG 파이프라인 측정 (결과: ./result/Benchmark/rag)
+     python benchmark.py run --synthetic 200 --workers 8
+  2. 실제 데이터셋을 Ollama처럼 지연시켜 비동기로 측정하고 이전 보고서와 비교 (느려지면 종료 코드 1)
+     python benchmark.py run --json-file data.json --id-range 1-79 --async --workers 16 --ttft 0.2 --tokens-per-sec 40 \\
+         --report bench.json --baseline bench_prev.json
+  3. 두 결과 디렉터리 비교
+     python benchmark.py diff ./result/RAG ./result/No-RAG
+""")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="데이터셋을 대역 서버로 처리하고 보고서를 출력")
+    source = run_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--json-file', help='start.py 형식의 데이터셋 (JSON 배열 또는 JSONL)')
+    source.add_argument('--synthetic', type=int, metavar='N', help='정답이 포함된 합성 Java 데이터셋 N개를 만들어 사용')
+    run_parser.add_argument('--id-range', help='처리할 ID 범위 (예: "1-79", --json-file 사용 시 필수)')
+    run_parser.add_argument('--mode', choices=BENCHMARK_MODES, default="rag", help='파이프라인 모드 (기본값: rag)')
+    run_parser.add_argument('--with-repair', action='store_true', help='--mode fast에서 패치도 생성')
+    run_parser.add_argument('--workers', type=int, default=1, help='동시 처리 수 (기본값: 1)')
+    run_parser.add_argument('--async', dest='use_async', action='store_true', help='asyncio 파이프라인으로 처리')
+    run_parser.add_argument('--ttft', type=float, default=0.0, help='대역 서버의 첫 토큰 지연(초, 기본값: 0)')
+    run_parser.add_argument('--tokens-per-sec', type=float, default=0.0, help='대역 서버의 생성 속도 (기본값: 0=지연 없음)')
+    run_parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='대역 서버가 판정을 뒤집는 코드 비율 (기본값: 0)')
+    run_parser.add_argument('--ollama-url', help='대역 서버 대신 사용할 Ollama(또는 재생 서버) 주소')
+    run_parser.add_argument('--index-dir', help='RAG 모드에서 검색할 내장 인덱스 (기본값: 합성 지식 베이스로 임시 생성)')
+    run_parser.add_argument('--labels', help='정답 파일 (JSON {"ID": true/false}), 생략하면 데이터셋 레코드의 --label-key 사용')
+    run_parser.add_argument('--label-key', default=DEFAULT_LABEL_KEY, help=f'레코드의 정답 키 (기본값: {DEFAULT_LABEL_KEY})')
+    run_parser.add_argument('--output', help='결과 디렉터리 (기본값: ./result/Benchmark/<모드>)')
+    run_parser.add_argument('--report', help='보고서를 JSON으로 저장할 경로')
+    run_parser.add_argument('--baseline', help='비교할 이전 보고서(JSON), 느려지거나 F1이 떨어지면 종료 코드 1')
+    run_parser.add_argument('--max-regression', type=float, default=0.2, help='허용하는 지연/처리량 악화 비율 (기본값: 0.2)')
+    run_parser.add_argument('--log-level', default="WARNING", help='콘솔 로그 레벨 (기본값: WARNING)')
+
+    diff_parser = subparsers.add_parser("diff", help="두 결과 디렉터리 비교")
+    diff_parser.add_argument('base_dir')
+    diff_parser.add_argument('new_dir')
+    diff_parser.add_argument('--id-range', help='비교할 ID 범위, 생략하면 두 디렉터리의 모든 결과')
+    diff_parser.add_argument('--json', dest='json_path', help='비교 결과를 JSON으로 저장할 경로')
+    args = parser.parse_args()
+
+    if args.command == "diff":
+        diff = diff_result_dirs(args.base_dir, args.new_dir, _parse_id_range(args.id_range) if args.id_range else None)
+        print(format_diff(diff))
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump(diff, f, indent=2, ensure_ascii=False)
+        return
+
+    configure_logging(args.log_level)
+    if args.workers < 1:
+        parser.error("--workers 값은 1 이상이어야 합니다.")
+    output = args.output or os.path.join("./result/Benchmark", args.mode)
+    os.makedirs(output, exist_ok=True)
+    if args.synthetic:
+        # 결과 디렉터리의 *.json은 ID별 결과로 읽히므로 데이터셋은 JSONL로 저장
+        json_path = write_dataset(make_synthetic_dataset(args.synthetic), os.path.join(output, "dataset.jsonl"))
+        ids = list(range(1, args.synthetic + 1))
+    else:
+        if not args.id_range:
+            parser.error("--json-file을 사용하려면 --id-range도 지정해야 합니다.")
+        json_path, ids = args.json_file, _parse_id_range(args.id_range)
+    labels = load_labels(json_path, ids, args.label_key, args.labels)
+
+    report = run_benchmark(json_path, ids, output, mode=args.mode, workers=args.workers, use_async=args.use_async,
+                           responder=DeterministicOllama(error_rate=args.error_rate), ttft=args.ttft,
+                           tokens_per_sec=args.tokens_per_sec, with_repair=args.with_repair,
+                           ollama_url=args.ollama_url, index_dir=args.index_dir, labels=labels)
+    print(format_benchmark(report))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        try:
+            regressions = check_regressions(report, baseline, args.max_regression)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit(2)
+        if regressions:
+            print("성능 회귀:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("성능 회귀 없음 (기준: %s)" % args.baseline)
+
+
+if __name__ == "__main__":
+    main()
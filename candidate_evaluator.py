@@ -0,0 +1,195 @@
+# candidate_evaluator.py (수리 계획의 후보 연산을 프로세스 풀에서 평가하고 순위를 매김)
+
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from patch_validator import _line_range, apply_repair_operation, get_syntax_checker
+from repair_algorithm import vulnerability_matches
+from config import CANDIDATE_EVAL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# 분석 결과(reason, analysis_summary)의 표현으로 repair_algorithm.VULNERABILITY_PATTERNS의 유형을 추정
+_VULNERABILITY_KEYWORDS = {
+    "sql_injection": re.compile(r"(?i)\bsql\b|sql injection"),
+    "xss": re.compile(r"(?i)\bxss\b|cross[- ]site scripting"),
+    "injection": re.compile(r"(?i)command injection|os command|code injection|runtime\.exec|processbuilder"),
+}
+
+
+def infer_vulnerability_types(analysis_result: Dict[str, Any]) -> List[str]:
+    """분석 결과의 설명에 나타난 취약점 유형 목록 (VULNERABILITY_PATTERNS의 키)"""
+    analysis_result = analysis_result or {}
+    texts = [str(analysis_result.get("analysis_summary", ""))]
+    for section in analysis_result.get("vulnerable_sections") or []:
+        if isinstance(section, dict):
+            texts.append(str(section.get("reason", "")))
+    text = "\n".join(texts)
+    return [name for name, keyword in _VULNERABILITY_KEYWORDS.items() if keyword.search(text)]
+
+
+def vulnerable_line_set(analysis_result: Dict[str, Any]) -> Set[int]:
+    """분석 결과의 vulnerable_lines("12-14", "12" 등)에 포함된 줄 번호"""
+    lines: Set[int] = set()
+    for section in (analysis_result or {}).get("vulnerable_sections") or []:
+        line_range = _line_range(section.get("vulnerable_lines")) if isinstance(section, dict) else None
+        if line_range is not None:
+            lines.update(range(line_range[0], line_range[1] + 1))
+    return lines
+
+
+def _evaluate_chunk(code: str, candidates: List[Tuple[int, Dict[str, Any]]], vulnerability_types: List[str],
+                    vulnerable_lines: Set[int]) -> List[Dict[str, Any]]:
+    """
+    (프로세스 풀 작업) 후보 연산들을 원본 코드에 적용하고, 결과 파일 해시 / 구문 검증 / 취약 패턴 감소 여부를 계산합니다.
+    구문 검증기는 작업 프로세스마다 한 번만 생성되며, 같은 원본의 후보는 바뀐 구간만 다시 파싱합니다.
+    """
+    checker = get_syntax_checker()
+    original_matches = {name: vulnerability_matches(code, name) for name in vulnerability_types}
+    patched, results = [], []
+    for index, operation in candidates:
+        patched_code, error = apply_repair_operation(code, operation) if isinstance(operation, dict) \
+            else (None, "operation is not an object")
+        patched.append(patched_code)
+        line_range = _line_range(operation.get("line_number")) if isinstance(operation, dict) else None
+        results.append({
+            "index": index,
+            "applied": patched_code is not None,
+            "hash": hashlib.blake2b(patched_code.encode("utf-8"), digest_size=16).hexdigest() if patched_code else None,
+            "syntax_valid": None,
+            "vulnerability_removed": None,
+            "touches_vulnerable_lines": bool(line_range and vulnerable_lines.intersection(
+                range(line_range[0], line_range[1] + 1))),
+            "error": error,
+        })
+
+    for result, patched_code, syntax in zip(results, patched, checker.check_candidates(code, patched)):
+        if syntax is None:
+            continue
+        result["syntax_valid"] = syntax.valid
+        result["error"] = syntax.error
+        # 원본에서 취약 패턴이 보였던 유형만 판단 (패턴이 하나라도 줄었으면 제거된 것으로 봄)
+        matched = [name for name, count in original_matches.items() if count]
+        if matched:
+            result["vulnerability_removed"] = any(vulnerability_matches(patched_code, name) < original_matches[name]
+                                                  for name in matched)
+    return results
+
+
+def _rank_key(result: Dict[str, Any], operation: Dict[str, Any]):
+    """
+    파서가 구문을 확인한 후보 > 판단 불가(괄호 짝 검사 등) 후보, 그 안에서
+    취약 패턴을 없앤 후보 > 취약 줄을 고친 후보 > 복잡도가 낮은 후보 > 원래 순서
+    """
+    complexity = operation.get("complexity") if isinstance(operation, dict) else None
+    return (
+        result["syntax_valid"] is not True,
+        result["vulnerability_removed"] is False,
+        not result["touches_vulnerable_lines"],
+        complexity if isinstance(complexity, (int, float)) and not isinstance(complexity, bool) else 10,
+        result["index"],
+    )
+
+
+class CandidateEvaluator:
+    """
+    수리 연산 후보(보통 10개)를 원본 코드에 적용해 평가하고, 쓸 수 있는 후보만 순위대로 남깁니다.
+    - 적용할 수 없거나 구문 오류가 있는 후보, 결과 파일이 같은(해시 중복) 후보는 제외합니다.
+    - 남은 후보는 구문 확인 여부(판단 불가는 뒤로), 취약 패턴 제거 여부, 취약 줄 수정 여부, complexity 순으로 정렬합니다.
+    후보는 workers개의 프로세스로 나누어 평가하며(workers가 1 이하이면 현재 프로세스에서 평가),
+    프로세스 풀은 처음 평가할 때 만들어 프로세스가 끝날 때까지 재사용합니다.
+    """
+
+    def __init__(self, workers: int = CANDIDATE_EVAL_WORKERS):
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # 스레드/이벤트 루프가 돌고 있는 프로세스를 fork하지 않도록 spawn으로 작업 프로세스를 시작
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+                logger.debug("Started candidate evaluation pool with %d workers", self.workers)
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def _evaluate(self, code: str, operations: List[Dict[str, Any]], vulnerability_types: List[str],
+                  vulnerable_lines: Set[int]) -> List[Dict[str, Any]]:
+        candidates = list(enumerate(operations))
+        if self.workers <= 1 or len(candidates) <= 1:
+            return _evaluate_chunk(code, candidates, vulnerability_types, vulnerable_lines)
+        # 작업 프로세스마다 연속된 후보 묶음을 하나씩 보내 원본 코드는 묶음당 한 번만 전달
+        size = -(-len(candidates) // self.workers)
+        chunks = [candidates[start:start + size] for start in range(0, len(candidates), size)]
+        executor = self._executor()
+        futures = [executor.submit(_evaluate_chunk, code, chunk, vulnerability_types, vulnerable_lines)
+                   for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+
+    def evaluate(self, code: str, operations: List[Dict[str, Any]],
+                 analysis_result: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        반환값: {"parser", "total", "applied", "syntax_valid", "viable", "elapsed_ms",
+                 "ranked": 순위대로 정렬한 쓸 수 있는 연산 목록,
+                 "results": [{"index", "applied", "hash", "syntax_valid", "vulnerability_removed",
+                              "touches_vulnerable_lines", "rank", "rejected", "error"}]}
+        구문 검증을 판단할 수 없는 후보(원본부터 파싱되지 않는 경우)는 제외하지 않습니다.
+        """
+        started = time.perf_counter()
+        results = self._evaluate(code, operations, infer_vulnerability_types(analysis_result),
+                                 vulnerable_line_set(analysis_result))
+
+        seen_hashes = set()
+        ranked = []
+        for result in sorted(results, key=lambda item: _rank_key(item, operations[item["index"]])):
+            if not result["applied"]:
+                result["rejected"] = "not_applied"
+            elif result["syntax_valid"] is False:
+                result["rejected"] = "syntax_error"
+            elif result["hash"] in seen_hashes:
+                result["rejected"] = "duplicate"
+            else:
+                seen_hashes.add(result["hash"])
+                result["rejected"] = None
+                ranked.append(result)
+        for rank, result in enumerate(ranked, start=1):
+            result["rank"] = rank
+
+        results.sort(key=lambda item: item["index"])
+        return {
+            "parser": get_syntax_checker().name,
+            "total": len(results),
+            "applied": sum(1 for result in results if result["applied"]),
+            "syntax_valid": sum(1 for result in results if result["syntax_valid"]),
+            "viable": len(ranked),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "ranked": [operations[result["index"]] for result in ranked],
+            "results": [dict(result, rank=result.get("rank")) for result in results],
+        }
+
+
+_default_evaluator: Optional[CandidateEvaluator] = None
+_default_evaluator_lock = threading.Lock()
+
+
+def get_candidate_evaluator() -> CandidateEvaluator:
+    """프로세스 전체에서 공유하는 CandidateEvaluator (프로세스 풀은 처음 평가할 때 생성)"""
+    global _default_evaluator
+    with _default_evaluator_lock:
+        if _default_evaluator is None:
+            _default_evaluator = CandidateEvaluator()
+            atexit.register(_default_evaluator.shutdown)
+        return _default_evaluator
@@ -1,47 +1,138 @@
 # -*- coding: utf-8 -*-
 
-# 필요한 라이브러리를 불러옵니다.
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import logging
+import os
+import sys
+import threading
+from typing import List, Optional
+
+if __package__ in (None, ""):
+    # python codet5/codet5.py로 직접 실행할 때도 저장소 루트의 config를 불러올 수 있도록
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    CODET5_CHECKPOINT,
+    CODET5_DEVICE,
+    CODET5_QUANTIZE,
+    CODET5_BATCH_SIZE,
+    CODET5_MAX_SOURCE_LENGTH,
+    CODET5_MAX_SUMMARY_LENGTH,
+)
+
+logger = logging.getLogger(__name__)
+
+# CodeT5는 특정 작업을 수행하기 위해 입력 앞에 접두사를 붙여줘야 합니다.
+TASK_PREFIX = "Summarize Java: "
+
+
+class CodeT5Summarizer:
+    """
+    CodeT5 요약 모델을 한 번만 불러와 재사용합니다.
+    - 모델/토크나이저는 처음 요약할 때 불러오며(lazy), 여러 스레드가 동시에 호출해도 한 번만 불러옵니다.
+    - summarize_batch()는 길이가 비슷한 입력끼리 묶어 padding/truncation 후 한 번의 generate로 요약합니다.
+    - CPU에서 quantize=True이면 Linear 층을 동적 int8 양자화합니다 (정확도 약간 손실, 속도 향상).
+    torch / transformers는 모델을 불러올 때 import하므로, 사용하지 않으면 설치하지 않아도 됩니다.
+    """
+
+    def __init__(self, checkpoint: str = CODET5_CHECKPOINT, device: str = CODET5_DEVICE,
+                 quantize: bool = CODET5_QUANTIZE, batch_size: int = CODET5_BATCH_SIZE,
+                 max_source_length: int = CODET5_MAX_SOURCE_LENGTH,
+                 max_summary_length: int = CODET5_MAX_SUMMARY_LENGTH):
+        self.checkpoint = checkpoint
+        self.device = device or None
+        self.quantize = quantize
+        self.batch_size = max(1, batch_size)
+        self.max_source_length = max_source_length
+        self.max_summary_length = max_summary_length
+        self._tokenizer = None
+        self._model = None
+        self._torch = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self):
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            try:
+                import torch
+                from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+            except ImportError as e:
+                raise ImportError("CodeT5Summarizer를 사용하려면 torch와 transformers가 필요합니다: "
+                                  "pip install torch transformers") from e
+
+            device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+            logger.info("Loading CodeT5 model %s on %s%s", self.checkpoint, device,
+                        " (dynamic int8 quantization)" if self.quantize and device == "cpu" else "")
+            tokenizer = AutoTokenizer.from_pretrained(self.checkpoint)
+            model = AutoModelForSeq2SeqLM.from_pretrained(self.checkpoint)
+            model.eval()
+            if self.quantize and device == "cpu":
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            else:
+                model.to(device)
+
+            self._torch = torch
+            self.device = device
+            self._tokenizer = tokenizer
+            # _model을 마지막에 설정해야 다른 스레드가 불러오기 도중의 상태를 보지 않음
+            self._model = model
+
+    def summarize(self, code_snippet: str) -> str:
+        return self.summarize_batch([code_snippet])[0]
+
+    def summarize_batch(self, code_snippets: List[str]) -> List[str]:
+        """코드 목록을 요약합니다 (입력 순서대로 반환, 토큰이 max_source_length를 넘으면 잘라서 요약)."""
+        if not code_snippets:
+            return []
+        self._load()
+        torch = self._torch
+        # 길이순으로 정렬해 배치마다 padding을 최소화한 뒤 원래 순서로 되돌림
+        order = sorted(range(len(code_snippets)), key=lambda idx: len(code_snippets[idx]))
+        summaries: List[Optional[str]] = [None] * len(code_snippets)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            inputs = self._tokenizer([TASK_PREFIX + code_snippets[idx] for idx in batch], padding=True,
+                                     truncation=True, max_length=self.max_source_length, return_tensors="pt")
+            inputs = {key: value.to(self.device) for key, value in inputs.items()}
+            with torch.inference_mode():
+                generated_ids = self._model.generate(**inputs, max_length=self.max_summary_length)
+            for idx, summary in zip(batch, self._tokenizer.batch_decode(generated_ids, skip_special_tokens=True)):
+                summaries[idx] = summary.strip()
+        return summaries
+
+
+_default_summarizer: Optional[CodeT5Summarizer] = None
+_default_summarizer_lock = threading.Lock()
+
+
+def get_summarizer() -> CodeT5Summarizer:
+    """프로세스 전체에서 공유하는 CodeT5Summarizer (모델은 처음 요약할 때 불러옴)"""
+    global _default_summarizer
+    with _default_summarizer_lock:
+        if _default_summarizer is None:
+            _default_summarizer = CodeT5Summarizer()
+        return _default_summarizer
+
 
 def summarize_java_code(code_snippet):
     """
     CodeT5 모델을 사용하여 주어진 Java 코드 스니펫을 요약합니다.
-    
+    모델은 처음 호출할 때 한 번만 불러오며 이후 호출에서 재사용합니다.
+
     Args:
         code_snippet (str): 요약할 Java 코드 문자열
-        
+
     Returns:
         str: 모델이 생성한 요약 텍스트
     """
     try:
-        # 사용할 CodeT5 모델의 체크포인트 이름
-        checkpoint = "Salesforce/codet5-base"
-
-        # 1. 모델과 토크나이저를 Hugging Face 허브에서 불러옵니다.
-        print("모델과 토크나이저를 로딩 중입니다...")
-        tokenizer = AutoTokenizer.from_pretrained(checkpoint)
-        model = AutoModelForSeq2SeqLM.from_pretrained(checkpoint)
-        print("로딩이 완료되었습니다.")
-
-        # 2. 입력 데이터 준비 (작업에 맞는 prefix 추가)
-        # CodeT5는 특정 작업을 수행하기 위해 입력 앞에 접두사를 붙여줘야 합니다.
-        task_prefix = "Summarize Java: "
-        input_text = task_prefix + code_snippet
-
-        # 3. 입력 텍스트를 토큰화합니다.
-        print("코드를 토큰화하는 중입니다...")
-        input_ids = tokenizer(input_text, return_tensors="pt").input_ids
-
-        # 4. 모델을 통해 요약 결과를 생성합니다.
-        print("코드 요약을 생성 중입니다...")
-        # max_length: 생성될 요약의 최대 길이를 지정합니다.
-        generated_ids = model.generate(input_ids, max_length=128)
-
-        # 5. 생성된 토큰 ID를 다시 텍스트로 디코딩합니다.
-        summary = tokenizer.decode(generated_ids[0], skip_special_tokens=True)
-        
-        return summary
-
+        return get_summarizer().summarize(code_snippet)
     except Exception as e:
         return f"오류가 발생했습니다: {e}"
 
@@ -62,14 +153,14 @@ if __name__ == "__main__":
         return max;
     }
     """
-    
+
     # 함수를 호출하여 코드 요약 실행
     generated_summary = summarize_java_code(java_code)
-    
+
     # 최종 결과 출력
     print("\n" + "="*50)
     print("입력된 Java 코드:")
     print(java_code)
     print("\nCodeT5가 생성한 요약:")
     print(generated_summary)
-    print("="*50)
\ No newline at end of file
+    print("="*50)
@@ -8,10 +8,132 @@ load_dotenv()
 ENABLE_RAG = os.getenv('ENABLE_RAG', 'true').lower() == 'true'
 
 # Elasticsearch 설정
-ELASTICSEARCH_HOST = "localhost"
-ELASTICSEARCH_PORT = 9200
+ELASTICSEARCH_HOST = os.getenv('ELASTICSEARCH_HOST', 'localhost')
+ELASTICSEARCH_PORT = int(os.getenv('ELASTICSEARCH_PORT', '9200'))
+# Elasticsearch 요청 하나의 응답 대기 시간(초). bulk 적재처럼 오래 걸리는 요청도 포함 (replay.py 기록 프록시도 같은 값 사용)
+ELASTICSEARCH_REQUEST_TIMEOUT = float(os.getenv('ELASTICSEARCH_REQUEST_TIMEOUT', '30'))
 INDEX_NAME = "documents"
 
 # Ollama 설정
 OLLAMA_HOST = "http://localhost:11434"
-MODEL_NAME = "qwen3:32b"  # 또는 다른 설치된 모델을 선택할 수 있습니다
\ No newline at end of file
+MODEL_NAME = "qwen3:32b"  # 또는 다른 설치된 모델을 선택할 수 있습니다
+
+# 단계별 모델 라우팅 (비어 있으면 MODEL_NAME). 예: 의미 추출/임베딩은 작은 모델, 분석/수리는 qwen3:32b
+# 각 호스트에 설치된 모델은 헬스 체크로 확인하며, 요청은 해당 모델이 있는 호스트로만 보냄
+SEMANTICS_MODEL = os.getenv('SEMANTICS_MODEL', '') or MODEL_NAME
+ANALYSIS_MODEL = os.getenv('ANALYSIS_MODEL', '') or MODEL_NAME
+REPAIR_MODEL = os.getenv('REPAIR_MODEL', '') or MODEL_NAME
+# 임베딩 모델을 바꾸면 지식 베이스를 다시 인덱싱해야 함 (index_knowledge.py)
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', '') or MODEL_NAME
+# 파이프라인 단계(trace span 이름) -> 모델
+STAGE_MODELS = {
+    "semantic_extraction": SEMANTICS_MODEL,
+    "analysis": ANALYSIS_MODEL,
+    "fast_analysis": ANALYSIS_MODEL,
+    "repair": REPAIR_MODEL,
+}
+
+# Ollama HTTP 전송 설정 (연결 풀 / 타임아웃 / 재시도)
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '10'))
+OLLAMA_READ_TIMEOUT = float(os.getenv('OLLAMA_READ_TIMEOUT', '600'))
+OLLAMA_MAX_RETRIES = int(os.getenv('OLLAMA_MAX_RETRIES', '3'))
+OLLAMA_BACKOFF_BASE = float(os.getenv('OLLAMA_BACKOFF_BASE', '0.5'))
+OLLAMA_BACKOFF_MAX = float(os.getenv('OLLAMA_BACKOFF_MAX', '8'))
+OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', '16'))
+# 동시에 Ollama 서버로 보낼 수 있는 최대 요청 수 (프로세스 전체)
+OLLAMA_MAX_INFLIGHT = int(os.getenv('OLLAMA_MAX_INFLIGHT', '4'))
+# Ollama 호스트 풀 (쉼표로 구분, 기본값: OLLAMA_HOST). 진행 중인 요청이 가장 적은 정상 호스트로 보냄
+OLLAMA_HOSTS = [host.strip() for host in os.getenv('OLLAMA_HOSTS', OLLAMA_HOST).split(',') if host.strip()]
+# 호스트 헬스 체크(/api/tags, 설치된 모델 목록 갱신) 주기(초)와 장애로 판단할 연속 실패 횟수
+OLLAMA_HEALTH_CHECK_INTERVAL = float(os.getenv('OLLAMA_HEALTH_CHECK_INTERVAL', '30'))
+OLLAMA_HEALTH_CHECK_TIMEOUT = float(os.getenv('OLLAMA_HEALTH_CHECK_TIMEOUT', '5'))
+OLLAMA_FAILURE_THRESHOLD = int(os.getenv('OLLAMA_FAILURE_THRESHOLD', '2'))
+# 한 샘플의 요청(단계)을 같은 호스트로 보내 공통 접두부(코드)의 KV 캐시를 재사용
+OLLAMA_HOST_AFFINITY = os.getenv('OLLAMA_HOST_AFFINITY', 'true').lower() == 'true'
+# 요청 하나(재시도 포함)에 허용하는 최대 시간(초), 0이면 제한 없음
+OLLAMA_REQUEST_DEADLINE = float(os.getenv('OLLAMA_REQUEST_DEADLINE', '0'))
+
+# 단계 사이에 모델과 공유 프롬프트 접두부(코드)의 KV 캐시를 메모리에 유지할 시간 (Ollama keep_alive)
+# "30m" 같은 기간 또는 초 단위 정수(-1이면 계속 유지), 비어 있으면 서버 기본값 사용
+_OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m').strip()
+OLLAMA_KEEP_ALIVE = int(_OLLAMA_KEEP_ALIVE) if _OLLAMA_KEEP_ALIVE.lstrip('-').isdigit() else _OLLAMA_KEEP_ALIVE
+
+# 기능적 의미 추출 방식: "llm"(기본) 또는 "codet5"(LLM 호출 없이 로컬 CodeT5 요약 모델 사용, torch/transformers 필요)
+SEMANTICS_BACKEND = os.getenv('SEMANTICS_BACKEND', 'llm')
+CODET5_CHECKPOINT = os.getenv('CODET5_CHECKPOINT', 'Salesforce/codet5-base')
+CODET5_DEVICE = os.getenv('CODET5_DEVICE', '')  # 비어 있으면 cuda 사용 가능 시 cuda, 아니면 cpu
+CODET5_QUANTIZE = os.getenv('CODET5_QUANTIZE', 'false').lower() == 'true'  # CPU에서 동적 int8 양자화
+CODET5_BATCH_SIZE = int(os.getenv('CODET5_BATCH_SIZE', '8'))
+CODET5_MAX_SOURCE_LENGTH = int(os.getenv('CODET5_MAX_SOURCE_LENGTH', '512'))
+CODET5_MAX_SUMMARY_LENGTH = int(os.getenv('CODET5_MAX_SUMMARY_LENGTH', '128'))
+# codet5 방식에서 behavior로 요약할 최대 메소드 수
+CODET5_MAX_UNITS = int(os.getenv('CODET5_MAX_UNITS', '16'))
+
+# repair_algorithm.RepairAlgorithm (로컬 모델 기반 수정 생성, torch/transformers 필요) 설정
+REPAIR_ENGINE_MODEL = os.getenv('REPAIR_ENGINE_MODEL', 'microsoft/codebert-base')
+REPAIR_ENGINE_BATCH_SIZE = int(os.getenv('REPAIR_ENGINE_BATCH_SIZE', '8'))
+REPAIR_ENGINE_MAX_NEW_TOKENS = int(os.getenv('REPAIR_ENGINE_MAX_NEW_TOKENS', '256'))
+
+# 수리 계획/패치의 각 연산을 원본 코드에 적용한 뒤 Java 구문 검증 (patch_validator)
+PATCH_VALIDATION_ENABLED = os.getenv('PATCH_VALIDATION_ENABLED', 'true').lower() == 'true'
+# 구문 검증 파서: "auto"(tree-sitter-java > javalang > 괄호 짝 검사 순으로 설치된 것), "tree-sitter", "javalang", "brackets"
+JAVA_PARSER = os.getenv('JAVA_PARSER', 'auto')
+# 코드 해시별 구문 검증 결과 캐시 크기
+SYNTAX_CACHE_SIZE = int(os.getenv('SYNTAX_CACHE_SIZE', '4096'))
+# 후보(수리 연산)를 평가할 프로세스 수 (1 이하이면 현재 프로세스에서 평가)
+CANDIDATE_EVAL_WORKERS = int(os.getenv('CANDIDATE_EVAL_WORKERS', str(min(4, os.cpu_count() or 1))))
+# 적용할 수 없거나 구문 오류가 있거나 중복인 후보를 repair_operations에서 빼고 순위대로 정렬
+# (false이면 원래 목록을 그대로 두고 평가 결과만 기록)
+PATCH_CANDIDATE_FILTER = os.getenv('PATCH_CANDIDATE_FILTER', 'true').lower() == 'true'
+
+# 최상위 JSON 객체가 완성되면 남은 토큰(<think> 이후 장황한 설명 등)을 받지 않고 생성을 중단
+LLM_STREAM_EARLY_STOP = os.getenv('LLM_STREAM_EARLY_STOP', 'true').lower() == 'true'
+
+# 단계별 JSON 스키마를 Ollama format 옵션으로 전송 (Ollama 0.5 이상), 응답이 스키마에 맞지 않으면 해당 단계만 최대 LLM_STAGE_RETRIES회 재요청
+LLM_JSON_SCHEMA_ENABLED = os.getenv('LLM_JSON_SCHEMA_ENABLED', 'true').lower() == 'true'
+LLM_STAGE_RETRIES = int(os.getenv('LLM_STAGE_RETRIES', '2'))
+
+# 단계별 trace 기록 (start.py --trace-file / --trace-format의 기본값, 경로가 비어 있으면 기록하지 않음)
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')
+TRACE_EXPORT_FORMAT = os.getenv('TRACE_EXPORT_FORMAT', 'jsonl')  # "jsonl" 또는 "otel" (OTLP/JSON)
+
+# 로깅 설정 (LOG_DIR: ID별 로그 파일 디렉터리, PROMPT_ARCHIVE_PATH: 프롬프트/응답 gzip JSONL, 비어 있으면 사용하지 않음)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_DIR = os.getenv('LOG_DIR', '')
+SAMPLE_LOG_LEVEL = os.getenv('SAMPLE_LOG_LEVEL', 'DEBUG').upper()
+PROMPT_ARCHIVE_PATH = os.getenv('PROMPT_ARCHIVE_PATH', '')
+
+# 큰 Java 파일은 메소드 단위로 나눠, 검색된 CVE와 관련도가 높은 상위 메소드만 분석 (CODE_CHUNKING_MIN_LINES줄 이상인 파일에만 적용)
+CODE_CHUNKING_ENABLED = os.getenv('CODE_CHUNKING_ENABLED', 'true').lower() == 'true'
+CODE_CHUNKING_MIN_LINES = int(os.getenv('CODE_CHUNKING_MIN_LINES', '200'))
+CODE_CHUNKING_TOP_UNITS = int(os.getenv('CODE_CHUNKING_TOP_UNITS', '3'))
+
+# 임베딩 / 대량 인덱싱 설정
+OLLAMA_EMBED_BATCH_SIZE = int(os.getenv('OLLAMA_EMBED_BATCH_SIZE', '32'))
+BULK_INDEX_BATCH_SIZE = int(os.getenv('BULK_INDEX_BATCH_SIZE', '256'))
+
+# LLM 응답 캐시 설정
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '.cache/llm_cache.sqlite')
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# 검색(Retrieval) 설정
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')  # "hybrid" (BM25 + kNN, RRF 결합) 또는 "bm25"
+RETRIEVAL_CANDIDATES = int(os.getenv('RETRIEVAL_CANDIDATES', '10'))  # 검색기 별 후보 수
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '1'))
+KNN_MODE = os.getenv('KNN_MODE', 'script_score')  # "script_score" (ES 7.x, 정확 검색) 또는 "knn" (ES 8.x, 근사 검색)
+KNN_NUM_CANDIDATES = int(os.getenv('KNN_NUM_CANDIDATES', '100'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+RRF_BM25_WEIGHT = float(os.getenv('RRF_BM25_WEIGHT', '1.0'))
+RRF_KNN_WEIGHT = float(os.getenv('RRF_KNN_WEIGHT', '1.0'))
+
+# 검색 백엔드 설정 ("elasticsearch" 또는 Elasticsearch 없이 동작하는 "embedded")
+RAG_BACKEND = os.getenv('RAG_BACKEND', 'elasticsearch')
+EMBEDDED_INDEX_DIR = os.getenv('EMBEDDED_INDEX_DIR', 'knowledge/embedded_index')
+EMBEDDED_INDEX_DTYPE = os.getenv('EMBEDDED_INDEX_DTYPE', 'float32')  # "float32" 또는 "float16"
+
+# 임베딩 차원 축소 설정 (EMBEDDING_DIM은 ES 인덱스의 dense_vector dims로도 사용됨)
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '2048'))
+EMBEDDING_REDUCTION_METHOD = os.getenv('EMBEDDING_REDUCTION_METHOD', 'chunk_mean')  # "chunk_mean", "pca", "random_projection"
+EMBEDDING_REDUCER_PATH = os.getenv('EMBEDDING_REDUCER_PATH', 'knowledge/embedding_reducer.npz')
+EMBEDDING_REDUCER_FIT_SAMPLES = int(os.getenv('EMBEDDING_REDUCER_FIT_SAMPLES', '4096'))
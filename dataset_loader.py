@@ -0,0 +1,137 @@
+# dataset_loader.py (분석 대상 데이터셋 로더)
+
+import codecs
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_ARRAY_SEPARATOR = re.compile(r'[\s,]*')
+_LINE_SEPARATOR = re.compile(r'\s*')
+
+
+def _scan_records(text: str) -> Iterator[Tuple[Dict[str, Any], int, int]]:
+    """JSON 배열 또는 JSONL 텍스트를 한 번만 훑으며 (레코드, 시작 위치, 끝 위치)를 생성합니다."""
+    decoder = json.JSONDecoder()
+    pos = _LINE_SEPARATOR.match(text, 0).end()
+    is_array = text.startswith('[', pos)
+    if is_array:
+        pos += 1
+    separator = _ARRAY_SEPARATOR if is_array else _LINE_SEPARATOR
+
+    while True:
+        pos = separator.match(text, pos).end()
+        if pos >= len(text) or (is_array and text[pos] == ']'):
+            break
+        record, end = decoder.raw_decode(text, pos)
+        yield record, pos, end
+        pos = end
+
+
+class DatasetIndex:
+    """
+    데이터셋 파일(JSON 배열 또는 JSONL)을 한 번만 파싱하여 id -> 레코드 인덱스를 구성합니다.
+    persist_index=True 이면 파일 옆에 바이트 오프셋 인덱스(<파일명>.idx.json)를 저장하고,
+    다음 실행부터는 전체를 다시 파싱하지 않고 해당 레코드 위치로 바로 이동해 읽습니다.
+    """
+
+    def __init__(self, path: str, persist_index: bool = False):
+        self.path = path
+        self.index_path = f"{path}.idx.json"
+        self._records: Optional[Dict[str, Dict[str, Any]]] = None
+        self._offsets: Dict[str, List[int]] = {}
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"파일을 찾을 수 없습니다: {path}")
+
+        if not (persist_index and self._load_offset_index()):
+            self._build()
+            if persist_index:
+                self._save_offset_index()
+
+    def _file_signature(self) -> Dict[str, int]:
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _build(self) -> None:
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        bom = len(codecs.BOM_UTF8) if raw.startswith(codecs.BOM_UTF8) else 0
+        text = raw[bom:].decode('utf-8')
+
+        records = {}
+        # 문자 위치를 바이트 위치로 변환하기 위해 직전 구간만 인코딩하여 누적한다
+        last_char, last_byte = 0, bom
+        try:
+            for record, start, end in _scan_records(text):
+                if not isinstance(record, dict):
+                    raise ValueError("데이터셋의 각 항목은 JSON 객체여야 합니다.")
+                start_byte = last_byte + len(text[last_char:start].encode('utf-8'))
+                end_byte = start_byte + len(text[start:end].encode('utf-8'))
+                last_char, last_byte = end, end_byte
+
+                record_id = str(record.get('id'))
+                # 중복 id는 기존 동작(next(...))과 같이 첫 번째 항목을 사용
+                if record_id not in records:
+                    records[record_id] = record
+                    self._offsets[record_id] = [start_byte, end_byte]
+        except json.JSONDecodeError:
+            raise ValueError(f"잘못된 JSON 형식입니다: {self.path}")
+
+        self._records = records
+
+    def _load_offset_index(self) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        if saved.get("signature") != self._file_signature():
+            return False
+        self._offsets = saved["offsets"]
+        return True
+
+    def _save_offset_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"signature": self._file_signature(), "offsets": self._offsets}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def ids(self) -> List[str]:
+        return list(self._offsets.keys())
+
+    def __contains__(self, record_id) -> bool:
+        return str(record_id) in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def get(self, record_id) -> Optional[Dict[str, Any]]:
+        """id에 해당하는 레코드를 반환합니다. 없으면 None을 반환합니다."""
+        record_id = str(record_id)
+        if self._records is not None:
+            return self._records.get(record_id)
+
+        offset = self._offsets.get(record_id)
+        if offset is None:
+            return None
+        start, end = offset
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+
+
+_dataset_cache: Dict[Tuple[str, bool], DatasetIndex] = {}
+_dataset_cache_lock = threading.Lock()
+
+
+def get_dataset(path: str, persist_index: bool = False) -> DatasetIndex:
+    """같은 파일은 프로세스 당 한 번만 인덱싱되도록 DatasetIndex를 캐시합니다."""
+    key = (os.path.abspath(path), persist_index)
+    with _dataset_cache_lock:
+        if key not in _dataset_cache:
+            _dataset_cache[key] = DatasetIndex(path, persist_index=persist_index)
+        return _dataset_cache[key]
@@ -1,26 +1,23 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import os
-import numpy as np
+import time
+from elasticsearch import helpers
 from elastic_utils import get_elasticsearch_client, create_index
 from ollama_utils import OllamaClient
-from config import INDEX_NAME
+from embedding_reducer import get_embedding_reducer
+from config import INDEX_NAME, BULK_INDEX_BATCH_SIZE
 
 class DocumentProcessor:
     def __init__(self):
         self.es_client = get_elasticsearch_client()
         self.ollama_client = OllamaClient()
+        self.reducer = get_embedding_reducer()
         # create index if not exists
         create_index(self.es_client)
         
-    def reduce_embedding_dimension(self, embedding: List[float], target_dim: int = 2048) -> List[float]:
+    def reduce_embedding_dimension(self, embedding: List[float]) -> List[float]:
         """reduce embedding dimension"""
-        if len(embedding) <= target_dim:
-            return embedding
-            
-        # split embedding into chunks and calculate average
-        chunks = np.array_split(np.array(embedding), target_dim)
-        reduced = [float(chunk.mean()) for chunk in chunks]
-        return reduced
+        return self.reducer.transform_one(embedding).tolist()
         
     def process_text(self, text: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """process text and generate embedding"""
@@ -61,4 +58,111 @@ class DocumentProcessor:
             "filename": os.path.basename(file_path)
         }
         
-        self.process_and_index_text(content, metadata) 
\ No newline at end of file
+        self.process_and_index_text(content, metadata)
+
+    def _iter_bulk_actions(self, items: Iterable[Tuple[Optional[str], str, Dict[str, Any]]], batch_size: int,
+                           report: Dict[str, Any], delete_ids: Iterable[str] = ()):
+        """embed items batch by batch and yield bulk index actions, then delete actions"""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from self._embed_batch(batch, report)
+                batch = []
+        if batch:
+            yield from self._embed_batch(batch, report)
+
+        # delete_ids는 제너레이터일 수 있으므로 색인 대상을 모두 소비한 뒤에 순회한다
+        for doc_id in delete_ids:
+            yield {"_op_type": "delete", "_index": INDEX_NAME, "_id": doc_id}
+
+    def _embed_batch(self, batch: List[Tuple[Optional[str], str, Dict[str, Any]]], report: Dict[str, Any]):
+        try:
+            embeddings = self.ollama_client.generate_embeddings([text for _, text, _ in batch])
+        except Exception as e:
+            # 임베딩 실패 시 해당 배치만 실패로 기록하고 계속 진행
+            print(f"Error embedding batch of {len(batch)} documents: {e}")
+            report["failed"] += len(batch)
+            report["failed_items"].extend(
+                {"_id": doc_id, "metadata": metadata, "error": str(e)} for doc_id, _, metadata in batch
+            )
+            return
+
+        # 배치 전체를 한 번에 축소한 뒤 리스트로 변환
+        reduced = self.reducer.transform(embeddings).tolist()
+        for (doc_id, text, metadata), embedding in zip(batch, reduced):
+            action = {
+                "_index": INDEX_NAME,
+                "_source": {
+                    "content": text,
+                    "embedding": embedding,
+                    "metadata": metadata or {}
+                }
+            }
+            if doc_id is not None:
+                action["_id"] = doc_id
+            yield action
+
+    def fetch_indexed_ids(self, field: str = "metadata.cve_id") -> Dict[str, Any]:
+        """return {_id: value of field} for every document currently in the index"""
+        return {
+            hit["_id"]: self._get_field(hit.get("_source", {}), field)
+            for hit in helpers.scan(self.es_client, index=INDEX_NAME, query={"query": {"match_all": {}}},
+                                    _source=[field])
+        }
+
+    @staticmethod
+    def _get_field(source: Dict[str, Any], field: str):
+        for key in field.split("."):
+            if not isinstance(source, dict):
+                return None
+            source = source.get(key)
+        return source
+
+    @staticmethod
+    def _failed_item(op_type: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        실패 항목을 보고서용으로 정리합니다. 전송 실패 시 결과에 포함되는 원본 문서(data, 임베딩 포함)는 빼고,
+        예외 객체(exception)는 JSON으로 저장할 수 있도록 문자열로 바꿉니다.
+        """
+        item = {key: value for key, value in result.items() if key != "data"}
+        if "exception" in item:
+            item["exception"] = repr(item["exception"])
+        return {op_type: item} if op_type else item
+
+    def bulk_index_texts(self, items: Iterable[Tuple[Optional[str], str, Dict[str, Any]]],
+                         batch_size: int = BULK_INDEX_BATCH_SIZE,
+                         delete_ids: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        embed and index (doc_id, text, metadata) tuples with batched embeddings and the bulk API,
+        then delete delete_ids (doc_id None lets ES generate the id)
+        """
+        report = {"indexed": 0, "deleted": 0, "failed": 0, "failed_items": [], "elapsed": 0.0, "docs_per_sec": 0.0}
+        started = time.perf_counter()
+
+        # 적재 중에는 refresh를 끄고, 끝난 뒤 원래 설정으로 되돌린다
+        settings = self.es_client.indices.get_settings(index=INDEX_NAME)
+        previous_interval = settings[INDEX_NAME]["settings"]["index"].get("refresh_interval")
+        self.es_client.indices.put_settings(index=INDEX_NAME, body={"index": {"refresh_interval": "-1"}})
+        try:
+            actions = self._iter_bulk_actions(items, batch_size, report, delete_ids)
+            for ok, info in helpers.streaming_bulk(self.es_client, actions, chunk_size=batch_size,
+                                                   raise_on_error=False, raise_on_exception=False):
+                op_type, result = next(iter(info.items())) if len(info) == 1 else (None, info)
+                if ok:
+                    report["deleted" if op_type == "delete" else "indexed"] += 1
+                elif op_type == "delete" and result.get("status") == 404:
+                    # 이미 삭제된 문서는 실패로 보지 않는다
+                    report["deleted"] += 1
+                else:
+                    report["failed"] += 1
+                    report["failed_items"].append(self._failed_item(op_type, result))
+        finally:
+            self.es_client.indices.put_settings(index=INDEX_NAME,
+                                                body={"index": {"refresh_interval": previous_interval}})
+            self.es_client.indices.refresh(index=INDEX_NAME)
+
+        report["elapsed"] = time.perf_counter() - started
+        if report["elapsed"] > 0:
+            report["docs_per_sec"] = report["indexed"] / report["elapsed"]
+        return report
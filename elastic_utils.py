@@ -1,9 +1,9 @@
 from elasticsearch import Elasticsearch
-from config import ELASTICSEARCH_HOST, ELASTICSEARCH_PORT, INDEX_NAME
+from config import ELASTICSEARCH_HOST, ELASTICSEARCH_PORT, ELASTICSEARCH_REQUEST_TIMEOUT, INDEX_NAME, EMBEDDING_DIM
 
 def get_elasticsearch_client():
     """generate Elasticsearch client"""
-    return Elasticsearch(f"http://{ELASTICSEARCH_HOST}:{ELASTICSEARCH_PORT}")
+    return Elasticsearch(f"http://{ELASTICSEARCH_HOST}:{ELASTICSEARCH_PORT}", request_timeout=ELASTICSEARCH_REQUEST_TIMEOUT)
 
 def create_index(client):
     """create index for storing documents"""
@@ -11,7 +11,7 @@ def create_index(client):
         "mappings": {
             "properties": {
                 "content": {"type": "text"},
-                "embedding": {"type": "dense_vector", "dims": 2048},
+                "embedding": {"type": "dense_vector", "dims": EMBEDDING_DIM},
                 "metadata": {"type": "object"}
             }
         }
@@ -0,0 +1,155 @@
+# embedding_reducer.py (임베딩 차원 축소)
+
+import logging
+import os
+import threading
+from typing import Optional
+import numpy as np
+from config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIM,
+    EMBEDDING_REDUCTION_METHOD,
+    EMBEDDING_REDUCER_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+REDUCTION_METHODS = ("chunk_mean", "pca", "random_projection")
+
+
+class EmbeddingReducer:
+    """
+    (N, input_dim) 임베딩 배치를 (N, target_dim)으로 한 번에 축소합니다.
+    - chunk_mean: 연속 구간 평균 (기존 np.array_split 방식과 동일한 결과, 학습 불필요)
+    - pca: 말뭉치 샘플로 학습한 주성분 투영
+    - random_projection: 고정 시드 가우시안 랜덤 투영
+    학습된 변환은 save()로 저장하여 문서와 질의가 같은 변환을 사용하도록 합니다.
+    학습한 임베딩 모델(embedding_model)과 입력 차원도 함께 저장하여 다른 모델의 임베딩에 쓰이지 않게 합니다.
+    입력 차원이 target_dim 이하이면 그대로 반환합니다.
+    """
+
+    def __init__(self, method: str = EMBEDDING_REDUCTION_METHOD, target_dim: int = EMBEDDING_DIM, seed: int = 0,
+                 embedding_model: str = EMBEDDING_MODEL):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"지원하지 않는 차원 축소 방식입니다: {method} (가능: {', '.join(REDUCTION_METHODS)})")
+        self.method = method
+        self.target_dim = target_dim
+        self.seed = seed
+        self.embedding_model = embedding_model
+        self.input_dim: Optional[int] = None
+        self.mean: Optional[np.ndarray] = None
+        self.matrix: Optional[np.ndarray] = None
+
+    @property
+    def requires_fit(self) -> bool:
+        return self.method != "chunk_mean" and self.matrix is None
+
+    def fit(self, embeddings) -> "EmbeddingReducer":
+        X = np.asarray(embeddings, dtype=np.float32)
+        self.input_dim = X.shape[1]
+        if self.input_dim <= self.target_dim or self.method == "chunk_mean":
+            return self
+
+        if self.method == "pca":
+            if X.shape[0] < self.target_dim:
+                raise ValueError(f"PCA 학습에는 최소 {self.target_dim}개의 샘플이 필요합니다. (현재 {X.shape[0]}개)")
+            self.mean = X.mean(axis=0)
+            _, _, vt = np.linalg.svd(X - self.mean, full_matrices=False)
+            self.matrix = np.ascontiguousarray(vt[:self.target_dim].T)
+        else:
+            rng = np.random.default_rng(self.seed)
+            self.mean = np.zeros(self.input_dim, dtype=np.float32)
+            self.matrix = rng.standard_normal((self.input_dim, self.target_dim), dtype=np.float32) / np.sqrt(self.target_dim)
+        return self
+
+    def _chunk_mean(self, X: np.ndarray) -> np.ndarray:
+        n, dim = X.shape
+        if dim % self.target_dim == 0:
+            return X.reshape(n, self.target_dim, dim // self.target_dim).mean(axis=2)
+        # np.array_split과 같은 구간 분할: 앞쪽 (dim % target_dim)개 구간이 1만큼 더 길다
+        size, remainder = divmod(dim, self.target_dim)
+        sizes = np.full(self.target_dim, size, dtype=np.int64)
+        sizes[:remainder] += 1
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        return np.add.reduceat(X, starts, axis=1) / sizes
+
+    def transform(self, embeddings) -> np.ndarray:
+        X = np.asarray(embeddings, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError("transform()은 (N, dim) 형태의 2차원 배열을 받습니다.")
+        if X.shape[1] <= self.target_dim:
+            return X
+        if self.method == "chunk_mean":
+            return self._chunk_mean(X)
+        if self.matrix is None:
+            raise ValueError(f"'{self.method}' 차원 축소는 먼저 fit()으로 학습해야 합니다.")
+        if X.shape[1] != self.input_dim:
+            raise ValueError(f"입력 차원({X.shape[1]})이 학습된 차원({self.input_dim})과 다릅니다.")
+        return (X - self.mean) @ self.matrix
+
+    def transform_one(self, embedding) -> np.ndarray:
+        return self.transform(np.asarray(embedding, dtype=np.float32)[np.newaxis, :])[0]
+
+    def save(self, path: str = EMBEDDING_REDUCER_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {"method": np.array(self.method), "target_dim": np.array(self.target_dim),
+                  "seed": np.array(self.seed), "input_dim": np.array(self.input_dim or 0),
+                  "embedding_model": np.array(self.embedding_model)}
+        if self.matrix is not None:
+            arrays["mean"] = self.mean
+            arrays["matrix"] = self.matrix
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = EMBEDDING_REDUCER_PATH) -> "EmbeddingReducer":
+        with np.load(path) as data:
+            # embedding_model이 없는 이전 형식의 파일은 어떤 모델로 학습했는지 알 수 없음("")
+            model = str(data["embedding_model"]) if "embedding_model" in data else ""
+            reducer = cls(str(data["method"]), int(data["target_dim"]), int(data["seed"]), model)
+            reducer.input_dim = int(data["input_dim"]) or None
+            if "matrix" in data:
+                reducer.mean = data["mean"]
+                reducer.matrix = data["matrix"]
+        return reducer
+
+
+_default_reducer: Optional[EmbeddingReducer] = None
+_default_reducer_lock = threading.Lock()
+
+
+def _mismatch(reducer: EmbeddingReducer) -> Optional[str]:
+    """저장된 변환을 현재 설정에 쓸 수 없는 이유 (쓸 수 있으면 None)"""
+    if reducer.method != EMBEDDING_REDUCTION_METHOD or reducer.target_dim != EMBEDDING_DIM:
+        return (f"저장된 차원 축소 변환({reducer.method}, {reducer.target_dim}차원)이 설정"
+                f"({EMBEDDING_REDUCTION_METHOD}, {EMBEDDING_DIM}차원)과 다릅니다.")
+    # 학습된 투영(PCA/랜덤 투영)은 학습한 모델의 임베딩 공간/차원에서만 의미가 있음
+    if reducer.matrix is not None and reducer.embedding_model != EMBEDDING_MODEL:
+        return (f"저장된 차원 축소 변환은 임베딩 모델 '{reducer.embedding_model or '알 수 없음'}'"
+                f"({reducer.input_dim}차원)으로 학습되었지만 현재 EMBEDDING_MODEL은 '{EMBEDDING_MODEL}'입니다.")
+    return None
+
+
+def get_embedding_reducer(refit_on_mismatch: bool = False) -> EmbeddingReducer:
+    """
+    저장된 변환이 있으면 불러오고, 없으면 설정값으로 새로 만듭니다.
+    저장된 변환의 방식/차원/임베딩 모델이 설정과 다르면 인덱스와 질의가 어긋나므로 에러를 발생시키며,
+    refit_on_mismatch=True(인덱싱)이면 저장된 변환 대신 새 변환을 만들어 다시 학습하게 합니다.
+    """
+    global _default_reducer
+    with _default_reducer_lock:
+        if _default_reducer is None:
+            reducer = None
+            if os.path.exists(EMBEDDING_REDUCER_PATH):
+                reducer = EmbeddingReducer.load(EMBEDDING_REDUCER_PATH)
+                reason = _mismatch(reducer)
+                if reason and refit_on_mismatch:
+                    logger.warning("%s 새 변환을 학습합니다.", reason)
+                    reducer = None
+                elif reason:
+                    raise ValueError(f"{reason} {EMBEDDING_REDUCER_PATH}를 삭제하고 지식 베이스를 다시 인덱싱하세요.")
+            _default_reducer = reducer or EmbeddingReducer()
+        return _default_reducer
@@ -1,56 +1,207 @@
+import hashlib
 import json
+import logging
 import os
+import time
+from itertools import islice
 from document_processor import DocumentProcessor
+from embedding_reducer import get_embedding_reducer
 from ollama_utils import OllamaClient
+from config import (
+    BULK_INDEX_BATCH_SIZE,
+    EMBEDDED_INDEX_DIR,
+    EMBEDDING_REDUCER_PATH,
+    EMBEDDING_REDUCER_FIT_SAMPLES,
+    EMBEDDING_DIM,
+    EMBEDDING_REDUCTION_METHOD,
+    EMBEDDING_MODEL,
+    LOG_LEVEL,
+)
+
+logger = logging.getLogger(__name__)
+
+def knowledge_document_id(cve_id, text, metadata):
+    """
+    CVE ID + 내용 해시로 문서 _id를 만듭니다. 임베딩 모델/차원 설정도 해시에 포함되므로
+    내용이나 임베딩 설정이 바뀐 항목만 새 _id를 갖게 됩니다.
+    """
+    payload = json.dumps({
+        "text": text,
+        "metadata": metadata,
+        "embedding": [EMBEDDING_MODEL, EMBEDDING_REDUCTION_METHOD, EMBEDDING_DIM],
+    }, sort_keys=True, ensure_ascii=False)
+    return f"{cve_id}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
+
+def build_knowledge_document(item):
+    """data.jsonl의 한 항목으로부터 인덱싱할 (문서 id, 텍스트, 메타데이터)를 구성합니다."""
+    cve_id = list(item.keys())[1]
+    behavior = item[cve_id]['file_specific_analysis'][0]['vulnerability_behavior']
+
+    # 텍스트 구성
+    text = f"""
+            CVE ID: {cve_id}
+
+            기능적 의미:
+            - 목적: {behavior['functional_semantics']['purpose']}
+            - 동작: {behavior['functional_semantics']['behavior']}
+
+            취약점 원인:
+            {behavior['vulnerability_knowledge']['vulnerability_causes']}
+
+            해결 방안:
+            {behavior['vulnerability_knowledge']['fixing_solutions']}
+            """
+
+    # 메타데이터 구성
+    metadata = {
+        "cve_id": cve_id,
+        "functional_semantics": behavior["functional_semantics"],
+        "vulnerability_causes": behavior["vulnerability_knowledge"]["vulnerability_causes"],
+        "fixing_solutions": behavior["vulnerability_knowledge"]["fixing_solutions"]
+    }
+    return knowledge_document_id(cve_id, text, metadata), text, metadata
+
+def iter_knowledge_documents(knowledge_file):
+    """JSONL 파일을 한 줄씩 읽어 (문서 id, 텍스트, 메타데이터)를 생성합니다. 동일한 문서가 반복되면 한 번만 생성합니다."""
+    seen_ids = set()
+    with open(knowledge_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                document = build_knowledge_document(json.loads(line))
+                if document[0] not in seen_ids:
+                    seen_ids.add(document[0])
+                    yield document
+
+def prepare_embedding_reducer(knowledge_file, ollama_client):
+    """
+    PCA/랜덤 투영처럼 학습이 필요한 차원 축소 방식이면 말뭉치 앞부분 샘플로 학습합니다.
+    변환은 저장되어 이후 질의 임베딩에도 동일하게 적용됩니다.
+    저장된 변환이 다른 임베딩 모델/설정으로 학습된 것이면 버리고 다시 학습합니다.
+    """
+    reducer = get_embedding_reducer(refit_on_mismatch=True)
+    if reducer.requires_fit:
+        sample = [text for _, text, _ in islice(iter_knowledge_documents(knowledge_file), EMBEDDING_REDUCER_FIT_SAMPLES)]
+        logger.info("임베딩 차원 축소(%s, %d차원) 학습 중... (샘플 %d건)", reducer.method, reducer.target_dim, len(sample))
+        reducer.fit(ollama_client.generate_embeddings(sample))
+    reducer.save(EMBEDDING_REDUCER_PATH)
+    return reducer
+
+def index_knowledge_base(batch_size=None, full=False):
+    """
+    knowledge/data.jsonl 파일의 취약점 지식을 Elasticsearch에 증분 인덱싱합니다.
+    _id(CVE ID + 내용 해시)가 이미 인덱스에 있으면 건너뛰고, 새로 생기거나 바뀐 항목만 임베딩하며,
+    파일에서 사라진 항목(이전 버전 포함)은 삭제합니다. full=True 이면 모든 항목을 다시 임베딩합니다.
+    """
 
-def index_knowledge_base():
-    """knowledge/data.jsonl 파일의 취약점 지식을 Elasticsearch에 인덱싱합니다."""
-    
     # 파일 존재 여부 확인
     knowledge_file = "knowledge/data.jsonl"
-    if not os.path.exists(knowledge_file): 
-        print(f"\n오류: 지식 베이스 파일을 찾을 수 없습니다: {knowledge_file}")  
-        print("파일이 올바른 위치에 있는지 확인해주세요.")
+    if not os.path.exists(knowledge_file):
+        logger.error("오류: 지식 베이스 파일을 찾을 수 없습니다: %s", knowledge_file)
+        logger.error("파일이 올바른 위치에 있는지 확인해주세요.")
         return
-    
+
     processor = DocumentProcessor()
+    prepare_embedding_reducer(knowledge_file, processor.ollama_client)
+
+    logger.info("취약점 지식 인덱싱 시작...")
+
+    existing_ids = set(processor.fetch_indexed_ids())
+    seen_ids = set()
+    unchanged = 0
+
+    def iter_changed_documents():
+        nonlocal unchanged
+        for doc_id, text, metadata in iter_knowledge_documents(knowledge_file):
+            seen_ids.add(doc_id)
+            if doc_id in existing_ids and not full:
+                unchanged += 1
+                continue
+            yield doc_id, text, metadata
+
+    # 배치 임베딩 + bulk API로 새로 생기거나 바뀐 문서만 처리 및 인덱싱
+    kwargs = {"batch_size": batch_size} if batch_size else {}
+    report = processor.bulk_index_texts(iter_changed_documents(), **kwargs)
+
+    # 실패가 있으면 이전 버전을 지우지 않고 남겨 둔다 (다음 실행에서 다시 시도)
+    stale_ids = existing_ids - seen_ids
+    if stale_ids and report["failed"] == 0:
+        delete_report = processor.bulk_index_texts((), delete_ids=stale_ids, **kwargs)
+        report["deleted"] = delete_report["deleted"]
+        report["failed"] += delete_report["failed"]
+        report["failed_items"].extend(delete_report["failed_items"])
+    elif stale_ids:
+        logger.warning("인덱싱 실패가 있어 오래된 문서 %d건은 삭제하지 않았습니다.", len(stale_ids))
+    report["unchanged"] = unchanged
+
+    logger.info("인덱싱 완료: 신규/변경 %d건, 변경 없음 %d건, 삭제 %d건, 실패: %d건",
+                report['indexed'], unchanged, report['deleted'], report['failed'])
+    logger.info("소요 시간: %.1f초 (%.1f docs/sec)", report['elapsed'], report['docs_per_sec'])
+    for failed in report["failed_items"]:
+        logger.warning("실패 항목: %s", json.dumps(failed, ensure_ascii=False, default=str)[:500])
+
+    logger.info("모든 취약점 지식 인덱싱 완료!")
+    return report
+
+def build_embedded_knowledge_index(batch_size=None, index_dir=EMBEDDED_INDEX_DIR, full=False):
+    """
+    knowledge/data.jsonl로부터 Elasticsearch 없이 사용할 내장 검색 인덱스(vector_store)를 생성합니다.
+    기존 인덱스에 같은 _id가 있으면 저장된 임베딩을 재사용하고, 새로 생기거나 바뀐 항목만 임베딩합니다.
+    """
+    from vector_store import build_embedded_index, load_existing_vectors
+
+    knowledge_file = "knowledge/data.jsonl"
+    if not os.path.exists(knowledge_file):
+        logger.error("오류: 지식 베이스 파일을 찾을 수 없습니다: %s", knowledge_file)
+        logger.error("파일이 올바른 위치에 있는지 확인해주세요.")
+        return
+
     ollama_client = OllamaClient()
-    
-    print("취약점 지식 인덱싱 시작...")
-    
-    # JSONL 파일 읽기
-    with open("knowledge/data.jsonl", "r", encoding="utf-8") as f:
-        for line in f:
-            item = json.loads(line)
-            
-            # 텍스트 구성
-            text = f"""
-            CVE ID: {list(item.keys())[1]}
-            
-            기능적 의미:
-            - 목적: {item[list(item.keys())[1]]['file_specific_analysis'][0]['vulnerability_behavior']['functional_semantics']['purpose']}
-            - 동작: {item[list(item.keys())[1]]['file_specific_analysis'][0]['vulnerability_behavior']['functional_semantics']['behavior']}
-            
-            취약점 원인:
-            {item[list(item.keys())[1]]['file_specific_analysis'][0]['vulnerability_behavior']['vulnerability_knowledge']['vulnerability_causes']}
-            
-            해결 방안:
-            {item[list(item.keys())[1]]['file_specific_analysis'][0]['vulnerability_behavior']['vulnerability_knowledge']['fixing_solutions']}
-            """
-            
-            # 메타데이터 구성
-            metadata = {
-                "cve_id": list(item.keys())[1],
-                "functional_semantics": item[list(item.keys())[1]]["file_specific_analysis"][0]["vulnerability_behavior"]["functional_semantics"],
-                "vulnerability_causes": item[list(item.keys())[1]]["file_specific_analysis"][0]["vulnerability_behavior"]["vulnerability_knowledge"]["vulnerability_causes"],
-                "fixing_solutions": item[list(item.keys())[1]]["file_specific_analysis"][0]["vulnerability_behavior"]["vulnerability_knowledge"]["fixing_solutions"]
-            }
-            
-            # 문서 처리 및 인덱싱
-            processor.process_and_index_text(text, metadata)
-            print(f"인덱싱 완료: {list(item.keys())[1]}")
-    
-    print("모든 취약점 지식 인덱싱 완료!")
+    reducer = prepare_embedding_reducer(knowledge_file, ollama_client)
+    batch_size = batch_size or BULK_INDEX_BATCH_SIZE
+    existing_vectors = {} if full else load_existing_vectors(index_dir)
+    counts = {"embedded": 0, "unchanged": 0}
+
+    def iter_embedded_documents():
+        batch = []
+        for doc_id, text, metadata in iter_knowledge_documents(knowledge_file):
+            if doc_id in existing_vectors:
+                counts["unchanged"] += 1
+                yield doc_id, text, metadata, existing_vectors[doc_id]
+                continue
+            batch.append((doc_id, text, metadata))
+            if len(batch) >= batch_size:
+                yield from embed_batch(batch)
+                batch = []
+        if batch:
+            yield from embed_batch(batch)
+
+    def embed_batch(batch):
+        embeddings = reducer.transform(ollama_client.generate_embeddings([text for _, text, _ in batch]))
+        counts["embedded"] += len(batch)
+        for (doc_id, text, metadata), embedding in zip(batch, embeddings):
+            yield doc_id, text, metadata, embedding
+
+    logger.info("내장 검색 인덱스 생성 시작... (%s)", index_dir)
+    started = time.perf_counter()
+    count = build_embedded_index(iter_embedded_documents(), index_dir=index_dir)
+    elapsed = time.perf_counter() - started
+    logger.info("내장 검색 인덱스 생성 완료: %d건 (신규/변경 %d건, 재사용 %d건), %.1f초 (%.1f docs/sec)",
+                count, counts['embedded'], counts['unchanged'], elapsed, count / elapsed if elapsed else 0)
+    return count
 
 if __name__ == "__main__":
-    index_knowledge_base() 
\ No newline at end of file
+    import argparse
+    from log_utils import configure_logging
+    parser = argparse.ArgumentParser(description='취약점 지식 베이스 인덱싱')
+    parser.add_argument('--batch-size', type=int, help='임베딩/bulk 요청 당 문서 수')
+    parser.add_argument('--backend', choices=['elasticsearch', 'embedded'], default='elasticsearch',
+                        help='elasticsearch 인덱스 또는 내장 검색 인덱스(knowledge/embedded_index) 생성')
+    parser.add_argument('--full', action='store_true', help='변경 여부와 관계없이 모든 항목을 다시 임베딩')
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help=f'로그 레벨 (기본값: {LOG_LEVEL})')
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+    if args.backend == 'embedded':
+        build_embedded_knowledge_index(batch_size=args.batch_size, full=args.full)
+    else:
+        index_knowledge_base(batch_size=args.batch_size, full=args.full)
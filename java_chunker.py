@@ -0,0 +1,268 @@
+# java_chunker.py (큰 Java 파일을 메소드 단위로 나누고, 관련도 높은 메소드만 골라 분석)
+
+import bisect
+import re
+from typing import Any, Dict, Iterable, List, Optional
+from vector_store import BM25Index, _flatten_text
+
+_TYPE_KEYWORDS = re.compile(r'\b(class|interface|enum|record)\b')
+_ANNOTATION = re.compile(r'@[\w$.]+\s*(\([^()]*\))?')
+_IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+_CAMEL_PARTS = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+_LINE_NUMBER = re.compile(r'\d+')
+_NON_CALL_KEYWORDS = {"if", "for", "while", "switch", "catch", "synchronized", "try", "return", "new"}
+
+# 슬라이스 결과에서 원본 줄 번호로 되돌릴 키 (분석 결과의 vulnerable_lines, 수리 계획의 line_number)
+LINE_NUMBER_KEYS = ("vulnerable_lines", "line_number")
+
+
+def _mask_comments_and_strings(source: str) -> str:
+    """주석과 문자열/문자 리터럴의 내용을 공백으로 바꿉니다 (줄바꿈과 길이는 유지)."""
+    out = list(source)
+    i, n = 0, len(source)
+    while i < n:
+        ch = source[i]
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            end = n if end == -1 else end
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+        elif source.startswith('"""', i):
+            end = source.find('"""', i + 3)
+            end = n if end == -1 else end + 3
+        elif ch in ('"', "'"):
+            end = i + 1
+            while end < n and source[end] != ch and source[end] != "\n":
+                end += 2 if source[end] == "\\" else 1
+            end = min(end + 1, n)
+        else:
+            i += 1
+            continue
+        for j in range(i, end):
+            if out[j] != "\n":
+                out[j] = " "
+        i = end
+    return "".join(out)
+
+
+def _code_terms(text: str) -> str:
+    """식별자를 camelCase 단위로도 나눠 덧붙입니다 (예: parseArray -> parseArray parse array)."""
+    identifiers = _IDENTIFIER.findall(text)
+    parts = [part for identifier in identifiers for part in _CAMEL_PARTS.findall(identifier)]
+    return " ".join(identifiers + parts)
+
+
+class CodeUnit:
+    """메소드/생성자/초기화 블록 하나 (줄 번호는 원본 파일 기준, 1부터 시작, 끝 줄 포함)."""
+
+    __slots__ = ("name", "kind", "owner", "start_line", "body_line", "end_line")
+
+    def __init__(self, name: str, kind: str, owner: str, start_line: int, body_line: int, end_line: int):
+        self.name = name
+        self.kind = kind
+        self.owner = owner
+        self.start_line = start_line
+        self.body_line = body_line
+        self.end_line = end_line
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.owner}.{self.name}" if self.owner else self.name
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.qualified_name, "kind": self.kind, "lines": f"{self.start_line}-{self.end_line}"}
+
+
+class CodeSlice:
+    """
+    원본 파일에서 고른 줄만 이어붙인 코드. line_map[i]는 슬라이스 i+1번째 줄의 원본 줄 번호이며,
+    생략 표시(// ...) 줄은 None입니다.
+    """
+
+    def __init__(self, text: str, line_map: List[Optional[int]], units: List[CodeUnit], total_units: int,
+                 total_lines: int):
+        self.text = text
+        self.line_map = line_map
+        self.units = units
+        self.total_units = total_units
+        self.total_lines = total_lines
+
+    def to_original_line(self, line: int) -> Optional[int]:
+        """슬라이스 줄 번호를 원본 줄 번호로 바꿉니다. 생략 표시 줄은 다음 코드 줄로, 범위 밖이면 None."""
+        if line < 1 or line > len(self.line_map):
+            return None
+        for original in self.line_map[line - 1:]:
+            if original is not None:
+                return original
+        return None
+
+    def _remap_value(self, value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int):
+            original = self.to_original_line(value)
+            return value if original is None else original
+        if isinstance(value, str):
+            def replace(match):
+                original = self.to_original_line(int(match.group()))
+                return match.group() if original is None else str(original)
+            return _LINE_NUMBER.sub(replace, value)
+        return value
+
+    def remap_lines(self, value):
+        """LLM 결과(dict/list) 안의 vulnerable_lines / line_number 값을 원본 줄 번호로 바꾼 사본을 반환합니다."""
+        if isinstance(value, dict):
+            return {key: self._remap_value(item) if key in LINE_NUMBER_KEYS else self.remap_lines(item)
+                    for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.remap_lines(item) for item in value]
+        return value
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "analyzed_units": [unit.to_dict() for unit in self.units],
+            "total_units": self.total_units,
+            "slice_lines": len(self.line_map),
+            "total_lines": self.total_lines,
+        }
+
+
+class JavaSource:
+    """
+    중괄호 깊이만 추적하는 가벼운 파서로 Java 소스를 메소드 단위(CodeUnit)로 나눕니다.
+    주석/문자열은 먼저 가리므로 그 안의 중괄호는 무시되며, 메소드 안의 익명/지역 클래스는
+    바깥 메소드에 포함됩니다. 메소드 바깥의 코드(package, import, 클래스 선언, 필드)는 context로 유지합니다.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.lines = source.split("\n")
+        masked = _mask_comments_and_strings(source)
+        self._masked_lines = masked.split("\n")
+        self._line_starts = [0]
+        for line in self.lines[:-1]:
+            self._line_starts.append(self._line_starts[-1] + len(line) + 1)
+        self.units = self._scan(masked)
+
+        in_unit = set()
+        for unit in self.units:
+            in_unit.update(range(unit.start_line, unit.end_line + 1))
+        # 빈 줄과 주석만 있는 줄은 context에서 제외
+        self.context_lines = [number for number in range(1, len(self.lines) + 1)
+                              if number not in in_unit and self._masked_lines[number - 1].strip()]
+
+    def _line_of(self, offset: int) -> int:
+        return bisect.bisect_right(self._line_starts, offset)
+
+    def _scan(self, masked: str) -> List[CodeUnit]:
+        units = []
+        stack = []  # (종류, 이름, 시작 오프셋, '{' 오프셋)
+        statement_start = 0
+        parens = 0
+        for pos, ch in enumerate(masked):
+            # 괄호 안의 중괄호/세미콜론(어노테이션 배열 값, 인자로 넘긴 람다, for(;;))은 구조에 영향을 주지 않음
+            if ch == "(":
+                parens += 1
+            elif ch == ")":
+                parens = max(0, parens - 1)
+            elif parens:
+                continue
+            elif ch == ";":
+                statement_start = pos + 1
+            elif ch == "{":
+                header = masked[statement_start:pos]
+                stripped = " ".join(_ANNOTATION.sub(" ", header).split())
+                parent = stack[-1][0] if stack else None
+                name = ""
+                type_match = _TYPE_KEYWORDS.search(stripped)
+                if type_match and parent in (None, "type"):
+                    kind = "type"
+                    rest = _IDENTIFIER.findall(stripped[type_match.end():])
+                    name = rest[0] if rest else ""
+                elif parent == "type" and "(" in stripped and "=" not in stripped.split("(", 1)[0]:
+                    identifiers = _IDENTIFIER.findall(stripped.split("(", 1)[0])
+                    name = identifiers[-1] if identifiers else ""
+                    kind = "block" if name in _NON_CALL_KEYWORDS else "method"
+                elif parent == "type" and stripped in ("", "static"):
+                    kind, name = "initializer", "static" if stripped else "<init-block>"
+                else:
+                    kind = "block"
+                start = statement_start + len(header) - len(header.lstrip())
+                stack.append((kind, name, start, pos))
+                statement_start = pos + 1
+            elif ch == "}":
+                if stack:
+                    kind, name, start, open_pos = stack.pop()
+                    if kind in ("method", "initializer") and stack and stack[-1][0] == "type":
+                        owner = ".".join(entry[1] for entry in stack if entry[0] == "type")
+                        if kind == "method" and name == stack[-1][1]:
+                            kind = "constructor"
+                        units.append(CodeUnit(name, kind, owner, self._line_of(start),
+                                              self._line_of(open_pos), self._line_of(pos)))
+                statement_start = pos + 1
+        return units
+
+    def outline(self) -> str:
+        """context와 각 메소드의 시그니처만 남기고 본문은 생략한 코드 (CodeT5 purpose 요약의 입력)."""
+        keep = set(self.context_lines)
+        for unit in self.units:
+            keep.update(range(unit.start_line, unit.body_line + 1))
+        return self._render(sorted(keep))[0]
+
+    def select(self, query_text: str, top_units: int) -> CodeSlice:
+        """query_text(검색된 CVE 정보)와 BM25 점수가 높은 메소드 top_units개와 context로 슬라이스를 만듭니다."""
+        if query_text.strip():
+            index = BM25Index(_code_terms(self._unit_text(unit)) for unit in self.units)
+            scores = index.scores(_code_terms(query_text) + " " + query_text)
+        else:
+            scores = [0.0] * len(self.units)
+        # 점수가 같으면(관련 정보가 없으면) 긴 메소드를 우선
+        ranked = sorted(range(len(self.units)),
+                        key=lambda idx: (-float(scores[idx]), -(self.units[idx].end_line - self.units[idx].start_line)))
+        selected = sorted((self.units[idx] for idx in ranked[:top_units]), key=lambda unit: unit.start_line)
+
+        keep = set(self.context_lines)
+        for unit in selected:
+            keep.update(range(unit.start_line, unit.end_line + 1))
+        text, line_map = self._render(sorted(keep))
+        return CodeSlice(text, line_map, selected, len(self.units), len(self.lines))
+
+    def _unit_text(self, unit: CodeUnit) -> str:
+        return "\n".join(self.lines[unit.start_line - 1:unit.end_line])
+
+    def _render(self, line_numbers: Iterable[int]):
+        """주어진 원본 줄만 순서대로 이어붙이고, 건너뛴 구간에는 생략 표시 줄을 넣습니다."""
+        rendered, line_map = [], []
+        previous = 0
+        for number in line_numbers:
+            line = self.lines[number - 1]
+            if number > previous + 1 and previous:
+                indent = line[:len(line) - len(line.lstrip())]
+                rendered.append(f"{indent}// ...")
+                line_map.append(None)
+            rendered.append(line)
+            line_map.append(number)
+            previous = number
+        return "\n".join(rendered), line_map
+
+
+def relevance_query(rag_context: Dict[str, Any] = None, functional_semantics: Dict[str, Any] = None) -> str:
+    """메소드 순위를 매길 질의 텍스트 (검색된 CVE의 원인/해결 방안/기능 설명 + 추출한 기능적 의미)."""
+    parts = []
+    if rag_context:
+        for key in ("vulnerability_causes", "fixing_solutions", "functional_semantics"):
+            parts.append(_flatten_text(rag_context.get(key, "")))
+    if functional_semantics:
+        parts.append(_flatten_text(functional_semantics))
+    return " ".join(part for part in parts if part)
+
+
+def parse_java_source(code: str, min_lines: int) -> Optional[JavaSource]:
+    """min_lines줄 이상이고 메소드가 두 개 이상 발견되는 경우에만 JavaSource를 반환합니다 (그 외에는 None)."""
+    if code.count("\n") + 1 < min_lines:
+        return None
+    source = JavaSource(code)
+    if len(source.units) < 2:
+        return None
+    return source
@@ -0,0 +1,231 @@
+# json_stream.py (스트리밍 LLM 응답에서 JSON 객체 추출 / 잘린 JSON 복구 / 스키마 검증)
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_THINK_BLOCK = re.compile(r'<think>.*?(</think>|$)', re.DOTALL)
+# 잘린 JSON을 복구할 때 시도할 최대 절단 지점 수 (뒤에서부터)
+_MAX_REPAIR_CUTS = 64
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _partial_suffix(text: str, tag: str) -> str:
+    """text 끝부분 중 tag의 앞부분과 일치하는 가장 긴 부분 (청크 경계에서 잘린 태그 보존용)"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if tag.startswith(text[-size:]):
+            return text[-size:]
+    return ""
+
+
+class StreamingJSONExtractor:
+    """
+    LLM이 생성하는 텍스트 청크를 순서대로 받아, 최상위 JSON 객체가 완성되는 즉시 파싱합니다.
+    - JSON 객체 바깥의 <think>...</think> 블록은 도착하는 대로 건너뜁니다 (태그가 청크 경계에서 잘려도 처리).
+    - 문자열/이스케이프를 고려해 중괄호 균형을 추적하고, 균형이 맞으면 json.loads로 검증합니다 (trailing comma 허용).
+    - 검증에 실패하면(설명문 속 중괄호 등) 해당 '{' 다음 글자부터 다시 찾습니다.
+    feed()가 True를 반환하면 result에 dict가 들어 있으며, 이후 토큰은 더 받을 필요가 없습니다.
+    """
+
+    def __init__(self):
+        self.result: Optional[Dict[str, Any]] = None
+        self._pending = ""
+        self._in_think = False
+        self._candidate = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+        # finish()에서 잘린 객체를 복구해 결과를 얻었으면 True
+        self.repaired = False
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """
+        스트림이 끝난 뒤 호출합니다. 완성된 객체가 없으면(생성 길이 제한, 연결 끊김 등으로 잘린 경우)
+        진행 중이던 후보 객체를 repair_json으로 복구해 반환합니다.
+        """
+        if self.result is None and self._candidate:
+            repaired = repair_json("".join(self._candidate))
+            if repaired is not None:
+                self.result = repaired
+                self.repaired = True
+        return self.result
+
+    def _reset_candidate(self):
+        self._candidate = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.result is not None:
+            return True
+        text = self._pending + chunk
+        self._pending = ""
+        i = 0
+        while i < len(text):
+            if self._in_think:
+                end = text.find(THINK_CLOSE, i)
+                if end == -1:
+                    self._pending = _partial_suffix(text[i:], THINK_CLOSE)
+                    return False
+                i = end + len(THINK_CLOSE)
+                self._in_think = False
+                continue
+
+            if self._depth == 0:
+                brace = text.find("{", i)
+                think = text.find(THINK_OPEN, i)
+                if think != -1 and (brace == -1 or think < brace):
+                    i = think + len(THINK_OPEN)
+                    self._in_think = True
+                    continue
+                if brace == -1:
+                    self._pending = _partial_suffix(text[i:], THINK_OPEN)
+                    return False
+                i = brace
+
+            # JSON 후보 객체 내부 스캔
+            start = i
+            while i < len(text):
+                ch = text[i]
+                i += 1
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == "\\":
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                elif ch == '"':
+                    self._in_string = True
+                elif ch == "{":
+                    self._depth += 1
+                elif ch == "}":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        break
+            self._candidate.append(text[start:i])
+            if self._depth != 0:
+                return False
+
+            candidate = "".join(self._candidate)
+            self._reset_candidate()
+            # 객체 끝의 쉼표(trailing comma)는 허용
+            parsed = _loads_object(candidate)
+            if parsed is not None:
+                self.result = parsed
+                return True
+            # 유효한 JSON이 아니면 여는 중괄호 다음부터 다시 탐색
+            text = candidate[1:] + text[i:]
+            i = 0
+        return False
+
+
+def _loads_object(text: str) -> Optional[Dict[str, Any]]:
+    for candidate in (text, _TRAILING_COMMA.sub(r'\1', text)):
+        try:
+            parsed = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+def repair_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    LLM 응답에서 최상위 JSON 객체를 관대하게 추출합니다. 실패하면 None.
+    - <think> 블록과 코드 펜스 밖의 설명문은 무시하고, 객체 끝의 쉼표(trailing comma)는 제거합니다.
+    - 객체가 중간에 잘렸으면 열린 문자열/배열/객체를 닫고, 그래도 안 되면 마지막으로 완성된
+      멤버/원소 경계까지 잘라낸 뒤 닫아서 파싱합니다.
+    """
+    text = _THINK_BLOCK.sub("", text)
+    start = text.find("{")
+    while start != -1:
+        stack = []
+        in_string = escape = False
+        cuts = []  # (잘라낼 위치, 그 시점의 닫는 괄호 스택)
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                stack.append("}" if ch == "{" else "]")
+                cuts.append((i + 1, tuple(stack)))
+            elif ch in "}]":
+                if not stack or stack[-1] != ch:
+                    break
+                stack.pop()
+                if not stack:
+                    parsed = _loads_object(text[start:i + 1])
+                    if parsed is not None:
+                        return parsed
+                    break
+                cuts.append((i + 1, tuple(stack)))
+            elif ch == ",":
+                cuts.append((i, tuple(stack)))
+        else:
+            # 끝까지 닫히지 않은 객체: 잘린 출력으로 보고 복구
+            body = text[start:] + ('"' if in_string else "")
+            candidates = [(body.rstrip().rstrip(","), tuple(stack))]
+            candidates += [(text[start:cut], closers) for cut, closers in reversed(cuts[-_MAX_REPAIR_CUTS:])]
+            for prefix, closers in candidates:
+                parsed = _loads_object(prefix + "".join(reversed(closers)))
+                if parsed is not None:
+                    return parsed
+            return None
+        start = text.find("{", start + 1)
+    return None
+
+
+def schema_error(value: Any, schema: Dict[str, Any], path: str = "$") -> Optional[str]:
+    """
+    value가 JSON 스키마의 type / required / properties / items를 만족하는지 검사합니다.
+    만족하면 None, 아니면 첫 번째 문제를 설명하는 문자열을 반환합니다 (enum 등 나머지 키워드는 검사하지 않음).
+    """
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(isinstance(value, _JSON_TYPES[name]) and not (isinstance(value, bool) and name in ("integer", "number"))
+                   for name in types):
+            return f"{path}: expected {' or '.join(types)}"
+    if isinstance(value, dict):
+        for key in schema.get("required", ()):
+            if key not in value:
+                return f"{path}: missing '{key}'"
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                error = schema_error(value[key], sub_schema, f"{path}.{key}")
+                if error:
+                    return error
+    if isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            error = schema_error(item, schema["items"], f"{path}[{index}]")
+            if error:
+                return error
+    return None
@@ -0,0 +1,126 @@
+# llm_cache.py (LLM 응답 캐시)
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from config import LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES
+
+
+def make_cache_key(model: str, prompt: str, temperature: float, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    (model, prompt, temperature, options)의 내용 해시를 캐시 키로 사용합니다.
+    options에는 응답 내용에 영향을 주는 요청 설정(format 스키마, 스트림 조기 종료 여부 등)을 넣습니다.
+    """
+    payload = json.dumps({
+        "model": model,
+        "prompt": prompt,
+        "temperature": temperature,
+        "options": options or {},
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite 기반의 영속 LLM 응답 캐시.
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 항목부터 제거(LRU)하며,
+    read_only=True 이면 조회만 하고 기록/접근 시각 갱신은 하지 않습니다.
+    전체 크기는 열 때 한 번 계산한 뒤 기록/삭제할 때마다 갱신하므로 put()은 테이블 전체를 읽지 않습니다.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES, read_only: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._total_bytes = 0
+
+        if read_only:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"캐시 파일을 찾을 수 없습니다: {path}")
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            self._conn.commit()
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            if not self.read_only:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        if self.read_only:
+            return
+        size = len(response.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            # 같은 키를 덮어쓰면 이전 응답의 크기만큼 뺀다
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.stats["writes"] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """전체 크기가 max_bytes 이하가 될 때까지 last_access가 가장 오래된 항목을 삭제합니다."""
+        victims = []
+        total = self._total_bytes
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._total_bytes = total
+        self.stats["evictions"] += len(victims)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            if not self.read_only:
+                # 다른 프로세스가 같은 파일에 기록했을 수 있으므로 통계를 낼 때 실제 크기로 다시 맞춘다
+                self._total_bytes = total
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "entries": count,
+            "total_bytes": total,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        })
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
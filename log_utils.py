@@ -0,0 +1,204 @@
+# log_utils.py (레벨 기반 로깅, ID별 로그 파일, 프롬프트/응답 압축 보관)
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+CONSOLE_FORMAT = "%(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+# 요청 단위 로그가 많은 외부 라이브러리 (DEBUG가 아니면 경고 이상만 출력)
+_NOISY_LOGGERS = ("httpx", "httpcore", "urllib3", "elastic_transport", "elasticsearch")
+
+# 현재 처리 중인 샘플(ID). 스레드/asyncio 태스크마다 독립적이며 asyncio.to_thread로 넘긴 작업에도 전달됨
+_current_sample: ContextVar[Optional[str]] = ContextVar("current_sample", default=None)
+
+_sample_handler: Optional["SampleFileHandler"] = None
+_prompt_archive: Optional["PromptArchive"] = None
+_installed_handlers = []
+
+
+def _parse_level(level) -> int:
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"알 수 없는 로그 레벨입니다: {level}")
+    return value
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """출력 시점의 sys.stdout에 기록합니다 (OrderedTaskOutput이 교체한 stdout으로도 출력되도록)."""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class SampleFileHandler(logging.Handler):
+    """현재 샘플(ID)의 로그를 <log_dir>/<ID>.log에 기록합니다. 샘플 밖에서 발생한 로그는 무시합니다."""
+
+    def __init__(self, log_dir: str, level=logging.DEBUG):
+        super().__init__(level)
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_dir = log_dir
+        self._files = {}
+
+    def open_sample(self, sample_id: str) -> None:
+        f = open(os.path.join(self.log_dir, f"{sample_id}.log"), "w", encoding="utf-8")
+        with self.lock:
+            self._files[sample_id] = f
+
+    def close_sample(self, sample_id: str) -> None:
+        with self.lock:
+            f = self._files.pop(sample_id, None)
+        if f is not None:
+            f.close()
+
+    def emit(self, record):
+        sample_id = _current_sample.get()
+        if sample_id is None:
+            return
+        f = self._files.get(sample_id)
+        if f is None:
+            return
+        try:
+            f.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        with self.lock:
+            files, self._files = list(self._files.values()), {}
+        for f in files:
+            f.close()
+        super().close()
+
+
+class PromptArchive:
+    """LLM 프롬프트/응답을 gzip 압축 JSONL로 보관합니다 (디버깅용, 한 줄에 호출 하나)."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # 이어쓰기는 새 gzip 멤버로 추가되며, gzip/zcat으로 전체를 그대로 읽을 수 있다
+        self._file = gzip.open(path, "at", encoding="utf-8")
+
+    def record(self, **fields: Any) -> None:
+        line = json.dumps(fields, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def configure_logging(level="INFO", log_dir: str = None, sample_level="DEBUG", prompt_archive: str = None) -> None:
+    """
+    콘솔(stdout) 로그 레벨을 설정하고, log_dir이 주어지면 샘플별 로그 파일을,
+    prompt_archive가 주어지면 프롬프트/응답 압축 보관을 활성화합니다.
+    둘 다 비활성화되어 있으면 DEBUG 로그는 isEnabledFor 검사만으로 건너뜁니다.
+    """
+    global _sample_handler, _prompt_archive
+    root = logging.getLogger()
+    for handler in _installed_handlers:
+        root.removeHandler(handler)
+        handler.close()
+    _installed_handlers.clear()
+    if _prompt_archive is not None:
+        _prompt_archive.close()
+        _prompt_archive = None
+    _sample_handler = None
+
+    console_level = _parse_level(level)
+    console = _StdoutHandler()
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    _installed_handlers.append(console)
+    root_level = console_level
+
+    if log_dir:
+        file_level = _parse_level(sample_level)
+        _sample_handler = SampleFileHandler(log_dir, file_level)
+        _sample_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        _installed_handlers.append(_sample_handler)
+        root_level = min(root_level, file_level)
+
+    for handler in _installed_handlers:
+        root.addHandler(handler)
+    root.setLevel(root_level)
+    for name in _NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.DEBUG if console_level <= logging.DEBUG else logging.WARNING)
+
+    if prompt_archive:
+        _prompt_archive = PromptArchive(prompt_archive)
+
+
+@atexit.register
+def _close_prompt_archive():
+    if _prompt_archive is not None:
+        _prompt_archive.close()
+
+
+@contextmanager
+def sample_logging(sample_id):
+    """블록 안의 로그를 해당 샘플(ID)의 것으로 표시하고, 샘플별 로그 파일이 켜져 있으면 파일에도 기록합니다."""
+    sample_id = str(sample_id)
+    token = _current_sample.set(sample_id)
+    handler = _sample_handler
+    if handler is not None:
+        handler.open_sample(sample_id)
+    try:
+        yield
+    finally:
+        if handler is not None:
+            handler.close_sample(sample_id)
+        _current_sample.reset(token)
+
+
+class lazy_json:
+    """로그 인자로 넘기면 실제로 출력될 때만 json.dumps를 수행합니다. (예: logger.debug("%s", lazy_json(result)))"""
+
+    __slots__ = ("value", "indent")
+
+    def __init__(self, value: Any, indent: int = 2):
+        self.value = value
+        self.indent = indent
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, indent=self.indent, ensure_ascii=False, default=str)
+
+
+def current_sample_id() -> Optional[str]:
+    return _current_sample.get()
+
+
+def archive_llm_call(stage: str, prompt: str, response: str, **fields: Any) -> None:
+    """프롬프트 보관이 켜져 있으면 LLM 호출 하나를 기록합니다. 꺼져 있으면 아무 일도 하지 않습니다."""
+    archive = _prompt_archive
+    if archive is None:
+        return
+    archive.record(timestamp=time.time(), sample_id=_current_sample.get(), stage=stage,
+                   prompt=prompt, response=response, **fields)
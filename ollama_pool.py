@@ -0,0 +1,190 @@
+# ollama_pool.py (여러 Ollama 호스트 사이의 부하 분산 / 헬스 체크 / 장애 조치)
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import OLLAMA_HOSTS, OLLAMA_HEALTH_CHECK_INTERVAL, OLLAMA_FAILURE_THRESHOLD, OLLAMA_HOST_AFFINITY
+
+logger = logging.getLogger(__name__)
+
+# 헬스 체크에 사용하는 엔드포인트 (설치된 모델 목록을 함께 반환)
+HEALTH_CHECK_PATH = "/api/tags"
+# 기억하는 (affinity 키, 모델) -> 호스트 수 (오래 쓰이지 않은 것부터 잊음)
+AFFINITY_CACHE_SIZE = 4096
+
+# 현재 샘플의 호스트 선호 키. 스레드/asyncio 태스크마다 독립적이며 asyncio.to_thread로 넘긴 작업에도 전달됨
+_affinity_key: ContextVar[Optional[str]] = ContextVar("ollama_host_affinity", default=None)
+
+
+def affinity_key(text: str) -> str:
+    """코드 등 샘플을 대표하는 텍스트로 affinity 키를 만듭니다."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+@contextmanager
+def host_affinity(key: Optional[str]):
+    """
+    블록 안의 Ollama 요청을 같은 키로 표시합니다. 풀은 같은 키(와 모델)의 요청을 직전에 사용한 정상 호스트로 보내,
+    한 샘플의 단계들(같은 코드 접두부)이 그 호스트의 KV 캐시를 재사용하게 합니다. key가 None이면 선호 없음.
+    """
+    token = _affinity_key.set(key if OLLAMA_HOST_AFFINITY else None)
+    try:
+        yield
+    finally:
+        _affinity_key.reset(token)
+
+
+def current_affinity() -> Optional[str]:
+    return _affinity_key.get()
+
+
+def _model_key(model: str) -> str:
+    """Ollama는 태그를 생략한 모델 이름을 ":latest"로 취급합니다."""
+    return model if ":" in model else f"{model}:latest"
+
+
+def parse_tags(payload: Dict[str, Any]) -> List[str]:
+    """/api/tags 응답에서 모델 이름 목록을 꺼냅니다."""
+    return [item.get("name") or item.get("model") for item in payload.get("models", [])
+            if item.get("name") or item.get("model")]
+
+
+class OllamaEndpoint:
+    """풀에 속한 Ollama 호스트 하나의 상태 (진행 중인 요청 수, 정상 여부, 설치된 모델)."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        # 헬스 체크로 확인한 모델 목록. 확인 전(또는 /api/tags를 지원하지 않으면) None이며 모든 모델 요청을 받음
+        self.models: Optional[set] = None
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.next_check = 0.0
+        self.checking = False
+
+    def serves(self, model: Optional[str]) -> bool:
+        return model is None or self.models is None or _model_key(model) in self.models
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "models": sorted(self.models) if self.models is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaHostPool:
+    """
+    진행 중인 요청이 가장 적은(least outstanding) 정상 호스트를 고릅니다 (동률이면 돌아가며 선택).
+    - 모델을 지정하면 헬스 체크에서 그 모델이 설치된 것으로 확인된 호스트로만 보냅니다 (단계별 모델 라우팅).
+    - 연속 failure_threshold회 실패(연결 오류, 5xx)한 호스트는 다음 헬스 체크에 성공할 때까지 제외합니다.
+    - 정상 호스트가 없으면 장애 상태인 호스트라도 시도합니다 (오류는 호출자에게 전파).
+    - affinity 키(host_affinity)가 있으면 같은 키와 모델로 직전에 보낸 호스트가 후보에 있는 한 그 호스트를 우선합니다.
+    헬스 체크 요청 자체는 전송 계층(동기/비동기 클라이언트)이 due_for_check()로 대상을 받아 수행합니다.
+    스레드 안전하며, 락을 잡은 채로 I/O를 하지 않으므로 이벤트 루프에서도 그대로 사용할 수 있습니다.
+    """
+
+    def __init__(self, hosts: Iterable[str] = None, health_interval: float = OLLAMA_HEALTH_CHECK_INTERVAL,
+                 failure_threshold: int = OLLAMA_FAILURE_THRESHOLD):
+        self.endpoints = [OllamaEndpoint(host) for host in (hosts or OLLAMA_HOSTS)]
+        if not self.endpoints:
+            raise ValueError("Ollama 호스트가 하나 이상 필요합니다 (OLLAMA_HOSTS)")
+        self.health_interval = health_interval
+        self.failure_threshold = max(1, failure_threshold)
+        self._lock = threading.Lock()
+        self._turn = 0
+        self._affinity: "OrderedDict[Tuple[str, Optional[str]], str]" = OrderedDict()
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def acquire(self, model: str = None, exclude: Iterable[str] = (), affinity: str = None) -> OllamaEndpoint:
+        """
+        요청을 보낼 호스트를 고르고 진행 중 요청 수를 올립니다. 요청이 끝나면 반드시 release()를 호출해야 합니다.
+        exclude(이번 요청에서 이미 실패한 호스트 URL)는 다른 후보가 있을 때만 제외됩니다.
+        affinity가 있으면 같은 affinity/모델로 직전에 선택한 호스트가 후보(정상, 모델 설치, 제외되지 않음)일 때 그 호스트를 고릅니다.
+        """
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude] or self.endpoints
+            serving = [endpoint for endpoint in candidates if endpoint.serves(model)] or candidates
+            pool = [endpoint for endpoint in serving if endpoint.healthy] or serving
+            affinity_slot = (affinity, _model_key(model) if model else None)
+            preferred = self._affinity.get(affinity_slot) if affinity is not None else None
+            endpoint = next((endpoint for endpoint in pool if endpoint.url == preferred and endpoint.healthy), None)
+            if endpoint is None:
+                self._turn += 1
+                size = len(pool)
+                index = min(range(size), key=lambda idx: (pool[idx].outstanding, (idx - self._turn) % size))
+                endpoint = pool[index]
+            if affinity is not None:
+                self._affinity[affinity_slot] = endpoint.url
+                self._affinity.move_to_end(affinity_slot)
+                while len(self._affinity) > AFFINITY_CACHE_SIZE:
+                    self._affinity.popitem(last=False)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: OllamaEndpoint, error: BaseException = None) -> None:
+        """요청 종료를 기록합니다. error가 주어지면(연결 오류, 5xx) 실패로 세어 장애 여부를 판단합니다."""
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if error is None:
+                endpoint.consecutive_failures = 0
+                endpoint.healthy = True
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.last_error = str(error) or type(error).__name__
+            if endpoint.healthy and endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.healthy = False
+                endpoint.next_check = time.monotonic() + self.health_interval
+                logger.warning("Ollama host %s marked unhealthy after %d consecutive failures: %s",
+                               endpoint.url, endpoint.consecutive_failures, endpoint.last_error)
+
+    def due_for_check(self) -> List[OllamaEndpoint]:
+        """헬스 체크 주기가 지난 호스트를 반환하고 '체크 중'으로 표시합니다 (호스트마다 한 번에 하나의 체크만 수행)."""
+        now = time.monotonic()
+        with self._lock:
+            due = [endpoint for endpoint in self.endpoints if not endpoint.checking and now >= endpoint.next_check]
+            for endpoint in due:
+                endpoint.checking = True
+            return due
+
+    def record_health(self, endpoint: OllamaEndpoint, models: List[str] = None, error: BaseException = None) -> None:
+        """
+        헬스 체크 결과를 기록합니다. 연결에 실패하면 error를, 응답을 받았으면 설치된 모델 목록을 넘깁니다
+        (응답은 받았지만 목록을 알 수 없으면 models=None).
+        """
+        with self._lock:
+            endpoint.checking = False
+            endpoint.next_check = time.monotonic() + self.health_interval
+            if error is not None:
+                endpoint.last_error = str(error) or type(error).__name__
+                if endpoint.healthy:
+                    logger.warning("Ollama host %s failed health check: %s", endpoint.url, endpoint.last_error)
+                endpoint.healthy = False
+                return
+            if not endpoint.healthy:
+                logger.info("Ollama host %s is healthy again", endpoint.url)
+            endpoint.healthy = True
+            endpoint.consecutive_failures = 0
+            endpoint.models = {_model_key(model) for model in models} if models is not None else None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self.endpoints]
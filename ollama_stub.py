@@ -0,0 +1,285 @@
+# ollama_stub.py (실제 Ollama 없이 파이프라인을 실행하기 위한 로컬 대역 서버: 응답 생성기 + 지연/토큰 속도 시뮬레이션)
+
+import json
+import logging
+import math
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 스트리밍 응답 한 줄에 담는 토큰 수 (실제 Ollama는 토큰마다 한 줄이지만 요청 수가 많으면 대역 서버가 병목이 됨)
+STREAM_CHUNK_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """토큰 수 근사치 (영문/코드 기준 약 4글자당 1토큰)"""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+class OllamaResponder:
+    """
+    대역 서버의 응답 생성기 인터페이스. 생성 결과(문자열)와 임베딩만 정하면 되며,
+    토큰 수, 지연 시간, 스트리밍 형식은 OllamaStubServer가 처리합니다.
+    """
+
+    def models(self) -> Optional[List[str]]:
+        """/api/tags로 알릴 모델 목록 (None이면 models 키 없이 응답)"""
+        return None
+
+    def generate(self, body: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def chat(self, body: Dict[str, Any]) -> str:
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages") or [])
+        return self.generate(dict(body, prompt=prompt))
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        raise NotImplementedError
+
+    def timing(self, path: str, body: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """요청별 지연 시간을 직접 정하려면 {"ttft": 초, "tokens_per_sec": 값}을 반환 (None이면 서버 설정 사용)"""
+        return None
+
+    def usage(self, path: str, body: Dict[str, Any], text: str) -> Optional[Dict[str, int]]:
+        """실제 토큰 수를 알면 {"prompt_eval_count", "eval_count"}를 반환 (None이면 글자 수로 추정)"""
+        return None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "OllamaStubServer._HTTPServer"
+
+    def log_message(self, format, *args):
+        logger.debug("ollama stub: " + format, *args)
+
+    def setup(self):
+        super().setup()
+        self.server.stub.open_connection(self.connection)
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            self.server.stub.close_connection(self.connection)
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path == "/api/tags":
+            models = stub.responder.models()
+            self._send_json(200, {} if models is None else {"models": [{"name": name, "model": name} for name in models]})
+        elif self.path == "/api/version":
+            self._send_json(200, {"version": "stub"})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        stub = self.server.stub
+        try:
+            body = self._read_body()
+            stub.count_request(self.path)
+            if self.path == "/api/generate":
+                self._send_generation(body, stub.responder.generate(body), "response")
+            elif self.path == "/api/chat":
+                self._send_generation(body, stub.responder.chat(body), "message")
+            elif self.path == "/api/embeddings":
+                stub.sleep(stub.timing(self.path, body)["ttft"])
+                embedding = stub.responder.embed([body.get("prompt", "")], body.get("model", ""))[0]
+                self._send_json(200, {"embedding": embedding})
+            elif self.path == "/api/embed":
+                texts = body.get("input", [])
+                texts = [texts] if isinstance(texts, str) else list(texts)
+                stub.sleep(stub.timing(self.path, body)["ttft"])
+                self._send_json(200, {"model": body.get("model", ""), "embeddings": stub.responder.embed(texts, body.get("model", ""))})
+            else:
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 JSON을 다 받고 스트림을 먼저 닫은 경우 (LLM_STREAM_EARLY_STOP)
+            self.close_connection = True
+        except Exception as e:
+            logger.exception("ollama stub error on %s", self.path)
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _write_chunk(self, payload: Dict[str, Any]) -> None:
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_generation(self, body: Dict[str, Any], text: str, field: str) -> None:
+        """Ollama와 같은 형식으로 응답합니다 (stream=false가 아니면 NDJSON 스트리밍, 마지막 줄에 토큰 수/소요 시간)."""
+        stub = self.server.stub
+        timing = stub.timing(self.path, body)
+        prompt_tokens = estimate_tokens(str(body.get("prompt", "")))
+        usage = stub.responder.usage(self.path, body, text) or {}
+        stub.count_tokens(usage.get("prompt_eval_count", prompt_tokens), usage.get("eval_count", estimate_tokens(text)))
+        started = time.perf_counter()
+        stub.sleep(timing["ttft"])
+        prompt_done = time.perf_counter()
+
+        model = body.get("model", "")
+        chunk_chars = STREAM_CHUNK_TOKENS * 4
+        pieces = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+        tokens_per_sec = timing["tokens_per_sec"]
+
+        def message(content: str, done: bool) -> Dict[str, Any]:
+            payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            if field == "message":
+                payload["message"] = {"role": "assistant", "content": content}
+            else:
+                payload["response"] = content
+            return payload
+
+        def final() -> Dict[str, Any]:
+            ended = time.perf_counter()
+            payload = message("", True)
+            payload.update({
+                "done_reason": "stop",
+                "total_duration": int((ended - started) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int((prompt_done - started) * 1e9),
+                "eval_count": estimate_tokens(text),
+                "eval_duration": int((ended - prompt_done) * 1e9),
+            })
+            payload.update(usage)
+            return payload
+
+        if body.get("stream", True) is False:
+            stub.sleep(estimate_tokens(text) / tokens_per_sec if tokens_per_sec > 0 else 0)
+            payload = final()
+            payload[field] = message(text, True)[field]
+            self._send_json(200, payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for piece in pieces:
+            self._write_chunk(message(piece, False))
+            stub.sleep(estimate_tokens(piece) / tokens_per_sec if tokens_per_sec > 0 else 0)
+        self._write_chunk(final())
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class OllamaStubServer:
+    """
+    responder(OllamaResponder)가 만든 응답을 Ollama API(/api/generate, /api/chat, /api/embeddings, /api/embed,
+    /api/tags) 형식으로 돌려주는 로컬 HTTP 서버. 백그라운드 스레드에서 실행되며 요청마다 스레드를 사용합니다.
+    - ttft: 첫 토큰까지의 지연(초, 프롬프트 평가 시간에 해당). 임베딩 요청에도 적용됩니다.
+    - tokens_per_sec: 생성 속도 (0이면 지연 없이 즉시 전송)
+    port=0이면 빈 포트를 사용하며, 실제 주소는 url 속성으로 확인합니다.
+    """
+
+    class _HTTPServer(ThreadingHTTPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+        def handle_error(self, request, client_address):
+            # 클라이언트가 스트림을 조기 종료하고 연결을 끊는 것은 정상 동작이므로 traceback을 남기지 않음
+            if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+                return
+            super().handle_error(request, client_address)
+
+    def __init__(self, responder: OllamaResponder, host: str = "127.0.0.1", port: int = 0,
+                 ttft: float = 0.0, tokens_per_sec: float = 0.0):
+        self.responder = responder
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self._httpd = self._HTTPServer((host, port), _StubHandler)
+        self._httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        # 받아들인 TCP 연결 수 (keep-alive로 연결을 재사용하면 요청 수보다 작음)
+        self.connections = 0
+        self._open_sockets = set()
+        # 생성 요청마다 서버가 계산한 토큰 수 합계 (클라이언트가 스트림을 조기 종료해 마지막 통계를 받지 못해도 집계됨)
+        self.tokens: Dict[str, int] = {"prompt_eval_count": 0, "eval_count": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def timing(self, path: str, body: Dict[str, Any]) -> Dict[str, float]:
+        timing = {"ttft": self.ttft, "tokens_per_sec": self.tokens_per_sec}
+        timing.update(self.responder.timing(path, body) or {})
+        return timing
+
+    @staticmethod
+    def sleep(seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def count_request(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def open_connection(self, sock: socket.socket) -> None:
+        with self._lock:
+            self.connections += 1
+            self._open_sockets.add(sock)
+
+    def close_connection(self, sock: socket.socket) -> None:
+        with self._lock:
+            self._open_sockets.discard(sock)
+
+    def count_tokens(self, prompt_eval_count: int, eval_count: int) -> None:
+        with self._lock:
+            self.tokens["prompt_eval_count"] += prompt_eval_count
+            self.tokens["eval_count"] += eval_count
+
+    def start(self) -> "OllamaStubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="ollama-stub", daemon=True)
+        self._thread.start()
+        logger.info("Ollama stub server listening on %s", self.url)
+        return self
+
+    def serve_forever(self) -> None:
+        logger.info("Ollama stub server listening on %s", self.url)
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        """서버를 멈추고 keep-alive로 열려 있는 연결도 끊습니다 (중지한 호스트에 기존 연결로 요청이 가지 않도록)."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        with self._lock:
+            sockets, self._open_sockets = list(self._open_sockets), set()
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "OllamaStubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
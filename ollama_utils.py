@@ -1,66 +1,111 @@
-import requests
-import json
-from config import OLLAMA_HOST, MODEL_NAME
+import threading
+from async_ollama_utils import AsyncOllamaClient
+from background_loop import run_sync
+from config import (
+    MODEL_NAME,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_BACKOFF_BASE,
+    OLLAMA_BACKOFF_MAX,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_MAX_INFLIGHT,
+    OLLAMA_EMBED_BATCH_SIZE,
+)
+
+
+class OllamaTransport:
+    """
+    pooled keep-alive connections shared by every OllamaClient call.
+    wraps one AsyncOllamaClient (host pool with failover, retries, stats) and runs its coroutines on the
+    process-wide background event loop, so the sync and async clients share a single request path.
+    """
+
+    def __init__(self, hosts=None,
+                 connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout=OLLAMA_READ_TIMEOUT,
+                 max_retries=OLLAMA_MAX_RETRIES,
+                 backoff_base=OLLAMA_BACKOFF_BASE,
+                 backoff_max=OLLAMA_BACKOFF_MAX,
+                 pool_size=OLLAMA_POOL_SIZE,
+                 max_inflight=OLLAMA_MAX_INFLIGHT,
+                 pool=None):
+        self.client = AsyncOllamaClient(hosts=hosts, connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                        max_retries=max_retries, backoff_base=backoff_base, backoff_max=backoff_max,
+                                        pool_size=pool_size, max_inflight=max_inflight, pool=pool)
+        self.pool = self.client.pool
+        self.stats = self.client.stats
+        self.base_url = self.pool.endpoints[0].url
+
+    @property
+    def max_inflight(self):
+        return self.client.max_inflight
+
+    def set_max_inflight(self, max_inflight):
+        """limit concurrent requests to the server (call before issuing requests)"""
+        self.client.set_max_inflight(max_inflight)
+
+    def run(self, coro):
+        """run a coroutine of self.client on the background event loop and return its result"""
+        return run_sync(coro)
+
+    def close(self):
+        self.run(self.client.aclose())
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """return the process-wide transport, creating it on first use"""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = OllamaTransport()
+        return _default_transport
+
 
 class OllamaClient:
-    def __init__(self):
-        self.base_url = OLLAMA_HOST
+    """blocking API over AsyncOllamaClient; each call waits for the async request on the transport's event loop"""
+
+    def __init__(self, transport=None):
+        self.transport = transport or get_default_transport()
+        self.base_url = self.transport.base_url
         self.model = MODEL_NAME
 
     def generate_embedding(self, text):
         """generate embedding for text"""
-        url = f"{self.base_url}/api/embeddings"
-        response = requests.post(url, json={
-            "model": self.model,
-            "prompt": text
-        })
-        if response.status_code == 200:
-            return response.json()['embedding']
-        else:
-            raise Exception(f"Error generating embedding: {response.text}")
-
-    def generate_completion(self, prompt, context=None, temperature=0.0):
+        return self.transport.run(self.transport.client.generate_embedding(text))
+
+    def generate_embeddings(self, texts, batch_size=OLLAMA_EMBED_BATCH_SIZE):
+        """generate embeddings for many texts via the multi-input /api/embed endpoint"""
+        return self.transport.run(self.transport.client.generate_embeddings(texts, batch_size=batch_size))
+
+    def generate_completion(self, prompt, context=None, temperature=0.0, model=None):
         """generate text completion"""
-        url = f"{self.base_url}/api/generate"
-        body = {
-            "model": self.model,
-            "prompt": prompt,
-            "temperature": temperature,
-        }
-        if context:
-            body["context"] = context
-
-        response = requests.post(url, json=body, stream=True)
-        
-        if response.status_code == 200:
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    json_response = json.loads(line)
-                    full_response += json_response.get('response', '')
-                    if json_response.get('done', False):
-                        break
-            return full_response
-        else:
-            raise Exception(f"Error generating completion: {response.text}")
-
-    def chat(self, messages, temperature=0.7):
+        return self.transport.run(self.transport.client.generate_completion(
+            prompt, context=context, temperature=temperature, model=model or self.model))
+
+    def generate_json(self, prompt, context=None, temperature=0.0, stop_on_json=True, format=None, model=None):
+        """
+        stream a completion and stop as soon as a complete top-level JSON object has arrived
+        (<think> blocks are skipped). returns (parsed dict or None, raw text received, metrics).
+        with stop_on_json=False the whole generation is read and the first object is still parsed.
+        """
+        return self.transport.run(self.transport.client.generate_json(
+            prompt, context=context, temperature=temperature, stop_on_json=stop_on_json, format=format,
+            model=model or self.model))
+
+    def chat(self, messages, temperature=0.7, model=None):
         """perform chat-style conversation"""
-        url = f"{self.base_url}/api/chat"
-        response = requests.post(url, json={
-            "model": self.model,
-            "messages": messages,
-            "temperature": temperature,
-        }, stream=True)
-
-        if response.status_code == 200:
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    json_response = json.loads(line)
-                    full_response += json_response.get('message', {}).get('content', '')
-                    if json_response.get('done', False):
-                        break
-            return full_response
-        else:
-            raise Exception(f"Error in chat: {response.text}") 
\ No newline at end of file
+        return self.transport.run(self.transport.client.chat(messages, temperature=temperature,
+                                                             model=model or self.model))
+
+    def get_stats(self):
+        """return per-endpoint latency/bytes counters of the underlying transport"""
+        return self.transport.stats.snapshot()
+
+    def get_host_stats(self):
+        """return the state of every Ollama host in the pool (health, outstanding requests, models)"""
+        return self.transport.pool.snapshot()
@@ -0,0 +1,406 @@
+# patch_validator.py (수리 계획의 Insert/Update/Delete 연산을 원본 코드에 적용하고 Java 구문 검증)
+
+import copy
+import hashlib
+import logging
+import multiprocessing
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from java_chunker import _mask_comments_and_strings
+from config import JAVA_PARSER, SYNTAX_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+JAVA_PARSERS = ("auto", "tree-sitter", "javalang", "brackets")
+
+_NUMBER = re.compile(r'\d+')
+_LINE_RANGE = re.compile(r'(\d+)\s*(?:-|~|to)\s*(\d+)')
+# 연산의 코드가 원본의 지정한 줄과 다르면 앞뒤로 이만큼까지 찾아봄 (LLM이 줄 번호를 조금 틀리는 경우)
+_SEARCH_WINDOW = 3
+
+# 조각 코드는 차례로 (그대로, 클래스 본문, 메소드 본문)으로 감싸서 파싱 (헤더의 줄 수만큼 줄 번호가 밀림)
+_WRAPPERS = (
+    ("", ""),
+    ("class __Snippet__ {\n", "\n}"),
+    ("class __Snippet__ { void __snippet__() {\n", "\n}}"),
+)
+
+_OPERATION_CODE_KEYS = {"Insert": "code_to_add", "Update": "code_to_update", "Delete": "code_to_delete"}
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _line_range(value) -> Optional[Tuple[int, int]]:
+    """line_number 값(12, "12", "12-14", "Line 12" 등)을 (시작, 끝) 줄 번호로 바꿉니다."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value, value
+    text = str(value)
+    match = _LINE_RANGE.search(text)
+    if match:
+        start, end = int(match.group(1)), int(match.group(2))
+        return (start, end) if end >= start else (end, start)
+    match = _NUMBER.search(text)
+    return (int(match.group()), int(match.group())) if match else None
+
+
+def _find_block(lines: List[str], block: List[str], start: int) -> Optional[int]:
+    """block(공백 무시)이 start(0부터) 또는 그 근처에서 시작하는 위치. 없으면 None."""
+    target = [_normalize(line) for line in block]
+    for offset in [0] + [sign * step for step in range(1, _SEARCH_WINDOW + 1) for sign in (1, -1)]:
+        index = start + offset
+        if 0 <= index and index + len(target) <= len(lines) and \
+                [_normalize(line) for line in lines[index:index + len(target)]] == target:
+            return index
+    return None
+
+
+def _indent_like(code_lines: List[str], reference: str) -> List[str]:
+    """들여쓰기 없이 생성된 코드는 기준 줄의 들여쓰기에 맞춥니다."""
+    if not code_lines or code_lines[0][:1] in (" ", "\t"):
+        return code_lines
+    indent = reference[:len(reference) - len(reference.lstrip())]
+    return [indent + line if line.strip() else line for line in code_lines]
+
+
+def apply_repair_operation(code: str, operation: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    수리 연산 하나를 원본 코드에 적용합니다. (적용한 코드, None) 또는 (None, 적용할 수 없는 이유)를 반환합니다.
+    - Insert: line_number 줄 앞에 code_to_add를 넣습니다 (마지막 줄 다음도 허용).
+    - Update: line_number 줄(범위가 주어지면 그 범위)을 code_to_update로 바꿉니다.
+    - Delete: line_number 줄부터 code_to_delete와 같은 줄들을 지웁니다 (지정한 줄과 다르면 근처에서 찾음).
+    """
+    operation_type = str(operation.get("type", "")).capitalize()
+    if operation_type not in _OPERATION_CODE_KEYS:
+        return None, f"unknown operation type: {operation.get('type')!r}"
+    line_range = _line_range(operation.get("line_number"))
+    if line_range is None:
+        return None, f"invalid line_number: {operation.get('line_number')!r}"
+
+    lines = code.split("\n")
+    start, end = line_range[0] - 1, line_range[1] - 1
+    new_code = operation.get(_OPERATION_CODE_KEYS[operation_type]) or ""
+    new_lines = new_code.split("\n") if new_code.strip() else []
+    if operation_type == "Insert":
+        if not new_lines:
+            return None, "empty code_to_add"
+        if not 0 <= start <= len(lines):
+            return None, f"line {start + 1} out of range (1-{len(lines) + 1})"
+        reference = lines[start] if start < len(lines) else lines[-1]
+        patched = lines[:start] + _indent_like(new_lines, reference) + lines[start:]
+    elif operation_type == "Update":
+        if not new_lines:
+            return None, "empty code_to_update"
+        if not (0 <= start and end < len(lines)):
+            return None, f"line {start + 1} out of range (1-{len(lines)})"
+        patched = lines[:start] + _indent_like(new_lines, lines[start]) + lines[end + 1:]
+    else:
+        if new_lines:
+            index = _find_block(lines, new_lines, start)
+            if index is None:
+                return None, f"code_to_delete not found near line {start + 1}"
+            start, end = index, index + len(new_lines) - 1
+        elif not (0 <= start and end < len(lines)):
+            return None, f"line {start + 1} out of range (1-{len(lines)})"
+        patched = lines[:start] + lines[end + 1:]
+
+    patched_code = "\n".join(patched)
+    if patched_code == code:
+        return None, "operation does not change the code"
+    return patched_code, None
+
+
+class SyntaxResult:
+    """구문 검증 결과 (valid가 None이면 판단할 수 없음: 원본 코드부터 파싱되지 않거나 괄호 짝만 검사한 경우)."""
+
+    __slots__ = ("valid", "error")
+
+    def __init__(self, valid: Optional[bool], error: Optional[str] = None):
+        self.valid = valid
+        self.error = error
+
+
+class _TreeSitterBackend:
+    """tree-sitter-java 파서 (파서 인스턴스 재사용, 원본 트리를 기준으로 한 증분 재파싱)."""
+
+    name = "tree-sitter"
+    authoritative = True
+
+    def __init__(self):
+        import tree_sitter
+        import tree_sitter_java
+
+        language = tree_sitter.Language(tree_sitter_java.language())
+        try:
+            self._parser = tree_sitter.Parser(language)
+        except TypeError:  # py-tree-sitter 0.21 이하
+            self._parser = tree_sitter.Parser()
+            self._parser.set_language(language)
+        # Parser 객체는 스레드 안전하지 않음
+        self._lock = threading.Lock()
+
+    def parse(self, source: str, base=None):
+        """source를 파싱한 트리를 반환합니다. base=(기준 코드, 기준 트리)이면 바뀐 구간만 다시 파싱합니다."""
+        data = source.encode("utf-8")
+        with self._lock:
+            if base is not None:
+                old_tree = self._edited_copy(base[0].encode("utf-8"), base[1], data)
+                if old_tree is not None:
+                    return self._parser.parse(data, old_tree)
+            return self._parser.parse(data)
+
+    @staticmethod
+    def _edited_copy(old: bytes, old_tree, new: bytes):
+        try:
+            tree = copy.copy(old_tree)
+        except TypeError:
+            return None
+        # 앞뒤 공통 부분을 제외한 가운데 구간이 바뀐 것으로 tree.edit에 알림
+        prefix = 0
+        limit = min(len(old), len(new))
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+        old_end, new_end = len(old) - suffix, len(new) - suffix
+
+        def point(data: bytes, offset: int):
+            row = data.count(b"\n", 0, offset)
+            return row, offset - (data.rfind(b"\n", 0, offset) + 1)
+
+        tree.edit(start_byte=prefix, old_end_byte=old_end, new_end_byte=new_end,
+                  start_point=point(old, prefix), old_end_point=point(old, old_end), new_end_point=point(new, new_end))
+        return tree
+
+    @staticmethod
+    def error(tree) -> Optional[str]:
+        root = tree.root_node
+        if not root.has_error:
+            return None
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.type == "ERROR" or node.is_missing:
+                kind = f"missing {node.type}" if node.is_missing else "syntax error"
+                return f"line {node.start_point[0] + 1}: {kind}"
+            stack.extend(reversed([child for child in node.children if child.has_error or child.is_missing]))
+        return "syntax error"
+
+
+class _JavalangBackend:
+    """javalang 파서 (순수 파이썬, 증분 파싱 없음)."""
+
+    name = "javalang"
+    authoritative = True
+
+    def __init__(self):
+        import javalang
+        self._javalang = javalang
+
+    def parse(self, source: str, base=None):
+        try:
+            self._javalang.parse.parse(source)
+        except (self._javalang.parser.JavaSyntaxError, self._javalang.tokenizer.LexerError) as e:
+            position = getattr(getattr(e, "at", None), "position", None)
+            line = f"line {position[0]}: " if position else ""
+            return f"{line}{type(e).__name__} {getattr(e, 'description', '') or e}".strip()
+        except (IndexError, StopIteration, TypeError):
+            return "syntax error"
+        return None
+
+    @staticmethod
+    def error(result) -> Optional[str]:
+        return result
+
+
+class _BracketBackend:
+    """
+    파서가 설치되어 있지 않을 때 사용하는 최소 검사: 주석/문자열 밖의 (), {}, [] 짝.
+    짝이 맞지 않으면 확실한 오류지만, 짝이 맞아도 구문이 올바른지는 알 수 없으므로(`int x = ;` 등) 판단 불가로 봅니다.
+    """
+
+    name = "brackets"
+    authoritative = False
+    _PAIRS = {")": "(", "}": "{", "]": "["}
+
+    def parse(self, source: str, base=None):
+        stack = []
+        for number, line in enumerate(_mask_comments_and_strings(source).split("\n"), start=1):
+            for ch in line:
+                if ch in "({[":
+                    stack.append((ch, number))
+                elif ch in self._PAIRS:
+                    if not stack or stack[-1][0] != self._PAIRS[ch]:
+                        return f"line {number}: unmatched '{ch}'"
+                    stack.pop()
+        if stack:
+            return f"line {stack[-1][1]}: unclosed '{stack[-1][0]}'"
+        return None
+
+    @staticmethod
+    def error(result) -> Optional[str]:
+        return result
+
+
+_fallback_warned = False
+
+
+def _create_backend(name: str):
+    candidates = ("tree-sitter", "javalang", "brackets") if name == "auto" else (name,)
+    factories = {"tree-sitter": _TreeSitterBackend, "javalang": _JavalangBackend, "brackets": _BracketBackend}
+    for candidate in candidates:
+        try:
+            backend = factories[candidate]()
+            # 후보 평가 작업 프로세스마다 반복하지 않도록 주 프로세스에서 한 번만 경고
+            global _fallback_warned
+            if not backend.authoritative and not _fallback_warned and multiprocessing.parent_process() is None:
+                _fallback_warned = True
+                logger.warning("Java 파서(tree-sitter-java, javalang)가 설치되어 있지 않아 괄호 짝만 검사합니다. "
+                               "짝이 맞는 후보의 구문 검증 결과는 판단 불가(null)로 기록됩니다 "
+                               "(pip install tree-sitter tree-sitter-java).")
+            return backend
+        except ImportError:
+            if name != "auto":
+                raise ImportError(f"JAVA_PARSER={name}를 사용하려면 해당 패키지가 필요합니다: "
+                                  f"pip install {'tree-sitter tree-sitter-java' if name == 'tree-sitter' else name}")
+    raise ValueError(f"지원하지 않는 Java 파서입니다: {name} (가능: {', '.join(JAVA_PARSERS)})")
+
+
+class JavaSyntaxChecker:
+    """
+    Java 구문 검증기. tree-sitter-java > javalang > 괄호 짝 검사 순으로 설치된 파서를 사용하며(JAVA_PARSER),
+    파서 인스턴스는 재사용하고 결과는 코드 해시별로 LRU 캐시합니다.
+    check_candidates()는 원본을 한 번 파싱한 뒤 후보마다 바뀐 구간만 다시 파싱합니다 (tree-sitter).
+    """
+
+    def __init__(self, parser: str = JAVA_PARSER, cache_size: int = SYNTAX_CACHE_SIZE):
+        self.backend = _create_backend(parser)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, Optional[str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    @staticmethod
+    def _key(source: str) -> bytes:
+        return hashlib.blake2b(source.encode("utf-8"), digest_size=16).digest()
+
+    def _error(self, source: str, base=None) -> Tuple[Optional[str], Any]:
+        """(오류 또는 None, 파싱 결과). 캐시에 있으면 파싱 결과는 None."""
+        key = self._key(source)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key], None
+        parsed = self.backend.parse(source, base)
+        error = self.backend.error(parsed)
+        with self._cache_lock:
+            self._cache[key] = error
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return error, parsed
+
+    @staticmethod
+    def _unwrap_error(error: Optional[str], wrapper: Tuple[str, str]) -> Optional[str]:
+        """감싼 헤더의 줄 수만큼 오류의 줄 번호를 되돌립니다."""
+        shift = wrapper[0].count("\n")
+        if error is None or not shift:
+            return error
+        return re.sub(r'^line (\d+)', lambda m: f"line {max(1, int(m.group(1)) - shift)}", error)
+
+    def _parse_wrapped(self, source: str):
+        """(source를 파싱할 수 있는 감싸기 방식, 감싼 코드, 파싱 결과) 또는 모두 실패하면 (None, 원래 오류, None)."""
+        first_error = None
+        for wrapper in _WRAPPERS:
+            wrapped = wrapper[0] + source + wrapper[1]
+            error, parsed = self._error(wrapped)
+            if error is None:
+                return wrapper, wrapped, parsed
+            first_error = first_error or error
+        return None, first_error, None
+
+    def check(self, source: str) -> SyntaxResult:
+        """코드 하나를 검증합니다. 파일 전체가 아닌 조각 코드(메소드, 문장)는 클래스/메소드로 감싸서 다시 시도합니다."""
+        wrapper, error, _ = self._parse_wrapped(source)
+        return self._result(None) if wrapper is not None else SyntaxResult(False, error)
+
+    def _result(self, error: Optional[str]) -> SyntaxResult:
+        """오류가 없을 때 valid=True는 실제 파서만 보장할 수 있으므로, 괄호 짝 검사이면 판단 불가(valid=None)"""
+        if error is not None:
+            return SyntaxResult(False, error)
+        return SyntaxResult(True) if self.backend.authoritative else SyntaxResult(None, "not verified (brackets only)")
+
+    def check_candidates(self, original: str, candidates: List[Optional[str]]) -> List[Optional[SyntaxResult]]:
+        """
+        원본 코드를 수정한 후보들을 검증합니다 (None인 후보는 None).
+        후보는 원본을 파싱할 수 있었던 방식으로 똑같이 감싸며, 원본부터 파싱되지 않으면 판단할 수 없음(valid=None)으로 표시합니다.
+        """
+        wrapper, wrapped, base_tree = self._parse_wrapped(original)
+        if wrapper is None:
+            unknown = SyntaxResult(None, f"original code does not parse ({wrapped})")
+            return [None if candidate is None else unknown for candidate in candidates]
+        base = None
+        if isinstance(self.backend, _TreeSitterBackend):
+            # 캐시 hit으로 원본 트리가 없으면 증분 파싱의 기준으로 쓰기 위해 한 번 파싱
+            base = (wrapped, base_tree if base_tree is not None else self.backend.parse(wrapped))
+
+        results = []
+        for candidate in candidates:
+            if candidate is None:
+                results.append(None)
+                continue
+            error = self._error(wrapper[0] + candidate + wrapper[1], base)[0]
+            results.append(self._result(self._unwrap_error(error, wrapper)))
+        return results
+
+
+_default_checker: Optional[JavaSyntaxChecker] = None
+_default_checker_lock = threading.Lock()
+
+
+def get_syntax_checker() -> JavaSyntaxChecker:
+    """프로세스 전체에서 공유하는 JavaSyntaxChecker (파서는 처음 사용할 때 한 번만 생성)"""
+    global _default_checker
+    with _default_checker_lock:
+        if _default_checker is None:
+            _default_checker = JavaSyntaxChecker()
+            logger.debug("Java syntax checker backend: %s", _default_checker.name)
+        return _default_checker
+
+
+def validate_repair_operations(code: str, operations: List[Dict[str, Any]],
+                               checker: JavaSyntaxChecker = None) -> Dict[str, Any]:
+    """
+    수리 연산(후보)마다 원본 코드에 적용한 결과를 구문 검증합니다.
+    반환값: {"parser", "total", "applied", "syntax_valid", "elapsed_ms", "results": [{"index", "applied", "syntax_valid", "error"}]}
+    """
+    checker = checker or get_syntax_checker()
+    started = time.perf_counter()
+    patched, results = [], []
+    for index, operation in enumerate(operations):
+        patched_code, error = apply_repair_operation(code, operation) if isinstance(operation, dict) \
+            else (None, "operation is not an object")
+        patched.append(patched_code)
+        results.append({"index": index, "applied": patched_code is not None, "syntax_valid": None, "error": error})
+
+    for result, syntax in zip(results, checker.check_candidates(code, patched)):
+        if syntax is not None:
+            result["syntax_valid"] = syntax.valid
+            result["error"] = syntax.error
+    return {
+        "parser": checker.name,
+        "total": len(results),
+        "applied": sum(1 for result in results if result["applied"]),
+        "syntax_valid": sum(1 for result in results if result["syntax_valid"]),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results,
+    }
@@ -1,92 +1,336 @@
 # process.py (수정)
 
-import json
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
 from rag import VulRAG
 from typing import Dict, Any
+from tracing import Tracer, set_span_attribute
+from log_utils import lazy_json
+from java_chunker import CodeSlice, JavaSource, parse_java_source, relevance_query
+from candidate_evaluator import get_candidate_evaluator
+from ollama_pool import affinity_key, host_affinity
+from background_loop import run_sync
+from config import (
+    RETRIEVAL_MODE,
+    RAG_BACKEND,
+    CODE_CHUNKING_ENABLED,
+    CODE_CHUNKING_MIN_LINES,
+    CODE_CHUNKING_TOP_UNITS,
+    SEMANTICS_BACKEND,
+    PATCH_VALIDATION_ENABLED,
+    PATCH_CANDIDATE_FILTER,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timed(stage_timings: Dict[str, float], stage: str, tracer: Tracer):
+    """블록을 trace span으로 기록하고, 소요 시간(초)을 stage_timings[stage]에도 누적합니다."""
+    started = time.perf_counter()
+    try:
+        with tracer.span(stage):
+            yield
+    finally:
+        stage_timings[stage] = stage_timings.get(stage, 0.0) + time.perf_counter() - started
 
 class VulnerabilityProcessor:
-    def __init__(self, enable_rag: bool = True):
-        self.rag_system = VulRAG(enable_rag=enable_rag)
+    def __init__(self, enable_rag: bool = True, llm_cache=None, retrieval_mode: str = RETRIEVAL_MODE,
+                 backend: str = RAG_BACKEND, chunking: bool = CODE_CHUNKING_ENABLED,
+                 chunk_min_lines: int = CODE_CHUNKING_MIN_LINES, chunk_top_units: int = CODE_CHUNKING_TOP_UNITS,
+                 fast: bool = False, fast_repair: bool = False, semantics_backend: str = SEMANTICS_BACKEND,
+                 patch_validation: bool = PATCH_VALIDATION_ENABLED, candidate_filter: bool = PATCH_CANDIDATE_FILTER,
+                 rag_system: VulRAG = None):
+        # rag_system을 넘기면(대역 서버에 연결한 VulRAG 등) llm_cache/backend/semantics_backend 대신 그대로 사용
+        self.rag_system = rag_system or VulRAG(enable_rag=enable_rag, llm_cache=llm_cache, backend=backend,
+                                               semantics_backend=semantics_backend)
         self.enable_rag = enable_rag
+        self.retrieval_mode = retrieval_mode
+        self.chunking = chunking
+        self.chunk_min_lines = chunk_min_lines
+        self.chunk_top_units = chunk_top_units
+        # fast: 의미 추출 + 분석을 한 번의 호출로 수행하고 검색은 생략 (fast_repair이면 패치도 생성)
+        self.fast = fast
+        self.fast_repair = fast_repair
+        # 수리 연산 후보를 원본 코드에 적용해 평가(구문 검증, 중복 제거, 순위)하고, candidate_filter이면 쓸 수 있는 후보만 남김
+        self.patch_validation = patch_validation
+        self.candidate_filter = candidate_filter
+
+    def _parse_source(self, code_snippet: str) -> JavaSource:
+        """큰 Java 파일이면 메소드 단위로 나눈 JavaSource를, 아니면(또는 청킹 비활성화 시) None을 반환합니다."""
+        if not self.chunking:
+            return None
+        source = parse_java_source(code_snippet, self.chunk_min_lines)
+        if source is not None:
+            logger.info(">>> Large source (%d lines, %d methods): analyzing method-level units",
+                        len(source.lines), len(source.units))
+            set_span_attribute("total_units", len(source.units))
+        return source
+
+    async def _aextract_semantics(self, code_snippet: str, source: JavaSource) -> Dict[str, Any]:
+        """LLM은 큰 파일이면 시그니처만 남긴 요약(outline)을, CodeT5는 메소드별로 요약하므로 전체 코드를 받습니다."""
+        if self.rag_system.semantics_backend == "codet5":
+            return await self.rag_system.asummarize_functional_semantics(code_snippet)
+        return await self.rag_system.aextract_functional_semantics(source.outline() if source else code_snippet)
+
+    def _select_code(self, source: JavaSource, rag_context: Dict[str, Any], functional_semantics: Dict[str, Any]) -> CodeSlice:
+        """검색된 CVE(없으면 추출한 의미 정보)와 관련도가 높은 상위 메소드와 클래스/필드 context만 남긴 슬라이스"""
+        code_slice = source.select(relevance_query(rag_context, functional_semantics), self.chunk_top_units)
+        logger.info("--- Analyzing %d of %d methods (%d of %d lines): %s ---",
+                    len(code_slice.units), code_slice.total_units, len(code_slice.line_map), code_slice.total_lines,
+                    ", ".join(unit.qualified_name for unit in code_slice.units))
+        set_span_attribute("analyzed_units", len(code_slice.units))
+        set_span_attribute("slice_lines", len(code_slice.line_map))
+        return code_slice
 
-    def run_analysis_pipeline(self, code_snippet: str) -> Dict[str, Any]:
+    @staticmethod
+    def _map_to_original(result: Dict[str, Any], code_slice: CodeSlice) -> Dict[str, Any]:
+        """슬라이스 기준 줄 번호(vulnerable_lines, line_number)를 원본 파일 줄 번호로 바꾸고 분석한 메소드 목록을 덧붙입니다."""
+        if code_slice is None:
+            return result
+        result = dict(result, details=code_slice.remap_lines(result.get("details")))
+        result["code_slice"] = code_slice.summary()
+        return result
+
+    def _repair_operations(self, result: Dict[str, Any]):
+        """평가할 수리 연산 목록 (검증이 꺼져 있거나 수리 계획/패치가 없으면 None)"""
+        details = result.get("details") or {}
+        repair = details.get("repair_plan", details.get("patch"))
+        operations = repair.get("repair_operations") if isinstance(repair, dict) else None
+        return operations if self.patch_validation and isinstance(operations, list) and operations else None
+
+    def _apply_evaluation(self, result: Dict[str, Any], evaluation: Dict[str, Any]) -> Dict[str, Any]:
         """
-        [의미 추출 -> 분석 -> 패치 생성] 파이프라인.
-        의미 추출 실패 시, 해당 결과를 출력하고 프로세스를 중단합니다.
+        후보 평가 결과를 details["patch_validation"]에 기록하고, candidate_filter이면
+        repair_operations를 쓸 수 있는 후보만 순위대로 남긴 목록으로 바꿉니다.
+        """
+        set_span_attribute("parser", evaluation["parser"])
+        set_span_attribute("candidates", evaluation["total"])
+        set_span_attribute("syntax_valid", evaluation["syntax_valid"])
+        set_span_attribute("viable", evaluation["viable"])
+        logger.info(">>> Patch validation (%s): %d/%d operations applied, %d syntactically valid, %d viable",
+                    evaluation["parser"], evaluation["applied"], evaluation["total"], evaluation["syntax_valid"],
+                    evaluation["viable"])
+        ranked = evaluation.pop("ranked")
+        details = dict(result["details"], patch_validation=evaluation)
+        if self.candidate_filter and not ranked and evaluation["total"]:
+            # 모든 후보가 제외되면 빈 목록 대신 원래 연산을 남기고 표시
+            evaluation["all_rejected"] = True
+            logger.warning("All %d repair operations were rejected by patch validation; keeping the unfiltered list",
+                           evaluation["total"])
+        elif self.candidate_filter:
+            key = "repair_plan" if "repair_plan" in details else "patch"
+            details[key] = dict(details[key], repair_operations=ranked)
+        result["details"] = details
+        return result
+
+    async def _avalidate_patch(self, result: Dict[str, Any], code_snippet: str, stage_timings: Dict[str, float],
+                               tracer: Tracer) -> Dict[str, Any]:
+        """
+        수리 계획/패치의 연산(후보)마다 원본 코드(원본 줄 번호 기준)에 적용한 결과를 프로세스 풀에서 평가합니다.
+        결과를 기다리는 동안 이벤트 루프를 막지 않도록 스레드에서 기다립니다.
         """
-        print("\n\n" + "="*50 + "\nAnalysis Process Started (with Semantic Extraction Check)\n" + "="*50)
+        operations = self._repair_operations(result)
+        if operations is None:
+            return result
+        with _timed(stage_timings, "patch_validation", tracer):
+            evaluation = await asyncio.to_thread(get_candidate_evaluator().evaluate, code_snippet, operations,
+                                                 result["details"].get("analysis"))
+            return self._apply_evaluation(result, evaluation)
+
+    def _semantic_failure_report(self, functional_semantics: Dict[str, Any]) -> Dict[str, Any]:
+        """의미 추출 실패 시 최종 보고서를 출력하고 반환합니다. 성공이면 None."""
+        # 재시도 후에도 JSON을 얻지 못했거나(빈 결과) purpose가 없으면 실패로 처리
+        if functional_semantics and functional_semantics.get("purpose") not in (None, "", "Unknown"):
+            return None
+        logger.warning("--- SEMANTIC EXTRACTION FAILED: Process stopped. ---")
         
-        # --- Step 0: 의미 추출 시도 ---
-        functional_semantics = self.rag_system.extract_functional_semantics(code_snippet)
-
-        # --- 추가된 로직: 의미 추출 실패 시 프로세스 중단 ---
-        if functional_semantics and functional_semantics.get("purpose") == "Unknown":
-            print("\n--- SEMANTIC EXTRACTION FAILED: Process stopped. ---")
-            
-            final_report = {
-                "status": "semantic_extraction_failed",
-                "details": {
-                    "message": "Failed to extract functional semantics from the code.",
-                    "extraction_result": functional_semantics
-                }
+        final_report = {
+            "status": "semantic_extraction_failed",
+            "details": {
+                "message": "Failed to extract functional semantics from the code.",
+                "extraction_result": functional_semantics
             }
+        }
+
+        # 최종 보고서를 기록하고 종료
+        logger.debug("FINAL REPORT:\n%s", lazy_json(final_report, indent=4))
+        return final_report
+
+    @staticmethod
+    def _search_query(functional_semantics: Dict[str, Any]) -> str:
+        # 이제 성공이 보장된 의미 정보로 검색 쿼리 생성
+        purpose = functional_semantics.get("purpose", "")
+        behavior = functional_semantics.get("behavior", [])
+        behavior_text = behavior if isinstance(behavior, str) else " ".join(behavior)
+        logger.info(">>> RAG search query based on: Extracted Semantics")
+        return f"{purpose} {behavior_text}"
+
+    @staticmethod
+    def _rag_context(reranked_candidates) -> Dict[str, Any]:
+        if reranked_candidates:
+            logger.info("--- RAG Mode: Analyzing based on the TOP candidate ---")
+            return reranked_candidates[0].get("_source", {}).get("metadata", {})
+        logger.info("--- RAG Mode: No candidates found, switching to Direct Analysis ---")
+        return None
+
+    @staticmethod
+    def _not_vulnerable_result(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+        """취약점이 없으면(또는 분석 결과를 얻지 못하면) 최종 결과를, 취약점이 확인되면 None을 반환합니다."""
+        if not analysis_result or "vulnerable_sections" not in analysis_result:
+            # 재시도 후에도 사용할 수 있는 JSON을 얻지 못함: 비취약으로 판정하지 않음
+            logger.warning("--- ANALYSIS FAILED: no usable analysis result ---")
+            return {"status": "analysis_failed", "details": analysis_result or "Analysis failed to produce a result."}
+        if not analysis_result.get("vulnerable_sections"):
+            logger.info("--- FINAL CONCLUSION: NOT VULNERABLE ---")
+            logger.debug("Analysis Result: %s", lazy_json(analysis_result))
+            return {"status": "not_vulnerable", "details": analysis_result}
+
+        logger.info("--- VULNERABILITY CONFIRMED ---")
+        logger.debug("%s", lazy_json(analysis_result))
+        return None
+
+    @staticmethod
+    def _split_fast_result(fast_result: Dict[str, Any]):
+        """통합 호출 결과를 (기능적 의미, 분석 결과)로 나눕니다."""
+        fast_result = fast_result or {}
+        functional_semantics = {"purpose": fast_result.get("purpose", "Unknown"), "behavior": fast_result.get("behavior", "")}
+        analysis_result = {key: value for key, value in fast_result.items() if key not in ("purpose", "behavior")}
+        return functional_semantics, analysis_result
+
+    def _fast_result(self, analysis_result: Dict[str, Any], functional_semantics: Dict[str, Any],
+                     repair: Dict[str, Any] = None) -> Dict[str, Any]:
+        """--fast 모드의 취약 판정 결과 (패치는 fast_repair일 때만 포함)"""
+        if repair is None:
+            logger.info("--- FAST MODE: repair generation skipped ---")
+            result = {"status": "vulnerable", "details": {"analysis": analysis_result}}
+        else:
+            logger.info("--- PATCH GENERATED ---")
+            result = {"status": "vulnerable_and_patch_generated", "details": {"analysis": analysis_result, "patch": repair}}
+        result["functional_semantics"] = functional_semantics
+        return result
 
-            # 최종 보고서를 바로 출력하고 종료
-            print("\n==================== FINAL REPORT ====================")
-            print(json.dumps(final_report, indent=4, ensure_ascii=False))
-            print("======================================================")
-            return final_report
-        # --- 여기까지 추가된 로직 ---
+    def _repair_result(self, analysis_result: Dict[str, Any], repair: Dict[str, Any]) -> Dict[str, Any]:
+        if self.enable_rag:
+            logger.info("--- REPAIR PLAN GENERATED ---")
+            return {"status": "vulnerable_and_plan_generated",
+                    "details": {"analysis": analysis_result, "repair_plan": repair}}
+        logger.info("--- PATCH GENERATED ---")
+        return {"status": "vulnerable_and_patch_generated",
+                "details": {"analysis": analysis_result, "patch": repair}}
+
+    def run_analysis_pipeline(self, code_snippet: str, stage_timings: Dict[str, float] = None,
+                              tracer: Tracer = None) -> Dict[str, Any]:
+        """
+        [의미 추출 -> 분석 -> 패치 생성] 파이프라인.
+        의미 추출 실패 시, 해당 결과를 출력하고 프로세스를 중단합니다.
+        stage_timings가 주어지면 단계별 소요 시간(초)을, tracer가 주어지면 단계별 span
+        (소요 시간, 토큰 수, Ollama eval_duration, ES took, 캐시 hit)을 기록합니다.
+        arun_analysis_pipeline을 백그라운드 이벤트 루프에서 실행하므로 여러 스레드에서 동시에 호출할 수 있습니다.
+        """
+        return run_sync(self.arun_analysis_pipeline(code_snippet, stage_timings, tracer))
+
+    async def arun_analysis_pipeline(self, code_snippet: str, stage_timings: Dict[str, float] = None,
+                                     tracer: Tracer = None) -> Dict[str, Any]:
+        """
+        run_analysis_pipeline의 비동기 버전(실제 구현). LLM 호출은 AsyncOllamaClient로 이벤트 루프에서 처리하고,
+        검색(ES/내장 인덱스)은 asyncio.to_thread로 실행하여 여러 ID를 한 스레드에서 동시에 처리할 수 있습니다.
+        """
+        tracer = tracer or Tracer()
+        pipeline = self._arun_fast_pipeline if self.fast else self._arun_pipeline
+        with tracer.span("analysis_pipeline") as span, host_affinity(affinity_key(code_snippet)):
+            result = await pipeline(code_snippet, {} if stage_timings is None else stage_timings, tracer)
+            span.set("status", result.get("status"))
+        return result
+
+    async def _arun_pipeline(self, code_snippet: str, stage_timings: Dict[str, float], tracer: Tracer) -> Dict[str, Any]:
+        logger.info("%s\nAnalysis Process Started (with Semantic Extraction Check)\n%s", "="*50, "="*50)
+        
+        with _timed(stage_timings, "chunking", tracer):
+            source = self._parse_source(code_snippet)
 
+        # --- Step 0: 의미 추출 시도 (실패 시 프로세스 중단) ---
+        with _timed(stage_timings, "semantic_extraction", tracer):
+            functional_semantics = await self._aextract_semantics(code_snippet, source)
+        failure_report = self._semantic_failure_report(functional_semantics)
+        if failure_report is not None:
+            return failure_report
 
         # --- 이하 로직은 의미 추출 성공 시에만 실행됩니다. ---
-        print(">>> Semantic extraction successful. Proceeding to next step.")
+        logger.info(">>> Semantic extraction successful. Proceeding to next step.")
         
         rag_context = None
         if self.enable_rag:
             # --- Step 1: RAG 검색 ---
-            # 이제 성공이 보장된 의미 정보로 검색 쿼리 생성
-            purpose = functional_semantics.get("purpose", "")
-            behavior_text = " ".join(functional_semantics.get("behavior", []))
-            search_query = f"{purpose} {behavior_text}"
-            
-            print(f">>> RAG search query based on: Extracted Semantics")
-            candidates = self.rag_system.bm25_search(search_query)
-
-            if candidates:
-                reranked_candidates = self.rag_system.rerank_with_rrf(candidates)
-                rag_context = reranked_candidates[0].get("_source", {}).get("metadata", {})
-                print(f"\n--- RAG Mode: Analyzing based on the TOP candidate ---")
-            else:
-                print("\n--- RAG Mode: No candidates found, switching to Direct Analysis ---")
+            search_query = self._search_query(functional_semantics)
+            with _timed(stage_timings, "rag_search", tracer):
+                reranked_candidates = await self.rag_system.asearch(search_query, self.retrieval_mode)
+            rag_context = self._rag_context(reranked_candidates)
         else:
-            print("\n--- RAG Disabled: Running in Direct Analysis Mode ---")
+            logger.info("--- RAG Disabled: Running in Direct Analysis Mode ---")
+
+        # 큰 파일은 검색된 CVE와 관련도가 높은 메소드만 분석/수리 (줄 번호는 마지막에 원본 기준으로 변환).
+        # 슬라이스는 검색 뒤에 한 번만 만들어 두 단계에 같이 넘기므로 프롬프트의 코드 접두부(KV 캐시)가 공유된다
+        code_slice = None
+        analyzed_code = code_snippet
+        if source is not None:
+            with _timed(stage_timings, "chunking", tracer):
+                code_slice = self._select_code(source, rag_context, functional_semantics)
+            analyzed_code = code_slice.text
 
         # --- Step 2: 통합된 분석 및 JSON 생성 ---
-        analysis_result = self.rag_system.analyze_and_get_json(code_snippet, rag_context, functional_semantics)
+        with _timed(stage_timings, "analysis", tracer):
+            analysis_result = await self.rag_system.aanalyze_and_get_json(analyzed_code, rag_context, functional_semantics)
 
         # --- Step 3: 결과 확인 및 패치 생성 ---
-        if not analysis_result or not analysis_result.get("vulnerable_sections"):
-            print("\n--- FINAL CONCLUSION: NOT VULNERABLE ---")
-            print(f"Analysis Result: {json.dumps(analysis_result, indent=2, ensure_ascii=False)}")
-            return {"status": "not_vulnerable", "details": analysis_result or "Analysis failed to produce a result."}
+        not_vulnerable = self._not_vulnerable_result(analysis_result)
+        if not_vulnerable is not None:
+            return self._map_to_original(not_vulnerable, code_slice)
 
-        print("\n--- VULNERABILITY CONFIRMED ---")
-        print(json.dumps(analysis_result, indent=2, ensure_ascii=False))
+        with _timed(stage_timings, "repair", tracer):
+            if self.enable_rag:
+                repair = await self.rag_system.arag_generate_repair_plan(analyzed_code, analysis_result, functional_semantics)
+            else:
+                repair = await self.rag_system.adirect_generate_patch(analyzed_code, analysis_result, functional_semantics)
+        result = self._map_to_original(self._repair_result(analysis_result, repair), code_slice)
+        return await self._avalidate_patch(result, code_snippet, stage_timings, tracer)
 
-        if self.enable_rag:
-            repair_plan = self.rag_system.rag_generate_repair_plan(code_snippet, analysis_result)
-            final_result_details = {
-                "analysis": analysis_result,
-                "repair_plan": repair_plan
-            }
-            print("\n--- REPAIR PLAN GENERATED ---")
-            return {"status": "vulnerable_and_plan_generated", "details": final_result_details}
-        else:
-            patch = self.rag_system.direct_generate_patch(code_snippet, analysis_result)
-            final_result_details = {
-                "analysis": analysis_result,
-                "patch": patch
-            }
-            print("\n--- PATCH GENERATED ---")
-            return {"status": "vulnerable_and_patch_generated", "details": final_result_details}
\ No newline at end of file
+    def _prepare_fast_code(self, code_snippet: str, stage_timings: Dict[str, float], tracer: Tracer):
+        """--fast 모드는 검색을 하지 않으므로, 큰 파일은 긴 메소드 순으로 상위 메소드만 남깁니다."""
+        logger.info("%s\nFast Analysis Started (single structured-output call)\n%s", "="*50, "="*50)
+        with _timed(stage_timings, "chunking", tracer):
+            source = self._parse_source(code_snippet)
+            if source is None:
+                return code_snippet, None
+            code_slice = self._select_code(source, None, None)
+        return code_slice.text, code_slice
+
+    def _finish_fast_analysis(self, fast_result: Dict[str, Any], code_slice: CodeSlice):
+        """(최종 결과 또는 None, 기능적 의미, 분석 결과). 최종 결과가 None이면 패치 생성이 필요합니다."""
+        functional_semantics, analysis_result = self._split_fast_result(fast_result)
+        not_vulnerable = self._not_vulnerable_result(analysis_result)
+        if not_vulnerable is not None:
+            not_vulnerable["functional_semantics"] = functional_semantics
+            return self._map_to_original(not_vulnerable, code_slice), functional_semantics, analysis_result
+        if not self.fast_repair:
+            return (self._map_to_original(self._fast_result(analysis_result, functional_semantics), code_slice),
+                    functional_semantics, analysis_result)
+        return None, functional_semantics, analysis_result
+
+    async def _arun_fast_pipeline(self, code_snippet: str, stage_timings: Dict[str, float], tracer: Tracer) -> Dict[str, Any]:
+        analyzed_code, code_slice = self._prepare_fast_code(code_snippet, stage_timings, tracer)
+        with _timed(stage_timings, "fast_analysis", tracer):
+            fast_result = await self.rag_system.afast_analyze(analyzed_code)
+        result, functional_semantics, analysis_result = self._finish_fast_analysis(fast_result, code_slice)
+        if result is not None:
+            return result
+
+        with _timed(stage_timings, "repair", tracer):
+            repair = await self.rag_system.adirect_generate_patch(analyzed_code, analysis_result, functional_semantics)
+        result = self._map_to_original(self._fast_result(analysis_result, functional_semantics, repair), code_slice)
+        return await self._avalidate_patch(result, code_snippet, stage_timings, tracer)
+
+    async def aclose(self) -> None:
+        await self.rag_system.aclose()
@@ -1,28 +1,33 @@
 # prompt.py (정리된 최종 버전)
 import json
 
+### 0. 모든 단계가 공유하는 코드 접두부 ###
+# 각 단계 프롬프트는 같은 텍스트로 시작하므로, Ollama 서버가 이전 단계에서 평가한 코드 토큰(KV 캐시)을 재사용한다.
+# 접두부 뒤에는 분석/수리 단계가 함께 쓰는 의미 정보를 두고, 단계별 지시문은 항상 마지막에 둔다.
+CODE_PREFIX = """You are a world-class cybersecurity expert and program repair specialist working on the code below.
+Each request that follows the code asks for one step of a vulnerability analysis. Answer it with ONLY the requested JSON object.
+
+[Code]
+{code}
+"""
+
 ### 1. 기능 의미 추출 ###
-EXTRACT_SEMANTICS_PROMPT = """You are a system that converts code into a structured JSON format.
-Your task is to summarize the code's purpose and its overall behavior in a single, concise sentence for each field.
+EXTRACT_SEMANTICS_PROMPT = CODE_PREFIX + """
+You are a system that converts code into a structured JSON format.
+Your task is to summarize the purpose and overall behavior of the code above in a single, concise sentence for each field.
 Your only job is to provide a valid JSON object. Do not add any text or explanations before or after the JSON object.
 {{
     "purpose": "To provide a utility function for adding two integers.",
     "behavior": "It takes two integers as input and returns their sum."
 }}
-
-{code}
 """
 ### 1. RAG 모드용 분석 및 JSON 생성 프롬프트 ###
-RAG_ANALYZE_JSON_PROMPT = """You are a world-class cybersecurity expert. Your SOLE task is to analyze the user's code, using the provided reference vulnerability and functional semantics, and generate a JSON object summarizing your findings.
-DO NOT write any introduction or explanation outside the JSON structure. Your entire response MUST be a single, valid JSON object.
-
-{semantics_info} 
-
+RAG_ANALYZE_JSON_PROMPT = CODE_PREFIX + """{semantics_info}
 [Reference Vulnerability Information]
 {reference_info}
 
-[Code to Analyze]
-{code}
+Your SOLE task is to analyze the code above, using the provided reference vulnerability and functional semantics, and generate a JSON object summarizing your findings.
+DO NOT write any introduction or explanation outside the JSON structure. Your entire response MUST be a single, valid JSON object.
 
 IMPORTANT: Based on the reference and the code, respond with ONLY a JSON object in this exact format.
 {{
@@ -38,14 +43,10 @@ IMPORTANT: Based on the reference and the code, respond with ONLY a JSON object
 }}
 """
 ### 2. Direct 모드용 분석 및 JSON 생성 프롬프트 ###
-DIRECT_ANALYZE_JSON_PROMPT = """You are a world-class cybersecurity expert. Your SOLE task is to meticulously analyze the user's code ON ITS OWN, using the provided functional semantics, to find potential security flaws and generate a JSON object summarizing your findings.
+DIRECT_ANALYZE_JSON_PROMPT = CODE_PREFIX + """{semantics_info}
+Your SOLE task is to meticulously analyze the code above ON ITS OWN, using the provided functional semantics, to find potential security flaws and generate a JSON object summarizing your findings.
 DO NOT write any introduction or explanation outside the JSON structure. Your entire response MUST be a single, valid JSON object.
 
-{semantics_info}
-
-[Code to Analyze]
-{code}
-
 IMPORTANT: Critically analyze the code and respond with ONLY a JSON object in this exact format. If no vulnerabilities are found, return an empty list for "vulnerable_sections".
 {{
     "analysis_summary": "A concise summary of your findings. If the code is secure, state that.",
@@ -60,14 +61,12 @@ IMPORTANT: Critically analyze the code and respond with ONLY a JSON object in th
 }}
 """
 ### 3a. RAG 모드용 수리 계획 생성 프롬프트 ###
-RAG_GENERATE_REPAIR_PLAN_PROMPT = """You are a program repair specialist. Based on the provided vulnerability analysis from a known CVE, generate a detailed, step-by-step plan to fix the code.
-The plan must consist of atomic operations (Insert, Update, Delete). You must generate 10 operations.
-
+RAG_GENERATE_REPAIR_PLAN_PROMPT = CODE_PREFIX + """{semantics_info}
 [Vulnerability Analysis]
 {analysis_json}
 
-[Original Buggy Code]
-{original_code}
+Based on the provided vulnerability analysis from a known CVE, generate a detailed, step-by-step plan to fix the code above.
+The plan must consist of atomic operations (Insert, Update, Delete). You must generate 10 operations.
 
 IMPORTANT: Respond with ONLY a JSON object in the following format. For each operation, provide a code complexity score from 1 (simple) to 10 (complex), You must generate exactly 10 candidates.
 
@@ -98,14 +97,12 @@ IMPORTANT: Respond with ONLY a JSON object in the following format. For each ope
 """
 
 ### 3b. Direct 모드용 단일 패치 생성 프롬프트 ###
-DIRECT_GENERATE_PATCH_PROMPT="""You are a program repair specialist. Based on the provided vulnerability analysis from a known CVE, generate a detailed, step-by-step plan to fix the code.
-The plan must consist of atomic operations (Insert, Update, Delete). You must generate 10 operations.
-
+DIRECT_GENERATE_PATCH_PROMPT = CODE_PREFIX + """{semantics_info}
 [Vulnerability Analysis]
 {analysis_json}
 
-[Original Buggy Code]
-{original_code}
+Based on the provided vulnerability analysis from a known CVE, generate a detailed, step-by-step plan to fix the code above.
+The plan must consist of atomic operations (Insert, Update, Delete). You must generate 10 operations.
 
 IMPORTANT: Respond with ONLY a JSON object in the following format. For each operation, provide a code complexity score from 1 (simple) to 10 (complex), You must generate exactly 10 candidates.
 
@@ -135,6 +132,91 @@ IMPORTANT: Respond with ONLY a JSON object in the following format. For each ope
 }}
 """
 
+### 단계별 출력 JSON 스키마 (Ollama format 옵션으로 전송하고, 응답 검증에도 사용) ###
+SEMANTICS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "purpose": {"type": "string"},
+        "behavior": {"type": ["string", "array"], "items": {"type": "string"}},
+    },
+    "required": ["purpose", "behavior"],
+}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analysis_summary": {"type": "string"},
+        "severity": {"type": "string", "enum": ["High", "Medium", "Low", "Not Vulnerable"]},
+        "vulnerable_sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "vulnerable_lines": {"type": "string"},
+                    "code_snippet": {"type": "string"},
+                    "reason": {"type": "string"},
+                },
+                "required": ["vulnerable_lines", "code_snippet", "reason"],
+            },
+        },
+    },
+    "required": ["analysis_summary", "severity", "vulnerable_sections"],
+}
+
+REPAIR_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "repair_operations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": ["Insert", "Update", "Delete"]},
+                    "line_number": {"type": ["integer", "string"]},
+                    "code_to_update": {"type": "string"},
+                    "code_to_add": {"type": "string"},
+                    "code_to_delete": {"type": "string"},
+                    "complexity": {"type": "integer"},
+                },
+                "required": ["type", "line_number", "complexity"],
+            },
+        },
+    },
+    "required": ["repair_operations"],
+}
+
+### 4. --fast 모드용 의미 추출 + 분석 통합 프롬프트 (Ollama format 스키마로 출력 형식을 강제) ###
+FAST_ANALYZE_JSON_PROMPT = CODE_PREFIX + """
+Your SOLE task is to summarize the code above and decide whether it contains a security vulnerability, in a single JSON object.
+- "purpose" and "behavior": one concise sentence each describing what the code does.
+- "vulnerable_sections": every vulnerable section you find. If the code is secure, return an empty list and set "severity" to "Not Vulnerable".
+DO NOT write any introduction or explanation outside the JSON structure. Your entire response MUST be a single, valid JSON object.
+{{
+    "purpose": "To provide a utility function for adding two integers.",
+    "behavior": "It takes two integers as input and returns their sum.",
+    "analysis_summary": "A concise summary of your findings. If the code is secure, state that.",
+    "severity": "High/Medium/Low/Not Vulnerable",
+    "vulnerable_sections": [
+        {{
+            "vulnerable_lines": "start-end",
+            "code_snippet": "The exact, original vulnerable code snippet.",
+            "reason": "A detailed explanation of why this specific section is vulnerable."
+        }}
+    ]
+}}
+"""
+
+FAST_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {**SEMANTICS_SCHEMA["properties"], **ANALYSIS_SCHEMA["properties"]},
+    "required": SEMANTICS_SCHEMA["required"] + ANALYSIS_SCHEMA["required"],
+}
+
+### 5. JSON 재요청 안내문 (응답이 스키마에 맞지 않을 때 같은 단계의 프롬프트 뒤에 덧붙임) ###
+JSON_RETRY_SUFFIX = """
+Your previous answer could not be used ({error}). Respond again with ONLY a single, complete JSON object in the requested format.
+"""
+
 
 ### Helper 함수 (재추가) ###
 def get_semantics_info(semantics_data=None):
@@ -1,74 +1,334 @@
 # rag.py (최종 버전)
+import asyncio
+import contextvars
 import json
+import logging
 import re
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
 from elastic_utils import get_elasticsearch_client
 from ollama_utils import OllamaClient
-from config import INDEX_NAME
+from async_ollama_utils import AsyncOllamaClient
+from background_loop import in_background_loop, run_sync
+from json_stream import StreamingJSONExtractor, repair_json, schema_error
+from tracing import add_span_attribute, child_span, current_span, set_span_attribute
+from log_utils import archive_llm_call
+from llm_cache import make_cache_key
+from embedding_reducer import get_embedding_reducer
+from config import (
+    INDEX_NAME,
+    RETRIEVAL_CANDIDATES,
+    RETRIEVAL_TOP_K,
+    KNN_MODE,
+    KNN_NUM_CANDIDATES,
+    RRF_K,
+    RRF_BM25_WEIGHT,
+    RRF_KNN_WEIGHT,
+    RAG_BACKEND,
+    LLM_STREAM_EARLY_STOP,
+    LLM_JSON_SCHEMA_ENABLED,
+    LLM_STAGE_RETRIES,
+    STAGE_MODELS,
+    SEMANTICS_BACKEND,
+    CODET5_MAX_UNITS,
+)
 from prompt import (
     EXTRACT_SEMANTICS_PROMPT,
     RAG_ANALYZE_JSON_PROMPT,
     DIRECT_ANALYZE_JSON_PROMPT,
     RAG_GENERATE_REPAIR_PLAN_PROMPT,
     DIRECT_GENERATE_PATCH_PROMPT,
+    FAST_ANALYZE_JSON_PROMPT,
+    FAST_ANALYSIS_SCHEMA,
+    SEMANTICS_SCHEMA,
+    ANALYSIS_SCHEMA,
+    REPAIR_PLAN_SCHEMA,
+    JSON_RETRY_SUFFIX,
     get_semantics_info
 )
 
+logger = logging.getLogger(__name__)
+
+def reciprocal_rank_fusion(ranked_lists: Dict[str, List[Dict[str, Any]]],
+                           weights: Dict[str, float] = None,
+                           k: int = RRF_K,
+                           top_k: int = RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+    """
+    여러 검색 결과 목록을 RRF(score = Σ w / (k + rank))로 결합합니다.
+    반환되는 hit의 _score는 RRF 점수이며, _rrf에 검색기별 순위가 기록됩니다.
+    """
+    weights = weights or {}
+    fused: Dict[str, Dict[str, Any]] = {}
+    for source, hits in ranked_lists.items():
+        weight = weights.get(source, 1.0)
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["_id"], {"hit": hit, "score": 0.0, "ranks": {}})
+            entry["score"] += weight / (k + rank)
+            entry["ranks"][source] = rank
+
+    results = []
+    for entry in sorted(fused.values(), key=lambda e: e["score"], reverse=True)[:top_k]:
+        hit = dict(entry["hit"])
+        hit["_score"] = entry["score"]
+        hit["_rrf"] = entry["ranks"]
+        results.append(hit)
+    return results
+
 class VulRAG:
-    def __init__(self, enable_rag: bool = True):
+    def __init__(self, enable_rag: bool = True, llm_cache=None, backend: str = RAG_BACKEND,
+                 semantics_backend: str = SEMANTICS_BACKEND, ollama_client: OllamaClient = None,
+                 embedded_index=None):
         self.enable_rag = enable_rag
+        self.backend = backend
+        # 기능적 의미 추출 방식: "llm" 또는 "codet5"(로컬 요약 모델, 처음 사용할 때 불러옴)
+        self.semantics_backend = semantics_backend
+        self.embedded_index = None
         if enable_rag:
-            self.es_client = get_elasticsearch_client()
-        self.ollama_client = OllamaClient()
+            if backend == "embedded":
+                # Elasticsearch 없이 로컬 임베딩 행렬 + 메모리 내 BM25로 검색
+                from vector_store import EmbeddedKnowledgeIndex
+                self.embedded_index = embedded_index or EmbeddedKnowledgeIndex()
+            else:
+                self.es_client = get_elasticsearch_client()
+        # ollama_client / embedded_index를 넘기면 기본 호스트/인덱스 대신 사용 (benchmark.py의 대역 서버 등)
+        self.ollama_client = ollama_client or OllamaClient()
+        self.llm_cache = llm_cache
+        # 백그라운드 루프가 아닌 이벤트 루프(start.py --async 등)에서 a* 메소드를 처음 호출할 때 생성
+        self.async_ollama_client = None
+        self.stream_early_stop = LLM_STREAM_EARLY_STOP
+        # 단계별 JSON 스키마를 Ollama format으로 전송할지, 스키마에 맞지 않는 응답을 몇 번까지 재요청할지
+        self.json_schema_enabled = LLM_JSON_SCHEMA_ENABLED
+        self.stage_retries = LLM_STAGE_RETRIES
+        # BM25/kNN 검색을 동시에 실행하기 위한 스레드 풀 (--workers 사용 시 여러 파이프라인이 공유)
+        self._search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vulrag-search")
+
+    def _stage_model(self) -> str:
+        """현재 파이프라인 단계(trace span)에 지정된 모델 (STAGE_MODELS, 없으면 기본 모델)"""
+        return STAGE_MODELS.get(self._current_stage()) or self.ollama_client.model
+
+    def _cached_response(self, model: str, prompt: str, temperature: float, schema: Dict = None):
+        if self.llm_cache is None:
+            return None, None
+        # 조기 종료한 응답은 JSON 객체 뒤의 출력이 없으므로 전체 응답과 다른 키로 저장
+        options = {"stop_on_json": self.stream_early_stop}
+        if schema:
+            options["format"] = schema
+        cache_key = make_cache_key(model, prompt, temperature, options)
+        raw_response = self.llm_cache.get(cache_key)
+        add_span_attribute("cache_hits" if raw_response is not None else "cache_misses", 1)
+        return cache_key, raw_response
+
+    def _async_client(self) -> AsyncOllamaClient:
+        """
+        현재 이벤트 루프에서 사용할 LLM 클라이언트. 동기 API가 실행되는 백그라운드 루프에서는 ollama_client의
+        클라이언트(같은 호스트 풀과 연결)를, 다른 이벤트 루프에서는 async_ollama_client를 사용합니다.
+        """
+        if in_background_loop():
+            return self.ollama_client.transport.client
+        if self.async_ollama_client is None:
+            self.async_ollama_client = AsyncOllamaClient(model=self.ollama_client.model)
+        return self.async_ollama_client
+
+    async def _agenerate_json(self, prompt: str, temperature: float = 0.0, schema: Dict = None) -> Tuple[Dict, str, Any]:
+        """
+        LLM 응답을 스트리밍으로 받아 JSON 객체를 추출합니다. (파싱 결과, <think>를 제거한 응답, 캐시 항목)을 반환합니다.
+        LLM_STREAM_EARLY_STOP이면 최상위 JSON 객체가 완성되는 즉시 생성을 중단합니다.
+        schema(JSON 스키마)가 주어지면 Ollama의 format 옵션으로 출력 형식을 강제합니다.
+        모델은 현재 단계에 따라 STAGE_MODELS에서 고릅니다.
+        캐시 항목은 호출자가 응답을 검증한 뒤 _cache_generation()으로 저장합니다 (캐시 hit이거나 저장할 수 없으면 None).
+        """
+        model = self._stage_model()
+        cache_key, raw_response = self._cached_response(model, prompt, temperature, schema)
+        if raw_response is not None:
+            archive_llm_call(self._current_stage(), prompt, raw_response, cache_hit=True)
+            return self._extract_json(raw_response) + (None,)
+
+        parsed, raw_response, metrics = await self._async_client().generate_json(
+            prompt, temperature=temperature, stop_on_json=self.stream_early_stop, format=schema, model=model
+        )
+        return self._finish_generation(cache_key, model, prompt, parsed, raw_response, metrics)
+
+    async def _agenerate_stage_json(self, prompt: str, schema: Dict) -> Tuple[Dict, str]:
+        """
+        파이프라인 단계 하나의 JSON을 생성합니다. 응답이 스키마(type/required)에 맞지 않으면
+        이 단계의 프롬프트에만 문제를 덧붙여 최대 stage_retries회 다시 요청합니다 (앞 단계는 재실행하지 않음).
+        스키마 검사를 통과한 응답만 캐시합니다.
+        """
+        request_prompt = prompt
+        for attempt in range(self.stage_retries + 1):
+            parsed, cleaned, entry = await self._agenerate_json(request_prompt, schema=schema if self.json_schema_enabled else None)
+            error = self._stage_json_error(parsed, schema, attempt)
+            if error is None:
+                self._cache_generation(entry)
+                break
+            request_prompt = prompt + JSON_RETRY_SUFFIX.format(error=error)
+        return parsed, cleaned
+
+    def _stage_json_error(self, parsed: Dict, schema: Dict, attempt: int) -> str:
+        """응답을 사용할 수 없으면 이유를, 사용할 수 있으면 None을 반환하고 재시도 여부를 기록합니다."""
+        error = schema_error(parsed, schema) if parsed else "no JSON object in the response"
+        if error is None:
+            return None
+        if attempt < self.stage_retries:
+            logger.warning("[%s] unusable JSON response (%s), retrying this stage (%d/%d)",
+                           self._current_stage(), error, attempt + 1, self.stage_retries)
+            add_span_attribute("json_retries", 1)
+        else:
+            logger.warning("[%s] unusable JSON response after %d retries: %s", self._current_stage(), attempt, error)
+            set_span_attribute("json_error", error)
+        return error
+
+    @staticmethod
+    def _current_stage() -> str:
+        span = current_span()
+        return span.name if span is not None else None
+
+    def _finish_generation(self, cache_key, model: str, prompt: str, parsed, raw_response: str,
+                           metrics: Dict[str, Any]) -> Tuple[Dict, str, Any]:
+        self._record_generation_metrics(metrics)
+        set_span_attribute("model", model)
+        # prompt_eval_count / prompt_chars가 작을수록 서버가 공유 접두부(KV 캐시)를 많이 재사용한 것
+        add_span_attribute("prompt_chars", len(prompt))
+        archive_llm_call(self._current_stage(), prompt, raw_response, cache_hit=False, model=model,
+                         metrics=metrics)
+        result = (parsed, self._clean_response(raw_response)) if parsed is not None else self._extract_json(raw_response)
+        # JSON을 얻지 못했거나 잘린 객체를 복구한 응답은 캐시하지 않는다 (다음 실행에서 다시 생성)
+        cacheable = cache_key is not None and result[0] and not metrics.get("json_repaired")
+        return result + ((cache_key, raw_response) if cacheable else None,)
+
+    def _cache_generation(self, entry) -> None:
+        """_agenerate_json이 반환한 캐시 항목(검증을 통과한 응답)을 저장합니다."""
+        if entry is not None:
+            self.llm_cache.put(*entry)
+
+    def _extract_json(self, raw_response: str) -> Tuple[Dict, str]:
+        """<think> 바깥의 첫 번째 유효한 최상위 JSON 객체를 찾고, 없으면 잘린 객체 복구까지 시도합니다."""
+        cleaned_response = self._clean_response(raw_response)
+        extractor = StreamingJSONExtractor()
+        if extractor.feed(raw_response):
+            return extractor.result, cleaned_response
+        return self._parse_llm_response(cleaned_response), cleaned_response
 
-    def _generate_and_clean(self, prompt: str) -> str:
-        raw_response = self.ollama_client.generate_completion(prompt)
-        cleaned_response = re.sub(r'<think>.*?</think>', '', raw_response, flags=re.DOTALL).strip()
-        return cleaned_response
+    @staticmethod
+    def _record_generation_metrics(metrics: Dict[str, Any]) -> None:
+        """생성 지표를 로그로 남기고 현재 trace span(파이프라인 단계)에 누적합니다."""
+        logger.debug(">>> LLM generation: TTFT %s, %s tokens, %.1f tokens/sec%s",
+                     f"{metrics['ttft']:.2f}s" if metrics["ttft"] is not None else "-", metrics["tokens"],
+                     metrics["tokens_per_sec"], " (early stop)" if metrics["early_stop"] else "")
+
+        add_span_attribute("llm_calls", 1)
+        # 조기 종료 시에는 서버 통계(done 메시지)를 받지 못하므로 스트리밍으로 받은 토큰 수를 기록
+        add_span_attribute("eval_count", metrics["eval_count"] or metrics["tokens"])
+        if metrics.get("prompt_eval_count") is not None:
+            add_span_attribute("prompt_eval_count", metrics["prompt_eval_count"])
+        for key in ("prompt_eval_duration", "eval_duration"):
+            if metrics.get(key) is not None:
+                add_span_attribute(f"{key}_ms", metrics[key] / 1e6)
+        if metrics["ttft"] is not None:
+            set_span_attribute("ttft", round(metrics["ttft"], 4))
+        set_span_attribute("tokens_per_sec", round(metrics["tokens_per_sec"], 2))
+        set_span_attribute("early_stop", metrics["early_stop"])
+        if metrics.get("json_repaired"):
+            logger.warning(">>> LLM response ended inside the JSON object; parsed the repaired (truncated) object")
+            add_span_attribute("json_repairs", 1)
+
+    @staticmethod
+    def _clean_response(raw_response: str) -> str:
+        return re.sub(r'<think>.*?</think>', '', raw_response, flags=re.DOTALL).strip()
+
+    async def aclose(self) -> None:
+        if self.async_ollama_client is not None:
+            await self.async_ollama_client.aclose()
+            self.async_ollama_client = None
 
     def _parse_llm_response(self, response_text: str) -> Dict:
-        try:
-            start_idx = response_text.find("{")
-            end_idx = response_text.rfind("}") + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-            return {}
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"\nError parsing LLM response: {e}\nRaw response: {response_text}")
+        """trailing comma, 코드 펜스, 잘린 출력까지 허용하여 JSON 객체를 추출합니다. 실패하면 {}."""
+        parsed = repair_json(response_text)
+        if parsed is None:
+            logger.warning("Error parsing LLM response: no recoverable JSON object")
+            logger.debug("Raw response: %s", response_text)
             return {}
+        return parsed
 
-    def extract_functional_semantics(self, code_snippet: str) -> Dict[str, str]:
-        """[1단계] 코드의 기능적 의미를 추출합니다. (디버깅 모드)"""
-        print("\nExecuting: Step 1 - Extract Functional Semantics")
+    def _build_semantics_prompt(self, code_snippet: str) -> str:
+        logger.info("Executing: Step 1 - Extract Functional Semantics")
         
         # 템플릿에 실제 코드를 삽입하여 최종 프롬프트를 완성합니다.
         prompt = EXTRACT_SEMANTICS_PROMPT.format(code=code_snippet)
         
-        # --- 디버깅을 위한 PRINT문 추가 (1) ---
-        # LLM에게 실제로 전달되는 프롬프트가 어떤 모습인지 확인합니다.
-        # 이 프롬프트의 JSON 예시에서 중괄호가 {{가 아닌 {로 보여야 정상입니다.
-        print("\n" + "="*20 + " [DEBUG] FINAL PROMPT SENT TO LLM " + "="*20)
-        print(prompt)
-        print("="*70 + "\n")
-        
-        # LLM을 호출하여 응답을 받습니다.
-        raw_response = self._generate_and_clean(prompt)
-        
-        # --- 디버깅을 위한 PRINT문 추가 (2) ---
-        # LLM이 생성한, 파싱하기 전의 '날것 그대로의' 응답을 확인합니다.
-        # 이 응답이 유효한 JSON 형태인지 눈으로 직접 확인해야 합니다.
-        print("\n" + "="*20 + " [DEBUG] RAW RESPONSE FROM LLM " + "="*20)
-        print(raw_response)
-        print("="*70 + "\n")
-        
-        # 응답을 파싱하여 딕셔너리로 변환합니다.
-        # 만약 raw_response가 유효한 JSON이 아니라면 여기서 에러가 발생합니다.
-        return self._parse_llm_response(raw_response)
+        # LLM에게 실제로 전달되는 프롬프트 (JSON 예시의 중괄호가 {{가 아닌 {로 보여야 정상)
+        logger.debug("FINAL PROMPT SENT TO LLM:\n%s", prompt)
+        return prompt
+
+    def _log_semantics_response(self, raw_response: str) -> None:
+        # LLM이 생성한, 파싱하기 전의 응답 (<think> 블록 제외)
+        logger.debug("RAW RESPONSE FROM LLM:\n%s", raw_response)
+
+    def extract_functional_semantics(self, code_snippet: str) -> Dict[str, str]:
+        """aextract_functional_semantics의 동기 버전"""
+        return run_sync(self.aextract_functional_semantics(code_snippet))
+
+    async def aextract_functional_semantics(self, code_snippet: str) -> Dict[str, str]:
+        """[1단계] 코드의 기능적 의미를 추출합니다. (프롬프트/응답은 DEBUG 레벨로 기록)"""
+        prompt = self._build_semantics_prompt(code_snippet)
+        # LLM을 호출하여 응답을 받고 딕셔너리로 변환합니다.
+        functional_semantics, raw_response = await self._agenerate_stage_json(prompt, SEMANTICS_SCHEMA)
+        self._log_semantics_response(raw_response)
+        return functional_semantics
+
+    def summarize_functional_semantics(self, code_snippet: str) -> Dict[str, Any]:
+        """
+        [1단계, codet5] LLM 대신 로컬 CodeT5 모델로 기능적 의미를 만듭니다.
+        purpose는 클래스 개요(필드와 메소드 시그니처, JavaSource.outline())의 요약, behavior는 (클래스 안의) 메소드별 요약이며
+        한 번의 배치 생성으로 얻습니다. 입력 길이 제한(512 토큰)에 긴 코드의 앞부분만 들어가지 않도록 purpose에는 본문을 넣지 않습니다.
+        """
+        from codet5.codet5 import get_summarizer
+        from java_chunker import JavaSource
+
+        logger.info("Executing: Step 1 - Extract Functional Semantics (CodeT5)")
+        source = JavaSource(code_snippet)
+        units = sorted(source.units, key=lambda unit: unit.start_line - unit.end_line)[:CODET5_MAX_UNITS]
+        units.sort(key=lambda unit: unit.start_line)
+        unit_texts = ["\n".join(source.lines[unit.start_line - 1:unit.end_line]) for unit in units]
+        overview = source.outline() if source.units else code_snippet
+        summaries = get_summarizer().summarize_batch([overview] + unit_texts)
+        set_span_attribute("semantics_backend", "codet5")
+        add_span_attribute("summaries", len(summaries))
+
+        purpose = summaries[0]
+        behavior = [f"{unit.qualified_name}: {summary}" for unit, summary in zip(units, summaries[1:]) if summary]
+        functional_semantics = {"purpose": purpose or "Unknown", "behavior": behavior or ([purpose] if purpose else [])}
+        logger.debug("CODET5 SEMANTICS: %s", functional_semantics)
+        return functional_semantics
+
+    async def asummarize_functional_semantics(self, code_snippet: str) -> Dict[str, Any]:
+        """summarize_functional_semantics의 비동기 버전 (모델 추론은 스레드에서 실행)"""
+        return await asyncio.to_thread(self.summarize_functional_semantics, code_snippet)
 
-    def bm25_search(self, query_text: str) -> List[Dict[str, Any]]:
-        print("\nExecuting: RAG Search (BM25)")
+    def _build_fast_prompt(self, code_snippet: str) -> str:
+        logger.info("Executing: Fast Mode - Semantics & Analysis in a single call")
+        prompt = FAST_ANALYZE_JSON_PROMPT.format(code=code_snippet)
+        logger.debug("FINAL PROMPT SENT TO LLM:\n%s", prompt)
+        return prompt
+
+    def fast_analyze(self, code_snippet: str) -> Dict[str, Any]:
+        """afast_analyze의 동기 버전"""
+        return run_sync(self.afast_analyze(code_snippet))
+
+    async def afast_analyze(self, code_snippet: str) -> Dict[str, Any]:
+        """[--fast] 의미 추출과 분석을 한 번의 구조화 출력(format 스키마) 호출로 수행합니다."""
+        prompt = self._build_fast_prompt(code_snippet)
+        return (await self._agenerate_stage_json(prompt, FAST_ANALYSIS_SCHEMA))[0]
+
+    def bm25_search(self, query_text: str, size: int = RETRIEVAL_CANDIDATES) -> List[Dict[str, Any]]:
+        with child_span("bm25_search", backend=self.backend):
+            return self._bm25_search(query_text, size)
+
+    def _bm25_search(self, query_text: str, size: int) -> List[Dict[str, Any]]:
+        logger.info("Executing: RAG Search (BM25)")
         if not query_text: return []
+        if self.embedded_index is not None:
+            return self.embedded_index.bm25_search(query_text, size)
         body = {
             "query": {
                 "match": {
@@ -80,63 +340,151 @@ class VulRAG:
             }
         }
         try:
-            response = self.es_client.search(index=INDEX_NAME, body=body, size=10)
+            response = self.es_client.search(index=INDEX_NAME, body=body, size=size)
+            set_span_attribute("es_took_ms", response.get("took"))
             return response["hits"]["hits"]
         except Exception as e:
-            print(f"Error during BM25 search: {e}")
+            logger.error("Error during BM25 search: %s", e)
             return []
 
+    def knn_search(self, query_text: str, size: int = RETRIEVAL_CANDIDATES) -> List[Dict[str, Any]]:
+        """인덱싱 시 저장된 embedding 필드에 대해 쿼리 임베딩으로 벡터 검색을 수행합니다."""
+        with child_span("knn_search", backend=self.backend):
+            return self._knn_search(query_text, size)
+
+    def _knn_search(self, query_text: str, size: int) -> List[Dict[str, Any]]:
+        logger.info("Executing: RAG Search (kNN)")
+        if not query_text: return []
+        try:
+            query_vector = get_embedding_reducer().transform_one(self.ollama_client.generate_embedding(query_text)).tolist()
+            if self.embedded_index is not None:
+                return self.embedded_index.knn_search(query_vector, size)
+            if KNN_MODE == "knn":
+                # ES 8.x 근사 kNN (HNSW 인덱싱된 dense_vector 필요)
+                response = self.es_client.search(index=INDEX_NAME, body={
+                    "knn": {
+                        "field": "embedding",
+                        "query_vector": query_vector,
+                        "k": size,
+                        "num_candidates": max(size, KNN_NUM_CANDIDATES)
+                    }
+                }, size=size)
+            else:
+                # ES 7.x에서도 동작하는 정확(brute-force) 코사인 유사도 검색
+                response = self.es_client.search(index=INDEX_NAME, body={
+                    "query": {
+                        "script_score": {
+                            "query": {"match_all": {}},
+                            "script": {
+                                "source": "cosineSimilarity(params.query_vector, 'embedding') + 1.0",
+                                "params": {"query_vector": query_vector}
+                            }
+                        }
+                    }
+                }, size=size)
+            set_span_attribute("es_took_ms", response.get("took"))
+            return response["hits"]["hits"]
+        except Exception as e:
+            logger.error("Error during kNN search: %s", e)
+            return []
+
+    def hybrid_search(self, query_text: str, top_k: int = RETRIEVAL_TOP_K, size: int = RETRIEVAL_CANDIDATES,
+                      rrf_k: int = RRF_K, bm25_weight: float = RRF_BM25_WEIGHT,
+                      knn_weight: float = RRF_KNN_WEIGHT) -> List[Dict[str, Any]]:
+        """BM25와 kNN 검색을 동시에 실행하고 RRF로 결합하여 상위 top_k개를 반환합니다."""
+        logger.info("Executing: RAG Search (Hybrid BM25 + kNN, RRF)")
+        if not query_text: return []
+        # 각 검색의 trace span이 현재 단계(rag_search) 아래에 기록되도록 컨텍스트를 복사해 실행
+        bm25_future = self._search_executor.submit(contextvars.copy_context().run, self.bm25_search, query_text, size)
+        knn_future = self._search_executor.submit(contextvars.copy_context().run, self.knn_search, query_text, size)
+        return reciprocal_rank_fusion(
+            {"bm25": bm25_future.result(), "knn": knn_future.result()},
+            weights={"bm25": bm25_weight, "knn": knn_weight},
+            k=rrf_k,
+            top_k=top_k
+        )
+
     def rerank_with_rrf(self, candidates: List[Dict]) -> List[Dict[str, Any]]:
-        print("\nExecuting: Reranking Candidates")
+        logger.info("Executing: Reranking Candidates")
         if not candidates: return []
         candidates.sort(key=lambda x: x.get("_score", 0), reverse=True)
         return candidates[:1]
 
-    def analyze_and_get_json(self, code_snippet: str, rag_data: Dict = None, functional_semantics: Dict = None) -> Dict[str, Any]:
-        """[Step 1: 통합된 분석 및 JSON 생성] RAG/Direct 모드에 따라 적절한 프롬프트를 사용하여 분석을 수행하고 JSON을 반환합니다."""
-        print("\nExecuting: Step 1 - Integrated Analysis & JSON Generation")
+    async def asearch(self, query_text: str, retrieval_mode: str) -> List[Dict[str, Any]]:
+        """
+        검색 단계의 비동기 버전. ES 클라이언트가 동기식이므로 스레드에서 실행하며,
+        hybrid는 RRF로 정렬된 상위 후보를, bm25는 rerank_with_rrf 결과를 반환합니다.
+        """
+        if retrieval_mode == "hybrid":
+            return await asyncio.to_thread(self.hybrid_search, query_text)
+        candidates = await asyncio.to_thread(self.bm25_search, query_text)
+        return self.rerank_with_rrf(candidates) if candidates else []
+
+    def _build_analysis_prompt(self, code_snippet: str, rag_data: Dict = None, functional_semantics: Dict = None) -> str:
+        logger.info("Executing: Step 1 - Integrated Analysis & JSON Generation")
         
         # --- 여기부터 수정 ---
         # 1. get_semantics_info 헬퍼 함수를 호출하여 컨텍스트 문자열 생성
         semantics_context = get_semantics_info(functional_semantics)
         
         if self.enable_rag and rag_data:
-            print("Using RAG-context-based analysis prompt.")
+            logger.info("Using RAG-context-based analysis prompt.")
             reference_info = json.dumps(rag_data.get('vulnerability_causes', {}), indent=2)
             # 2. format에 semantics_info 추가
-            prompt = RAG_ANALYZE_JSON_PROMPT.format(
+            return RAG_ANALYZE_JSON_PROMPT.format(
                 code=code_snippet, 
                 reference_info=reference_info,
                 semantics_info=semantics_context 
             )
         else:
-            print("Using Direct-mode-specific analysis prompt.")
+            logger.info("Using Direct-mode-specific analysis prompt.")
             # 2. format에 semantics_info 추가
-            prompt = DIRECT_ANALYZE_JSON_PROMPT.format(
+            return DIRECT_ANALYZE_JSON_PROMPT.format(
                 code=code_snippet,
                 semantics_info=semantics_context
             )
-            
-        response_text = self._generate_and_clean(prompt)
-        return self._parse_llm_response(response_text)
 
-    # --- 아래 두 개의 메소드가 모두 정의되어 있는지 확인하세요 ---
-    def rag_generate_repair_plan(self, original_code: str, analysis: Dict) -> Dict:
-        """[Step 2 - RAG Mode] RAG 분석 결과를 바탕으로 Insert/Update/Delete 수리 계획을 생성합니다."""
-        print("\nExecuting: Step 2 - Generate Repair Plan (RAG Mode)")
-        prompt = RAG_GENERATE_REPAIR_PLAN_PROMPT.format(
-            original_code=original_code,
+    def analyze_and_get_json(self, code_snippet: str, rag_data: Dict = None, functional_semantics: Dict = None) -> Dict[str, Any]:
+        """aanalyze_and_get_json의 동기 버전"""
+        return run_sync(self.aanalyze_and_get_json(code_snippet, rag_data, functional_semantics))
+
+    async def aanalyze_and_get_json(self, code_snippet: str, rag_data: Dict = None, functional_semantics: Dict = None) -> Dict[str, Any]:
+        """[Step 1: 통합된 분석 및 JSON 생성] RAG/Direct 모드에 따라 적절한 프롬프트를 사용하여 분석을 수행하고 JSON을 반환합니다."""
+        prompt = self._build_analysis_prompt(code_snippet, rag_data, functional_semantics)
+        return (await self._agenerate_stage_json(prompt, ANALYSIS_SCHEMA))[0]
+
+    def _build_repair_plan_prompt(self, original_code: str, analysis: Dict, functional_semantics: Dict = None) -> str:
+        logger.info("Executing: Step 2 - Generate Repair Plan (RAG Mode)")
+        # 코드 + 의미 정보까지는 분석 프롬프트와 같은 접두부이므로 서버의 KV 캐시가 재사용된다
+        return RAG_GENERATE_REPAIR_PLAN_PROMPT.format(
+            code=original_code,
+            semantics_info=get_semantics_info(functional_semantics),
             analysis_json=json.dumps(analysis, indent=2)
         )
-        response_text = self._generate_and_clean(prompt)
-        return self._parse_llm_response(response_text)
 
-    def direct_generate_patch(self, original_code: str, analysis: Dict) -> Dict:
-        """[Step 2 - Direct Mode] 분석 결과를 바탕으로 단일 패치 코드를 생성합니다."""
-        print("\nExecuting: Step 2 - Generate Single Patch (Direct Mode)")
-        prompt = DIRECT_GENERATE_PATCH_PROMPT.format(
-            original_code=original_code,
+    def _build_patch_prompt(self, original_code: str, analysis: Dict, functional_semantics: Dict = None) -> str:
+        logger.info("Executing: Step 2 - Generate Single Patch (Direct Mode)")
+        return DIRECT_GENERATE_PATCH_PROMPT.format(
+            code=original_code,
+            semantics_info=get_semantics_info(functional_semantics),
             analysis_json=json.dumps(analysis, indent=2)
         )
-        response_text = self._generate_and_clean(prompt)
-        return self._parse_llm_response(response_text)
\ No newline at end of file
+
+    # --- 아래 두 개의 메소드가 모두 정의되어 있는지 확인하세요 ---
+    def rag_generate_repair_plan(self, original_code: str, analysis: Dict, functional_semantics: Dict = None) -> Dict:
+        """arag_generate_repair_plan의 동기 버전"""
+        return run_sync(self.arag_generate_repair_plan(original_code, analysis, functional_semantics))
+
+    def direct_generate_patch(self, original_code: str, analysis: Dict, functional_semantics: Dict = None) -> Dict:
+        """adirect_generate_patch의 동기 버전"""
+        return run_sync(self.adirect_generate_patch(original_code, analysis, functional_semantics))
+
+    async def arag_generate_repair_plan(self, original_code: str, analysis: Dict, functional_semantics: Dict = None) -> Dict:
+        """[Step 2 - RAG Mode] RAG 분석 결과를 바탕으로 Insert/Update/Delete 수리 계획을 생성합니다."""
+        prompt = self._build_repair_plan_prompt(original_code, analysis, functional_semantics)
+        return (await self._agenerate_stage_json(prompt, REPAIR_PLAN_SCHEMA))[0]
+
+    async def adirect_generate_patch(self, original_code: str, analysis: Dict, functional_semantics: Dict = None) -> Dict:
+        """[Step 2 - Direct Mode] 분석 결과를 바탕으로 단일 패치 코드를 생성합니다."""
+        prompt = self._build_patch_prompt(original_code, analysis, functional_semantics)
+        return (await self._agenerate_stage_json(prompt, REPAIR_PLAN_SCHEMA))[0]
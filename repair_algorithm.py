@@ -1,100 +1,249 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import functools
+import logging
 import re
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+import threading
+import time
+from patch_validator import get_syntax_checker
+from config import REPAIR_ENGINE_MODEL, REPAIR_ENGINE_BATCH_SIZE, REPAIR_ENGINE_MAX_NEW_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# 취약점 유형별 검사 패턴 (모듈을 불러올 때 한 번만 컴파일)
+VULNERABILITY_PATTERNS = {
+    "injection": re.compile(r"(?i)(eval|exec|system|os\.system)"),
+    "xss": re.compile(r"(?i)(<script|javascript:|on\w+\s*=)"),
+    "sql_injection": re.compile(r"(?i)(SELECT|INSERT|UPDATE|DELETE).*WHERE.*=.*'"),
+    # 추가 패턴들...
+}
+
+# 여러 패턴을 하나의 alternation으로 합칠 수 없는 경우 (역참조는 합치면 그룹 번호가 달라짐)
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+MODEL_FIX_PROMPT = """
+            Fix the following vulnerable code that has a {vulnerability_type} vulnerability:
+
+            {vulnerable_code}
+
+            Fixed code:
+            """
+
+
+def vulnerability_matches(code: str, vulnerability_type: str) -> int:
+    """코드에서 해당 유형의 취약 패턴이 나타나는 횟수 (패턴이 없는 유형은 0)."""
+    pattern = VULNERABILITY_PATTERNS.get(vulnerability_type)
+    return 0 if pattern is None else sum(1 for _ in pattern.finditer(code))
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_pattern(pattern: str) -> "re.Pattern":
+    """참조 수정사항의 패턴을 컴파일합니다 (같은 패턴은 한 번만 컴파일)."""
+    return re.compile(pattern)
+
+
+class ReferenceFixRegistry:
+    """
+    참조 수정사항을 취약점 유형별로 미리 컴파일해 둡니다.
+    유형마다 모든 패턴을 합친 alternation을 먼저 검사하여, 어느 패턴도 맞지 않는 코드는 개별 치환을 건너뜁니다.
+    """
+
+    def __init__(self, reference_fixes: List[Dict[str, Any]]):
+        self._fixes: Dict[str, List[Tuple["re.Pattern", str, Dict[str, Any]]]] = {}
+        self._combined: Dict[str, Optional["re.Pattern"]] = {}
+        for ref_fix in reference_fixes:
+            pattern = ref_fix.get("pattern")
+            replacement = ref_fix.get("replacement")
+            if not (pattern and replacement):
+                continue
+            try:
+                compiled = compile_pattern(pattern)
+            except re.error as e:
+                logger.warning("Skipping reference fix with invalid pattern %r: %s", pattern, e)
+                continue
+            self._fixes.setdefault(ref_fix.get("vulnerability_type"), []).append((compiled, replacement, ref_fix))
+
+        for vulnerability_type, fixes in self._fixes.items():
+            patterns = [compiled.pattern for compiled, _, _ in fixes]
+            if any(_BACKREFERENCE.search(pattern) for pattern in patterns):
+                self._combined[vulnerability_type] = None
+                continue
+            try:
+                self._combined[vulnerability_type] = re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+            except re.error:
+                # 인라인 플래그 위치 등으로 합칠 수 없으면 개별 패턴만 사용
+                self._combined[vulnerability_type] = None
+
+    def apply(self, vulnerable_code: str, vulnerability_type: str) -> List[Dict[str, Any]]:
+        """해당 유형의 참조 수정사항을 코드에 적용한 제안 목록 (코드가 바뀐 것만)"""
+        fixes = self._fixes.get(vulnerability_type)
+        if not fixes:
+            return []
+        combined = self._combined.get(vulnerability_type)
+        if combined is not None and not combined.search(vulnerable_code):
+            return []
+
+        suggestions = []
+        for compiled, replacement, ref_fix in fixes:
+            try:
+                fixed_code = compiled.sub(replacement, vulnerable_code)
+            except (re.error, IndexError) as e:
+                logger.warning("Error applying reference fix: %s", e)
+                continue
+            if fixed_code != vulnerable_code:
+                suggestions.append({
+                    "fixed_code": fixed_code,
+                    "explanation": ref_fix.get("explanation", "Reference-based fix applied"),
+                    "confidence": ref_fix.get("confidence", 0.8)
+                })
+        return suggestions
+
 
 class RepairAlgorithm:
-    def __init__(self, model_name: str = "microsoft/codebert-base"):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name).to(self.device)
-        
-    def generate_repair_suggestions(self, 
-                                  vulnerable_code: str, 
+    """
+    참조 수정사항(정규식 치환)과 언어 모델로 취약점 수정 제안을 생성합니다.
+    모델은 처음 모델 기반 수정을 생성할 때 불러오므로, 모듈을 import하거나 참조 수정/검증만 사용할 때는
+    torch / transformers가 필요하지 않습니다. generate_repair_suggestions_batch()는 여러 코드를 한 번에
+    batch_size개씩 묶어 generate합니다.
+    """
+
+    def __init__(self, model_name: str = REPAIR_ENGINE_MODEL, batch_size: int = REPAIR_ENGINE_BATCH_SIZE,
+                 max_new_tokens: int = REPAIR_ENGINE_MAX_NEW_TOKENS):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_new_tokens = max_new_tokens
+        self._torch = None
+        self._device = None
+        self._tokenizer = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            try:
+                import torch
+                from transformers import AutoTokenizer, AutoModelForCausalLM
+            except ImportError as e:
+                raise ImportError("모델 기반 수정을 생성하려면 torch와 transformers가 필요합니다: "
+                                  "pip install torch transformers") from e
+
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # decoder-only 모델은 프롬프트 뒤에 이어서 생성하므로 배치 padding을 왼쪽에 둠
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            model = AutoModelForCausalLM.from_pretrained(self.model_name).to(device)
+            model.eval()
+
+            self._torch = torch
+            self._device = device
+            self._tokenizer = tokenizer
+            self._model = model
+
+    @property
+    def device(self):
+        self._load()
+        return self._device
+
+    @property
+    def tokenizer(self):
+        self._load()
+        return self._tokenizer
+
+    @property
+    def model(self):
+        self._load()
+        return self._model
+
+    def generate_repair_suggestions(self,
+                                  vulnerable_code: str,
                                   vulnerability_type: str,
                                   reference_fixes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """취약점 수정 제안을 생성합니다."""
-        suggestions = []
-        
+        return self.generate_repair_suggestions_batch([(vulnerable_code, vulnerability_type)], reference_fixes)[0]
+
+    def generate_repair_suggestions_batch(self,
+                                          items: List[Tuple[str, str]],
+                                          reference_fixes: List[Dict[str, Any]],
+                                          use_model: bool = True) -> List[List[Dict[str, Any]]]:
+        """(취약 코드, 취약점 유형) 목록의 수정 제안을 입력 순서대로 생성합니다. 모델 기반 수정은 배치로 생성합니다."""
+        registry = ReferenceFixRegistry(reference_fixes)
         # 참조 수정사항 기반 제안 생성
-        for ref_fix in reference_fixes:
-            if ref_fix["vulnerability_type"] == vulnerability_type:
-                suggestion = self._apply_reference_fix(vulnerable_code, ref_fix)
-                if suggestion:
-                    suggestions.append(suggestion)
-        
+        suggestions = [registry.apply(vulnerable_code, vulnerability_type) for vulnerable_code, vulnerability_type in items]
+
         # 모델 기반 제안 생성
-        model_suggestion = self._generate_model_based_fix(vulnerable_code, vulnerability_type)
-        if model_suggestion:
-            suggestions.append(model_suggestion)
-            
+        if use_model:
+            for item_suggestions, model_suggestion in zip(suggestions, self._generate_model_based_fixes(items)):
+                if model_suggestion:
+                    item_suggestions.append(model_suggestion)
         return suggestions
-    
-    def _apply_reference_fix(self, 
-                           vulnerable_code: str, 
+
+    def _apply_reference_fix(self,
+                           vulnerable_code: str,
                            reference_fix: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """참조 수정사항을 현재 코드에 적용합니다."""
-        try:
-            # 패턴 매칭을 통한 수정
-            pattern = reference_fix.get("pattern")
-            replacement = reference_fix.get("replacement")
-            
-            if pattern and replacement:
-                fixed_code = re.sub(pattern, replacement, vulnerable_code)
-                if fixed_code != vulnerable_code:
-                    return {
-                        "fixed_code": fixed_code,
-                        "explanation": reference_fix.get("explanation", "Reference-based fix applied"),
-                        "confidence": reference_fix.get("confidence", 0.8)
-                    }
-        except Exception as e:
-            print(f"Error applying reference fix: {str(e)}")
-            
-        return None
-    
-    def _generate_model_based_fix(self, 
-                                vulnerable_code: str, 
+        suggestions = ReferenceFixRegistry([reference_fix]).apply(vulnerable_code, reference_fix.get("vulnerability_type"))
+        return suggestions[0] if suggestions else None
+
+    def _generate_model_based_fix(self,
+                                vulnerable_code: str,
                                 vulnerability_type: str) -> Optional[Dict[str, Any]]:
         """모델을 사용하여 수정 제안을 생성합니다."""
-        try:
-            prompt = f"""
-            Fix the following vulnerable code that has a {vulnerability_type} vulnerability:
-            
-            {vulnerable_code}
-            
-            Fixed code:
-            """
-            
-            inputs = self.tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_length=512,
-                    num_return_sequences=1,
-                    temperature=0.7,
-                    top_p=0.95
-                )
-                
-            fixed_code = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            fixed_code = fixed_code.replace(prompt, "").strip()
-            
-            if fixed_code != vulnerable_code:
-                return {
-                    "fixed_code": fixed_code,
-                    "explanation": "Model-generated fix",
-                    "confidence": 0.6
-                }
-                
-        except Exception as e:
-            print(f"Error generating model-based fix: {str(e)}")
-            
-        return None
-    
-    def validate_fix(self, 
-                    original_code: str, 
-                    fixed_code: str, 
+        return self._generate_model_based_fixes([(vulnerable_code, vulnerability_type)])[0]
+
+    def _generate_model_based_fixes(self, items: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        모델 기반 수정을 batch_size개씩 묶어 생성합니다. 길이가 비슷한 프롬프트끼리 묶어 padding을 줄이며,
+        배치 하나가 실패하면 그 배치의 결과만 None이 됩니다.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        if not items:
+            return results
+        self._load()
+        torch = self._torch
+        prompts = [MODEL_FIX_PROMPT.format(vulnerability_type=vulnerability_type, vulnerable_code=vulnerable_code)
+                   for vulnerable_code, vulnerability_type in items]
+        order = sorted(range(len(items)), key=lambda idx: len(prompts[idx]))
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            try:
+                inputs = self._tokenizer([prompts[idx] for idx in batch], return_tensors="pt", padding=True,
+                                         truncation=True)
+                inputs = {k: v.to(self._device) for k, v in inputs.items()}
+                with torch.inference_mode():
+                    outputs = self._model.generate(
+                        **inputs,
+                        max_new_tokens=self.max_new_tokens,
+                        num_return_sequences=1,
+                        do_sample=False,
+                        pad_token_id=self._tokenizer.pad_token_id,
+                    )
+                # 왼쪽 padding이므로 모든 행에서 프롬프트 길이 이후가 생성된 토큰
+                generated = self._tokenizer.batch_decode(outputs[:, inputs["input_ids"].shape[1]:],
+                                                         skip_special_tokens=True)
+            except Exception as e:
+                logger.warning("Error generating model-based fixes: %s", e)
+                continue
+
+            for idx, fixed_code in zip(batch, generated):
+                fixed_code = fixed_code.strip()
+                if fixed_code and fixed_code != items[idx][0]:
+                    results[idx] = {
+                        "fixed_code": fixed_code,
+                        "explanation": "Model-generated fix",
+                        "confidence": 0.6
+                    }
+        return results
+
+    def validate_fix(self,
+                    original_code: str,
+                    fixed_code: str,
                     vulnerability_type: str) -> Dict[str, Any]:
         """수정된 코드의 유효성을 검증합니다."""
         validation_result = {
@@ -102,18 +251,18 @@ class RepairAlgorithm:
             "confidence": 0.0,
             "explanation": ""
         }
-        
+
         try:
             # 기본 검증
             if fixed_code == original_code:
                 validation_result["explanation"] = "No changes were made to the code"
                 return validation_result
-                
+
             # 구문 검증
             if not self._validate_syntax(fixed_code):
                 validation_result["explanation"] = "Fixed code has syntax errors"
                 return validation_result
-                
+
             # 취약점 제거 검증
             if self._check_vulnerability_removed(fixed_code, vulnerability_type):
                 validation_result.update({
@@ -121,37 +270,71 @@ class RepairAlgorithm:
                     "confidence": 0.8,
                     "explanation": "Vulnerability appears to be fixed"
                 })
-                
+
         except Exception as e:
             validation_result["explanation"] = f"Validation error: {str(e)}"
-            
+
         return validation_result
-    
+
     def _validate_syntax(self, code: str) -> bool:
-        """코드의 구문을 검증합니다."""
-        try:
-            # 여기에 구문 검증 로직 구현
-            # 예: ast.parse() 사용
-            return True
-        except:
-            return False
-    
+        """코드의 Java 구문을 검증합니다 (조각 코드는 클래스/메소드로 감싸서 파싱, 파서는 프로세스 전체에서 재사용)."""
+        return get_syntax_checker().check(code).valid is not False
+
     def _check_vulnerability_removed(self, code: str, vulnerability_type: str) -> bool:
         """취약점이 제거되었는지 확인합니다."""
-        try:
-            # 취약점 패턴 검사
-            patterns = {
-                "injection": r"(?i)(eval|exec|system|os\.system)",
-                "xss": r"(?i)(<script|javascript:|on\w+\s*=)",
-                "sql_injection": r"(?i)(SELECT|INSERT|UPDATE|DELETE).*WHERE.*=.*'",
-                # 추가 패턴들...
-            }
-            
-            if vulnerability_type in patterns:
-                return not bool(re.search(patterns[vulnerability_type], code))
-                
-            return True
-            
-        except Exception as e:
-            print(f"Error checking vulnerability removal: {str(e)}")
-            return False 
\ No newline at end of file
+        return not vulnerability_matches(code, vulnerability_type)
+
+
+def benchmark(repair: RepairAlgorithm, samples: int, use_model: bool = True) -> Dict[str, float]:
+    """
+    합성 입력으로 초당 수정 수(fixes/sec)를 측정합니다.
+    참조 수정(정규식)과, use_model이면 모델 기반 수정을 한 건씩 / 배치로 생성한 경우를 비교합니다.
+    """
+    reference_fixes = [
+        {"vulnerability_type": "injection", "pattern": r"Runtime\.getRuntime\(\)\.exec\((\w+)\)",
+         "replacement": r"new ProcessBuilder(validate(\1)).start()"},
+        {"vulnerability_type": "sql_injection", "pattern": r'"(SELECT .*?)\'" \+ (\w+) \+ "\'"',
+         "replacement": r'"\1?"'},
+        {"vulnerability_type": "xss", "pattern": r"out\.print\((\w+)\)", "replacement": r"out.print(escapeHtml(\1))"},
+    ]
+    templates = [
+        ("void run(String cmd{i}) {{ Runtime.getRuntime().exec(cmd{i}); }}", "injection"),
+        ('ResultSet q(String id{i}) {{ return st.executeQuery("SELECT * FROM t WHERE id=\'" + id{i} + "\'"); }}',
+         "sql_injection"),
+        ("void show(String name{i}) {{ out.print(name{i}); }}", "xss"),
+    ]
+    items = [(template.format(i=i), vulnerability_type)
+             for i in range(samples) for template, vulnerability_type in [templates[i % len(templates)]]]
+
+    result = {"samples": len(items)}
+    started = time.perf_counter()
+    registry = ReferenceFixRegistry(reference_fixes)
+    fixes = sum(len(registry.apply(code, vulnerability_type)) for code, vulnerability_type in items)
+    result["reference_fixes_per_sec"] = fixes / (time.perf_counter() - started)
+
+    if use_model:
+        repair._load()  # 모델 로딩 시간은 측정에서 제외
+        started = time.perf_counter()
+        sequential = sum(1 for item in items if repair._generate_model_based_fix(*item) is not None)
+        result["model_fixes_per_sec_sequential"] = sequential / (time.perf_counter() - started)
+        started = time.perf_counter()
+        batched = sum(1 for fix in repair._generate_model_based_fixes(items) if fix is not None)
+        result["model_fixes_per_sec_batched"] = batched / (time.perf_counter() - started)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='RepairAlgorithm 처리량(fixes/sec) 측정')
+    parser.add_argument('--samples', type=int, default=32, help='합성 입력 수 (기본값: 32)')
+    parser.add_argument('--batch-size', type=int, default=REPAIR_ENGINE_BATCH_SIZE,
+                        help=f'모델 기반 수정의 배치 크기 (기본값: {REPAIR_ENGINE_BATCH_SIZE})')
+    parser.add_argument('--model', default=REPAIR_ENGINE_MODEL, help=f'모델 이름 (기본값: {REPAIR_ENGINE_MODEL})')
+    parser.add_argument('--max-new-tokens', type=int, default=REPAIR_ENGINE_MAX_NEW_TOKENS,
+                        help=f'수정 하나당 최대 생성 토큰 수 (기본값: {REPAIR_ENGINE_MAX_NEW_TOKENS})')
+    parser.add_argument('--no-model', action='store_true', help='참조 수정(정규식)만 측정 (torch 불필요)')
+    args = parser.parse_args()
+
+    report = benchmark(RepairAlgorithm(args.model, args.batch_size, args.max_new_tokens), args.samples,
+                       use_model=not args.no_model)
+    for key, value in report.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,659 @@
+# replay.py (Ollama / Elasticsearch 요청-응답 기록 및 재생: 실제 서비스 없이 start.py / index_knowledge.py 실행)
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import requests
+
+from log_utils import configure_logging
+from ollama_stub import OllamaResponder, OllamaStubServer, estimate_tokens
+from config import OLLAMA_HOSTS, ELASTICSEARCH_HOST, ELASTICSEARCH_PORT, ELASTICSEARCH_REQUEST_TIMEOUT, OLLAMA_READ_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = "vulrag-replay"
+ARCHIVE_VERSION = 1
+# 생성 요청의 응답을 결정하는 필드 (options/keep_alive/stream은 키에서 제외하여 샘플링 설정이 달라도 재생되게 함)
+GENERATION_KEY_FIELDS = ("model", "prompt", "system", "template", "suffix", "messages", "format", "raw", "images")
+# 재생 시 돌려주는 Ollama 최종 통계 필드
+_USAGE_FIELDS = ("prompt_eval_count", "eval_count")
+_TIMING_FIELDS = ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration")
+_ES_RESPONSE_HEADERS = ("content-type", "x-elastic-product")
+_ES_PRODUCT_HEADERS = {"Content-Type": "application/json", "X-Elastic-Product": "Elasticsearch"}
+
+
+def _digest(value: Any) -> str:
+    data = value if isinstance(value, bytes) else json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def generation_key(path: str, body: Dict[str, Any]) -> str:
+    """/api/generate, /api/chat 요청의 재생 키"""
+    return _digest([path, {field: body[field] for field in GENERATION_KEY_FIELDS if field in body}])
+
+
+def embedding_key(model: str, text: str) -> str:
+    """임베딩은 텍스트 단위로 저장하므로 /api/embeddings와 /api/embed(배치 크기와 무관)가 같은 기록을 사용"""
+    return _digest(["embedding", model, text])
+
+
+def _canonical_body(raw: bytes) -> Any:
+    """JSON 본문은 키 순서와 공백을 무시하도록 정규화하고, NDJSON(_bulk 등)은 줄마다 정규화"""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    try:
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+    except ValueError:
+        return _digest(raw)
+
+
+def es_request_key(method: str, path: str, raw_body: bytes) -> str:
+    """Elasticsearch 요청의 재생 키 (메소드, 경로, 정렬한 query string, 정규화한 본문)"""
+    parts = urlsplit(path)
+    return _digest([method.upper(), parts.path, sorted(parse_qsl(parts.query, keep_blank_values=True)),
+                    _canonical_body(raw_body)])
+
+
+def _encode_vector(vector: List[float]) -> str:
+    # float64로 저장해 재생한 임베딩(과 그것으로 만든 kNN 질의 본문)이 기록 시점과 정확히 같게 함
+    return base64.b64encode(np.asarray(vector, dtype="<f8").tobytes()).decode("ascii")
+
+
+def _decode_vector(data: str) -> List[float]:
+    return np.frombuffer(base64.b64decode(data), dtype="<f8").tolist()
+
+
+class ArchiveWriter:
+    """
+    기록을 gzip JSONL로 추가합니다 (첫 줄은 형식 헤더). 같은 키는 한 번만 기록하며,
+    이미 있는 파일에는 새 gzip 멤버로 이어 쓰므로 여러 번 기록한 결과가 하나의 아카이브가 됩니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = set(ReplayArchive(path).keys()) if os.path.exists(path) else set()
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self.records = 0
+        if not self._keys:
+            self._write({"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "created_at": time.time()})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def add(self, record: Dict[str, Any]) -> bool:
+        with self._lock:
+            key = (record["type"], record["key"])
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            self._write(record)
+            self.records += 1
+            return True
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class ReplayArchive:
+    """기록 아카이브를 읽어 유형별 키 -> 기록으로 색인합니다 (같은 키가 여러 번 있으면 마지막 기록 사용)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.generations: Dict[str, Dict[str, Any]] = {}
+        self.embeddings: Dict[str, Dict[str, Any]] = {}
+        self.es: Dict[str, Dict[str, Any]] = {}
+        self.models: Optional[List[str]] = None
+        for record in self._read(path):
+            if "format" in record:
+                if record["format"] != ARCHIVE_FORMAT or record.get("version", 0) > ARCHIVE_VERSION:
+                    raise ValueError(f"지원하지 않는 기록 형식입니다: {path} ({record.get('format')} v{record.get('version')})")
+            elif record["type"] == "generation":
+                self.generations[record["key"]] = record
+            elif record["type"] == "embedding":
+                self.embeddings[record["key"]] = record
+            elif record["type"] == "es":
+                self.es[record["key"]] = record
+            elif record["type"] == "tags":
+                self.models = record["models"]
+
+    @staticmethod
+    def _read(path: str):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            # 기록 중 강제 종료되어 마지막 gzip 멤버가 잘린 경우 읽은 데까지 사용
+            logger.warning("기록 아카이브의 끝이 잘려 있습니다: %s (읽은 기록까지만 사용)", path)
+
+    def keys(self):
+        for kind, records in (("generation", self.generations), ("embedding", self.embeddings), ("es", self.es)):
+            for key in records:
+                yield kind, key
+        if self.models is not None:
+            yield "tags", "tags"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "generations": len(self.generations),
+            "embeddings": len(self.embeddings),
+            "es_requests": len(self.es),
+            "models": self.models,
+            "size_bytes": os.path.getsize(self.path),
+        }
+
+
+# --- 기록 (실제 서비스 앞에 두는 프록시) ---
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_ProxyServer"
+    # 원래 서비스의 응답을 기다리는 시간(초). 클라이언트 쪽 타임아웃과 같게 둔다
+    upstream_timeout = OLLAMA_READ_TIMEOUT
+
+    def log_message(self, format, *args):
+        logger.debug("replay proxy: " + format, *args)
+
+    def _read_raw(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes, headers: Dict[str, str]) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _forward(self, raw: bytes, stream: bool = False) -> requests.Response:
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() in ("content-type", "accept", "authorization")}
+        return self.server.session.request(self.command, self.server.upstream + self.path, data=raw or None,
+                                           headers=headers, stream=stream, timeout=self.upstream_timeout)
+
+
+class _OllamaRecordHandler(_ProxyHandler):
+
+    def do_GET(self):
+        response = self._forward(b"")
+        if self.path == "/api/tags" and response.ok:
+            models = [model.get("name") or model.get("model") for model in response.json().get("models", [])]
+            self.server.writer.add({"type": "tags", "key": "tags", "models": models})
+        self._send(response.status_code, response.content, {"Content-Type": response.headers.get("content-type", "application/json")})
+
+    def do_POST(self):
+        raw = self._read_raw()
+        body = json.loads(raw or b"{}")
+        if self.path in ("/api/generate", "/api/chat") and body.get("stream", True) is not False:
+            self._relay_stream(raw, body)
+            return
+        started = time.perf_counter()
+        response = self._forward(raw)
+        elapsed = time.perf_counter() - started
+        if response.ok:
+            self._record(body, response.json(), elapsed)
+        self._send(response.status_code, response.content, {"Content-Type": response.headers.get("content-type", "application/json")})
+
+    def _record(self, body: Dict[str, Any], payload: Dict[str, Any], elapsed: float) -> None:
+        writer = self.server.writer
+        model = body.get("model", "")
+        if self.path == "/api/embeddings":
+            writer.add({"type": "embedding", "key": embedding_key(model, body.get("prompt", "")),
+                        "vector": _encode_vector(payload["embedding"]), "elapsed": round(elapsed, 4)})
+        elif self.path == "/api/embed":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else list(texts)
+            for text, vector in zip(texts, payload.get("embeddings", [])):
+                writer.add({"type": "embedding", "key": embedding_key(model, text), "vector": _encode_vector(vector),
+                            "elapsed": round(elapsed / max(1, len(texts)), 4)})
+        elif self.path in ("/api/generate", "/api/chat"):
+            text = payload["message"].get("content", "") if self.path == "/api/chat" else payload.get("response", "")
+            self._record_generation(body, text, payload)
+
+    def _record_generation(self, body: Dict[str, Any], text: str, final: Dict[str, Any]) -> None:
+        self.server.writer.add({
+            "type": "generation", "key": generation_key(self.path, body), "path": self.path,
+            "model": body.get("model", ""), "response": text,
+            "stats": {field: final[field] for field in _USAGE_FIELDS + _TIMING_FIELDS if field in final},
+        })
+
+    def _relay_stream(self, raw: bytes, body: Dict[str, Any]) -> None:
+        """
+        스트리밍 응답을 줄 단위로 그대로 전달하면서 생성 결과를 모읍니다.
+        클라이언트가 JSON을 다 받고 먼저 연결을 끊어도(LLM_STREAM_EARLY_STOP) 끝까지 읽어 전체 응답과 통계를 기록합니다.
+        """
+        response = self._forward(raw, stream=True)
+        if not response.ok:
+            self._send(response.status_code, response.content, {"Content-Type": response.headers.get("content-type", "application/json")})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", response.headers.get("content-type", "application/x-ndjson"))
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        client_connected = True
+        pieces, final = [], None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            pieces.append(chunk["message"].get("content", "") if "message" in chunk else chunk.get("response", ""))
+            if chunk.get("done"):
+                final = chunk
+            if client_connected:
+                data = line + b"\n"
+                try:
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    client_connected = False
+                    self.close_connection = True
+        if client_connected:
+            try:
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+        if final is not None:
+            self._record_generation(body, "".join(pieces), final)
+
+
+class _ElasticRecordHandler(_ProxyHandler):
+    upstream_timeout = ELASTICSEARCH_REQUEST_TIMEOUT
+
+    def _handle(self):
+        raw = self._read_raw()
+        started = time.perf_counter()
+        response = self._forward(raw)
+        elapsed = time.perf_counter() - started
+        headers = {name: response.headers[name] for name in _ES_RESPONSE_HEADERS if name in response.headers}
+        if response.status_code < 500:
+            self.server.writer.add({
+                "type": "es", "key": es_request_key(self.command, self.path, raw), "method": self.command,
+                "path": urlsplit(self.path).path, "status": response.status_code, "headers": headers,
+                "body": response.content.decode("utf-8"), "elapsed": round(elapsed, 4),
+            })
+        self._send(response.status_code, response.content, headers)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+
+class _ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, upstream: str, writer: ArchiveWriter):
+        super().__init__(address, handler)
+        self.upstream = upstream.rstrip("/")
+        self.writer = writer
+        self.session = requests.Session()
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self) -> "_ProxyServer":
+        threading.Thread(target=self.serve_forever, name="replay-proxy", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# --- 재생 ---
+
+class ReplayResponder(OllamaResponder):
+    """
+    기록한 생성 결과/임베딩을 돌려주는 OllamaStubServer 응답기.
+    - latency="recorded"이면 기록된 prompt_eval/eval 시간을 speed배 빠르게 재현하고, "fixed"이면 서버의 ttft/tokens_per_sec 사용
+    - 기록에 없는 요청은 fallback 응답기(예: benchmark.DeterministicOllama)가 있으면 위임하고, 없으면 오류(HTTP 500)
+    """
+
+    def __init__(self, archive: ReplayArchive, latency: str = "recorded", speed: float = 1.0,
+                 fallback: OllamaResponder = None):
+        if latency not in ("recorded", "fixed"):
+            raise ValueError(f"지원하지 않는 latency 모드입니다: {latency}")
+        self.archive = archive
+        self.latency = latency
+        self.speed = speed
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def models(self) -> Optional[List[str]]:
+        if self.archive.models is not None:
+            return self.archive.models
+        return self.fallback.models() if self.fallback is not None else None
+
+    def _generation(self, path: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.archive.generations.get(generation_key(path, body))
+
+    def generate(self, body: Dict[str, Any]) -> str:
+        return self._reply("/api/generate", body)
+
+    def chat(self, body: Dict[str, Any]) -> str:
+        return self._reply("/api/chat", body)
+
+    def _reply(self, path: str, body: Dict[str, Any]) -> str:
+        record = self._generation(path, body)
+        self._count(record is not None)
+        if record is not None:
+            return record["response"]
+        if self.fallback is not None:
+            return self.fallback.chat(body) if path == "/api/chat" else self.fallback.generate(body)
+        raise LookupError(f"기록되지 않은 {path} 요청입니다 (model={body.get('model')})")
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        vectors, missing = [], []
+        for index, text in enumerate(texts):
+            record = self.archive.embeddings.get(embedding_key(model, text))
+            self._count(record is not None)
+            vectors.append(_decode_vector(record["vector"]) if record is not None else None)
+            if record is None:
+                missing.append(index)
+        if missing:
+            if self.fallback is None:
+                raise LookupError(f"기록되지 않은 임베딩 요청입니다 ({len(missing)}/{len(texts)}개, model={model})")
+            for index, vector in zip(missing, self.fallback.embed([texts[index] for index in missing], model)):
+                vectors[index] = vector
+        return vectors
+
+    def timing(self, path: str, body: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        if self.latency != "recorded":
+            return None
+        speed = self.speed if self.speed > 0 else 1.0
+        if path in ("/api/embeddings", "/api/embed"):
+            texts = body.get("input", []) if path == "/api/embed" else [body.get("prompt", "")]
+            texts = [texts] if isinstance(texts, str) else texts
+            records = [self.archive.embeddings.get(embedding_key(body.get("model", ""), text)) for text in texts]
+            return {"ttft": sum(record.get("elapsed", 0) for record in records if record) / speed}
+        record = self._generation(path, body)
+        if record is None:
+            return None
+        stats = record.get("stats", {})
+        ttft = (stats.get("load_duration", 0) + stats.get("prompt_eval_duration", 0)) / 1e9 / speed
+        eval_seconds = stats.get("eval_duration", 0) / 1e9 / speed
+        # 대역 서버는 글자 수로 추정한 토큰 수만큼 쉬므로, 추정 토큰 수 기준 속도로 기록된 생성 시간을 재현
+        tokens = estimate_tokens(record["response"])
+        return {"ttft": ttft, "tokens_per_sec": tokens / eval_seconds if eval_seconds > 0 and tokens else 0.0}
+
+    def usage(self, path: str, body: Dict[str, Any], text: str) -> Optional[Dict[str, int]]:
+        record = self._generation(path, body)
+        if record is None:
+            return None
+        return {field: record["stats"][field] for field in _USAGE_FIELDS if field in record.get("stats", {})}
+
+
+def _synthesize_es_response(method: str, path: str, raw: bytes) -> Tuple[int, Dict[str, Any]]:
+    """기록에 없는 ES 요청의 응답: 쓰기(_bulk, 설정 변경)는 성공, 검색은 빈 결과로 응답해 대량 인덱싱/검색 부하를 재현"""
+    route = urlsplit(path).path.rstrip("/")
+    if route == "":
+        return 200, {"name": "replay", "cluster_name": "replay", "tagline": "You Know, for Search",
+                     "version": {"number": "9.0.0", "build_flavor": "default"}}
+    if route.endswith("/_bulk"):
+        lines = _canonical_body(raw) or []
+        lines = [lines] if isinstance(lines, dict) else lines
+        items, position = [], 0
+        while position < len(lines):
+            action = lines[position]
+            (op, meta), = action.items() if isinstance(action, dict) and len(action) == 1 else (("", {}),)
+            # delete 외의 작업은 다음 줄이 문서 본문
+            position += 1 if op == "delete" else 2
+            if op not in ("index", "create", "update", "delete"):
+                continue
+            status = 200 if op in ("update", "delete") else 201
+            items.append({op: {"_index": meta.get("_index", route.split("/")[1] if route.count("/") > 1 else ""),
+                               "_id": meta.get("_id"), "result": "deleted" if op == "delete" else "created",
+                               "status": status}})
+        return 200, {"took": 0, "errors": False, "items": items}
+    if method == "DELETE" and route.endswith("/_search/scroll"):
+        return 200, {"succeeded": True, "num_freed": 0}
+    if route.endswith("/_search") or route.endswith("/_search/scroll"):
+        return 200, {"took": 0, "timed_out": False, "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+                     "hits": {"total": {"value": 0, "relation": "eq"}, "max_score": None, "hits": []}}
+    if route.endswith("/_settings") and method == "GET":
+        index = route.split("/")[1]
+        return 200, {index: {"settings": {"index": {"refresh_interval": "1s"}}}}
+    return 200, {"acknowledged": True}
+
+
+class _ElasticReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ElasticReplayServer._HTTPServer"
+
+    def log_message(self, format, *args):
+        logger.debug("es replay: " + format, *args)
+
+    def _handle(self):
+        replay = self.server.replay
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        record = replay.archive.es.get(es_request_key(self.command, self.path, raw))
+        replay.count(record is not None)
+        if record is not None:
+            headers = dict(_ES_PRODUCT_HEADERS)
+            for name, value in record["headers"].items():
+                headers[name.title()] = value
+            status, body = record["status"], record["body"].encode("utf-8")
+            replay.sleep(record.get("elapsed", 0))
+        elif replay.strict:
+            status, headers = 404, _ES_PRODUCT_HEADERS
+            body = json.dumps({"error": f"기록되지 않은 요청입니다: {self.command} {self.path}", "status": 404}).encode("utf-8")
+        else:
+            status, payload = _synthesize_es_response(self.command, self.path, raw)
+            headers, body = _ES_PRODUCT_HEADERS, json.dumps(payload).encode("utf-8")
+            replay.sleep(0)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+
+class ElasticReplayServer:
+    """
+    기록한 Elasticsearch 응답을 같은 요청(메소드/경로/query/본문)에 돌려주는 로컬 HTTP 서버.
+    - latency="recorded"이면 기록 당시 응답 시간을 speed배 빠르게 재현하고, "fixed"이면 모든 요청에 fixed_latency(초)를 적용
+    - strict=False이면 기록에 없는 요청에 _bulk 성공 / 빈 검색 결과 / acknowledged로 응답 (새 데이터로 인덱싱 부하 측정 가능)
+    """
+
+    class _HTTPServer(ThreadingHTTPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    def __init__(self, archive: ReplayArchive, host: str = "127.0.0.1", port: int = 0, latency: str = "recorded",
+                 speed: float = 1.0, fixed_latency: float = 0.0, strict: bool = False):
+        self.archive = archive
+        self.latency = latency
+        self.speed = speed if speed > 0 else 1.0
+        self.fixed_latency = fixed_latency
+        self.strict = strict
+        self._httpd = self._HTTPServer((host, port), _ElasticReplayHandler)
+        self._httpd.replay = self
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def sleep(self, recorded: float) -> None:
+        seconds = recorded / self.speed if self.latency == "recorded" else self.fixed_latency
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def start(self) -> "ElasticReplayServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="es-replay", daemon=True)
+        self._thread.start()
+        logger.info("Elasticsearch replay server listening on %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "ElasticReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _serve(servers, describe, writer: ArchiveWriter = None) -> None:
+    # 백그라운드 실행 시 SIGINT가 무시될 수 있으므로 SIGTERM도 정상 종료로 처리
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            time.sleep(1)
+            if writer is not None:
+                writer.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+        describe()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Ollama / Elasticsearch 요청-응답을 기록하고, 기록으로 두 서비스를 대신하는 로컬 서버를 실행합니다',
+        formatter_class=argparse.RawTextHelpFormatter,
+        epilog="""
+사용 예시:
+  1. 실제 서비스 앞에 기록 프록시를 띄우고 평소처럼 실행 (Ctrl+C로 종료하면 아카이브에 저장)
+     python replay.py record --archive session.replay.gz
+     OLLAMA_HOSTS=http://127.0.0.1:11435 ELASTICSEARCH_PORT=9201 python start.py --json-file data.json --id-range 1-79
+  2. 네트워크 없이 기록으로 재생 (기록된 지연 시간의 10배 속도)
+     python replay.py serve --archive session.replay.gz --speed 10
+     OLLAMA_HOSTS=http://127.0.0.1:11435 ELASTICSEARCH_PORT=9201 python start.py --json-file data.json --id-range 1-79 --profile
+  3. 기록에 없는 요청은 결정적인 대역 응답으로 채워 더 큰 규모로 측정
+     python replay.py serve --archive session.replay.gz --fallback deterministic --latency fixed --ttft 0.3 --tokens-per-sec 30
+""")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub):
+        sub.add_argument('--archive', required=True, help='기록 아카이브 경로 (gzip JSONL)')
+        sub.add_argument('--host', default="127.0.0.1", help='서버 주소 (기본값: 127.0.0.1)')
+        sub.add_argument('--ollama-port', type=int, default=11435, help='Ollama 쪽 포트 (기본값: 11435)')
+        sub.add_argument('--es-port', type=int, default=9201, help='Elasticsearch 쪽 포트 (기본값: 9201)')
+        sub.add_argument('--log-level', default="INFO", help='콘솔 로그 레벨 (기본값: INFO)')
+
+    record_parser = subparsers.add_parser("record", help="실제 Ollama / Elasticsearch 앞에서 요청과 응답을 기록하는 프록시 실행")
+    add_common(record_parser)
+    record_parser.add_argument('--ollama-upstream', default=OLLAMA_HOSTS[0], help=f'실제 Ollama 주소 (기본값: {OLLAMA_HOSTS[0]})')
+    record_parser.add_argument('--es-upstream', default=f"http://{ELASTICSEARCH_HOST}:{ELASTICSEARCH_PORT}",
+                               help='실제 Elasticsearch 주소 (기본값: config의 ELASTICSEARCH_HOST/PORT)')
+
+    serve_parser = subparsers.add_parser("serve", help="기록으로 Ollama / Elasticsearch를 대신하는 서버 실행")
+    add_common(serve_parser)
+    serve_parser.add_argument('--latency', choices=["recorded", "fixed"], default="recorded",
+                              help='recorded: 기록된 응답 시간 재현, fixed: --ttft / --tokens-per-sec / --es-latency 사용')
+    serve_parser.add_argument('--speed', type=float, default=1.0, help='기록된 지연 시간을 몇 배 빠르게 재현할지 (기본값: 1)')
+    serve_parser.add_argument('--ttft', type=float, default=0.0, help='fixed 모드의 첫 토큰 지연(초)')
+    serve_parser.add_argument('--tokens-per-sec', type=float, default=0.0, help='fixed 모드의 생성 속도 (0이면 지연 없음)')
+    serve_parser.add_argument('--es-latency', type=float, default=0.0, help='fixed 모드의 ES 요청당 지연(초)')
+    serve_parser.add_argument('--fallback', choices=["none", "deterministic"], default="none",
+                              help='기록에 없는 Ollama 요청 처리 (none: HTTP 500, deterministic: benchmark.py의 대역 응답)')
+    serve_parser.add_argument('--strict', action='store_true', help='기록에 없는 ES 요청에 404로 응답')
+
+    info_parser = subparsers.add_parser("info", help="아카이브 요약 출력")
+    info_parser.add_argument('--archive', required=True)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(ReplayArchive(args.archive).summary(), indent=2, ensure_ascii=False))
+        return
+
+    configure_logging(args.log_level)
+    if args.command == "record":
+        writer = ArchiveWriter(args.archive)
+        servers = []
+        for handler, port, upstream in ((_OllamaRecordHandler, args.ollama_port, args.ollama_upstream),
+                                        (_ElasticRecordHandler, args.es_port, args.es_upstream)):
+            servers.append(_ProxyServer((args.host, port), handler, upstream, writer).start())
+        logger.info("기록 중: Ollama %s -> %s, Elasticsearch %s -> %s (Ctrl+C로 종료)",
+                    f"http://{args.host}:{args.ollama_port}", args.ollama_upstream,
+                    f"http://{args.host}:{args.es_port}", args.es_upstream)
+        logger.info("환경 변수: OLLAMA_HOSTS=http://%s:%d ELASTICSEARCH_HOST=%s ELASTICSEARCH_PORT=%d",
+                    args.host, args.ollama_port, args.host, args.es_port)
+
+        def describe():
+            writer.close()
+            logger.info("기록 %d건을 %s에 저장했습니다.", writer.records, args.archive)
+        _serve(servers, describe, writer)
+        return
+
+    archive = ReplayArchive(args.archive)
+    fallback = None
+    if args.fallback == "deterministic":
+        from benchmark import DeterministicOllama
+        fallback = DeterministicOllama()
+    responder = ReplayResponder(archive, latency=args.latency, speed=args.speed, fallback=fallback)
+    ollama = OllamaStubServer(responder, host=args.host, port=args.ollama_port, ttft=args.ttft,
+                              tokens_per_sec=args.tokens_per_sec).start()
+    elastic = ElasticReplayServer(archive, host=args.host, port=args.es_port, latency=args.latency, speed=args.speed,
+                                  fixed_latency=args.es_latency, strict=args.strict).start()
+    logger.info("재생 중: %s (%s) — OLLAMA_HOSTS=%s ELASTICSEARCH_HOST=%s ELASTICSEARCH_PORT=%d (Ctrl+C로 종료)",
+                args.archive, json.dumps(archive.summary(), ensure_ascii=False), ollama.url, args.host, args.es_port)
+
+    def describe():
+        logger.info("재생 결과: Ollama 기록 사용 %d건 / 없음 %d건, Elasticsearch 기록 사용 %d건 / 없음 %d건",
+                    responder.hits, responder.misses, elastic.hits, elastic.misses)
+    _serve([ollama, elastic], describe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# run_manifest.py (대량 처리 실행 기록)
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+# 재실행(--resume) 시 다시 처리하지 않아도 되는 상태
+COMPLETED_STATUSES = ("done", "skipped")
+
+
+class RunManifest:
+    """
+    result/<mode>/manifest.jsonl 에 ID별 처리 결과(상태, 단계별 소요 시간, 결과 파일 해시)를 한 줄씩 추가 기록합니다.
+    같은 ID가 여러 번 기록된 경우 마지막 기록이 현재 상태입니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 기록 도중 중단되어 잘린 마지막 줄은 무시
+                        continue
+                    self._entries[str(entry.get("id"))] = entry
+
+    def get(self, record_id) -> Optional[Dict[str, Any]]:
+        return self._entries.get(str(record_id))
+
+    def record(self, record_id, status: str, stage_timings: Dict[str, float] = None,
+               output_file: str = None, output_sha256: str = None, error: str = None,
+               elapsed: float = None) -> Dict[str, Any]:
+        """ID의 처리 결과를 매니페스트에 추가하고 즉시 디스크에 반영합니다."""
+        entry = {
+            "id": str(record_id),
+            "status": status,
+            "timestamp": time.time(),
+            "elapsed": elapsed,
+            "stage_timings": stage_timings or {},
+            "output_file": output_file,
+            "output_sha256": output_sha256,
+            "error": error,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[entry["id"]] = entry
+        return entry
+
+    def select_ids(self, id_list: Iterable, resume: bool = False, retry_failed: bool = False) -> List:
+        """
+        resume: 이미 완료된 ID를 제외합니다.
+        retry_failed: 마지막 상태가 error인 ID만 남깁니다.
+        """
+        selected = []
+        for record_id in id_list:
+            entry = self.get(record_id)
+            status = entry.get("status") if entry else None
+            if retry_failed and status != "error":
+                continue
+            if resume and status in COMPLETED_STATUSES:
+                # 결과 파일이 지워졌다면 완료로 보지 않고 다시 처리
+                output_file = entry.get("output_file")
+                if not output_file or os.path.exists(output_file):
+                    continue
+            selected.append(record_id)
+        return selected
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self._entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
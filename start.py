@@ -2,21 +2,33 @@
 
 import json
 import argparse
+import asyncio
+import logging
 import sys
 import os # <--- os 모듈 추가
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from process import VulnerabilityProcessor
+from batch_utils import atomic_write_json, OrderedTaskOutput
+from dataset_loader import get_dataset
+from run_manifest import RunManifest
+from ollama_utils import get_default_transport
+from llm_cache import LLMCache
+from tracing import Tracer, TraceExporter, TraceProfile, TRACE_FORMATS
+from log_utils import configure_logging, sample_logging
+from accuracy_report import compare_result_dirs, format_report
+from config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, RETRIEVAL_MODE, RAG_BACKEND, OLLAMA_MAX_INFLIGHT, OLLAMA_REQUEST_DEADLINE, \
+    TRACE_EXPORT_PATH, TRACE_EXPORT_FORMAT, LOG_LEVEL, LOG_DIR, SAMPLE_LOG_LEVEL, PROMPT_ARCHIVE_PATH, \
+    CODE_CHUNKING_ENABLED, CODE_CHUNKING_TOP_UNITS, SEMANTICS_BACKEND
 
-def load_code_from_json(json_path: str, id: str) -> str:
-    """JSON 파일에서 특정 id의 코드를 로드합니다. (기존과 동일)"""
+logger = logging.getLogger(__name__)
+
+def load_code_from_json(json_path: str, id: str, persist_index: bool = False) -> str:
+    """JSON/JSONL 파일에서 특정 id의 코드를 로드합니다. 파일은 프로세스 당 한 번만 파싱됩니다."""
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if not isinstance(data, list):
-            raise ValueError("JSON 파일은 배열(list) 형태여야 합니다.")
-            
-        target_item = next((item for item in data if str(item.get('id')) == id), None)
+        dataset = get_dataset(json_path, persist_index=persist_index)
+        target_item = dataset.get(id)
             
         if target_item is None:
             # 대량 처리 시 데이터가 없는 것은 에러가 아니므로 None을 반환하도록 수정
@@ -40,6 +52,148 @@ def load_code_from_json(json_path: str, id: str) -> str:
         raise type(e)(f"ID '{id}'의 코드를 로드하는 중 에러 발생: {e}")
 
 
+def _load_batch_code(json_path: str, current_id: int, persist_index: bool, manifest: RunManifest, started: float):
+    """대량 처리에서 ID의 코드를 로드합니다. 데이터가 없으면 skipped로 기록하고 None을 반환합니다."""
+    logger.info("%s ID: %s 처리 시작 %s", "="*20, current_id, "="*20)
+    code_snippet = load_code_from_json(json_path, str(current_id), persist_index)
+
+    if code_snippet is None:
+        logger.info("--- ID: %s 데이터를 찾을 수 없어 건너뜁니다. ---", current_id)
+        if manifest is not None:
+            manifest.record(current_id, "skipped", elapsed=time.perf_counter() - started)
+    return code_snippet
+
+
+def _finish_trace(tracer: Tracer, trace_exporter: TraceExporter = None, profile: TraceProfile = None) -> None:
+    if trace_exporter is not None:
+        trace_exporter.export(tracer)
+    if profile is not None:
+        profile.add(tracer)
+
+
+def _save_batch_result(final_result, current_id: int, result_base_dir: str, manifest: RunManifest,
+                       stage_timings, started: float, tracer: Tracer = None) -> str:
+    if tracer is not None:
+        # 단계별 span(소요 시간, 토큰 수, ES took, 캐시 hit)을 결과 파일에 함께 저장
+        final_result = dict(final_result, trace=tracer.to_dict())
+    output_filepath = os.path.join(result_base_dir, f"{current_id}.json")
+    output_sha256 = atomic_write_json(output_filepath, final_result)
+
+    if manifest is not None:
+        manifest.record(current_id, "done", stage_timings=stage_timings, output_file=output_filepath,
+                        output_sha256=output_sha256, elapsed=time.perf_counter() - started)
+    logger.info("--- ID: %s 처리 완료 및 결과 저장 성공: %s ---", current_id, output_filepath)
+    return "done"
+
+
+def _record_batch_error(e: Exception, current_id: int, manifest: RunManifest, stage_timings, started: float) -> str:
+    # asyncio.TimeoutError처럼 메시지가 없는 예외는 예외 이름을 기록
+    error = str(e) or type(e).__name__
+    logger.error("!!!!!! ID: %s 처리 중 에러 발생. 건너뜁니다. !!!!!!", current_id)
+    logger.error("에러 상세: %s", error)
+    logger.debug("에러 traceback", exc_info=e)
+    if manifest is not None:
+        manifest.record(current_id, "error", stage_timings=stage_timings, error=error,
+                        elapsed=time.perf_counter() - started)
+    return "error"
+
+
+def process_single_id(processor: VulnerabilityProcessor, json_path: str, current_id: int, result_base_dir: str,
+                      persist_index: bool = False, manifest: RunManifest = None,
+                      trace_exporter: TraceExporter = None, profile: TraceProfile = None) -> str:
+    """대량 처리 모드에서 하나의 ID를 분석하고 결과를 저장합니다. 처리 상태 문자열을 반환합니다."""
+    started = time.perf_counter()
+    stage_timings = {}
+    tracer = Tracer(attributes={"sample_id": current_id})
+    with sample_logging(current_id):
+        try:
+            code_snippet = _load_batch_code(json_path, current_id, persist_index, manifest, started)
+            if code_snippet is None:
+                return "skipped"
+
+            final_result = processor.run_analysis_pipeline(code_snippet, stage_timings=stage_timings, tracer=tracer)
+            return _save_batch_result(final_result, current_id, result_base_dir, manifest, stage_timings, started, tracer)
+
+        except Exception as e:
+            return _record_batch_error(e, current_id, manifest, stage_timings, started)
+        finally:
+            if tracer.spans:
+                _finish_trace(tracer, trace_exporter, profile)
+
+
+async def process_single_id_async(processor: VulnerabilityProcessor, json_path: str, current_id: int, result_base_dir: str,
+                                  persist_index: bool = False, manifest: RunManifest = None,
+                                  trace_exporter: TraceExporter = None, profile: TraceProfile = None) -> str:
+    """process_single_id의 비동기 버전. 요청 deadline 초과(asyncio.TimeoutError)는 해당 ID의 에러로 기록됩니다."""
+    started = time.perf_counter()
+    stage_timings = {}
+    tracer = Tracer(attributes={"sample_id": current_id})
+    with sample_logging(current_id):
+        try:
+            code_snippet = _load_batch_code(json_path, current_id, persist_index, manifest, started)
+            if code_snippet is None:
+                return "skipped"
+
+            final_result = await processor.arun_analysis_pipeline(code_snippet, stage_timings=stage_timings, tracer=tracer)
+            return await asyncio.to_thread(_save_batch_result, final_result, current_id, result_base_dir, manifest,
+                                           stage_timings, started, tracer)
+
+        except Exception as e:
+            return _record_batch_error(e, current_id, manifest, stage_timings, started)
+        finally:
+            if tracer.spans:
+                _finish_trace(tracer, trace_exporter, profile)
+
+
+def _log_generation_summary(stats) -> None:
+    """Ollama /api/generate 스트리밍 통계(TTFT, tokens/sec, 조기 종료 횟수)를 기록합니다."""
+    generate_stats = stats.get("/api/generate")
+    if not generate_stats or not generate_stats.get("generations"):
+        return
+    logger.info("LLM 생성: %d회, 평균 TTFT %.2f초, %.1f tokens/sec, JSON 완성 후 조기 종료 %d회",
+                generate_stats['generations'], generate_stats['avg_ttft'], generate_stats['tokens_per_sec'],
+                generate_stats['early_stops'])
+
+
+def _log_host_summary(hosts) -> None:
+    """Ollama 호스트가 여러 개면 호스트별 요청 수 / 실패 수 / 상태를 기록합니다."""
+    if len(hosts) < 2:
+        return
+    for host in hosts:
+        logger.info("Ollama 호스트 %s: 요청 %d회, 실패 %d회, %s%s", host['url'], host['requests'], host['failures'],
+                    "정상" if host['healthy'] else "장애", f" (모델: {', '.join(host['models'])})" if host['models'] else "")
+
+
+async def run_batch_async(processor: VulnerabilityProcessor, json_path: str, id_list, result_base_dir: str,
+                          concurrency: int, persist_index: bool = False, manifest: RunManifest = None,
+                          max_inflight: int = OLLAMA_MAX_INFLIGHT, deadline: float = OLLAMA_REQUEST_DEADLINE,
+                          trace_exporter: TraceExporter = None, profile: TraceProfile = None, hosts=None):
+    """
+    하나의 이벤트 루프에서 최대 concurrency개의 ID를 동시에 처리합니다.
+    Ollama 동시 요청 수는 max_inflight로, 요청 당 최대 소요 시간(초)은 deadline으로 제한합니다.
+    hosts를 넘기면 OLLAMA_HOSTS 대신 해당 호스트로 요청합니다.
+    """
+    from async_ollama_utils import AsyncOllamaClient
+
+    processor.rag_system.async_ollama_client = AsyncOllamaClient(
+        hosts=hosts, model=processor.rag_system.ollama_client.model, max_inflight=max_inflight, deadline=deadline
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with OrderedTaskOutput() as task_output:
+        async def run_task(current_id):
+            async with semaphore:
+                with task_output.capture():
+                    return await process_single_id_async(processor, json_path, current_id, result_base_dir,
+                                                         persist_index, manifest, trace_exporter, profile)
+        try:
+            return await asyncio.gather(*(run_task(current_id) for current_id in id_list))
+        finally:
+            _log_generation_summary(processor.rag_system.async_ollama_client.get_stats())
+            _log_host_summary(processor.rag_system.async_ollama_client.get_host_stats())
+            await processor.aclose()
+
+
 def main():
     """메인 실행 함수"""
     parser = argparse.ArgumentParser(
@@ -60,21 +214,106 @@ def main():
 
   4. ID 범위를 지정하여 자동 분석 및 저장 (RAG 비활성화):
      python start.py --json-file path/to/data.json --id-range 1-79 --disable-rag
+
+  5. 4개의 파이프라인을 동시에 실행 (Ollama 동시 요청은 최대 4개로 제한):
+     python start.py --json-file path/to/data.json --id-range 1-79 --workers 4 --max-inflight 4
+
+  6. 중단된 대량 분석 이어서 실행 / 실패한 ID만 재실행:
+     python start.py --json-file path/to/data.json --id-range 1-500 --resume
+     python start.py --json-file path/to/data.json --id-range 1-500 --retry-failed
+
+  7. asyncio로 200개의 ID를 동시에 처리 (요청 당 최대 600초):
+     python start.py --json-file path/to/data.json --id-range 1-500 --async --workers 200 --max-inflight 8 --deadline 600
+
+  8. 단계별 소요 시간/토큰 수 요약 출력 및 OpenTelemetry 형식 trace 저장:
+     python start.py --json-file path/to/data.json --id-range 1-79 --profile --trace-file traces.jsonl --trace-format otel
+
+  9. 취약 여부만 빠르게 판정 (LLM 1회 호출) 후 전체 파이프라인 결과(./result/RAG)와 비교:
+     python start.py --json-file path/to/data.json --id-range 1-79 --fast
 '''
     )
     
     # --- 인자(Argument) 정의 ---
     parser.add_argument('code', nargs='?', help='분석할 코드 (작은따옴표로 감싸서 입력)')
     parser.add_argument('--disable-rag', action='store_true', help='RAG 기능을 비활성화하고 LLM만 사용하여 분석')
+    parser.add_argument('--retrieval', choices=['hybrid', 'bm25'], default=RETRIEVAL_MODE,
+                        help=f'RAG 검색 방식: hybrid(BM25 + kNN, RRF 결합) 또는 bm25 (기본값: {RETRIEVAL_MODE})')
+    parser.add_argument('--backend', choices=['elasticsearch', 'embedded'], default=RAG_BACKEND,
+                        help=f'RAG 검색 백엔드: elasticsearch 또는 내장 인덱스(embedded) (기본값: {RAG_BACKEND})')
     parser.add_argument('--json-file', help='분석할 코드가 포함된 JSON 파일 경로')
     parser.add_argument('--id', help='JSON 파일에서 로드할 단일 코드의 id')
     # 대량 처리를 위한 --id-range 인자 추가
     parser.add_argument('--id-range', help='자동으로 처리할 ID 범위 (예: "1-79")')
+    parser.add_argument('--persist-index', action='store_true', help='데이터셋 옆에 바이트 오프셋 인덱스(<파일>.idx.json)를 저장/재사용하여 재파싱을 생략')
+    parser.add_argument('--no-cache', action='store_true', help='LLM 응답 캐시를 사용하지 않음')
+    parser.add_argument('--cache-read-only', action='store_true', help='LLM 응답 캐시를 조회만 하고 새 응답은 기록하지 않음')
+    parser.add_argument('--cache-path', default=LLM_CACHE_PATH, help=f'LLM 응답 캐시 파일 경로 (기본값: {LLM_CACHE_PATH})')
+    parser.add_argument('--resume', action='store_true', help='manifest.jsonl에 완료로 기록된 ID는 건너뜀')
+    parser.add_argument('--retry-failed', action='store_true', help='manifest.jsonl에 에러로 기록된 ID만 다시 처리')
+    parser.add_argument('--workers', type=int, default=1, help='--id-range 처리 시 동시에 실행할 파이프라인 수 (기본값: 1)')
+    parser.add_argument('--max-inflight', type=int, help='Ollama 서버로 동시에 보낼 수 있는 최대 LLM 요청 수 (기본값: config.OLLAMA_MAX_INFLIGHT)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='--id-range 처리 시 스레드 대신 asyncio로 --workers개의 ID를 동시에 처리 (httpx 필요)')
+    parser.add_argument('--deadline', type=float, default=OLLAMA_REQUEST_DEADLINE,
+                        help='--async 모드에서 Ollama 요청 당 최대 소요 시간(초), 0이면 제한 없음 (기본값: config.OLLAMA_REQUEST_DEADLINE)')
+    parser.add_argument('--profile', action='store_true', help='실행이 끝나면 단계별 소요 시간/토큰 수/ES took/캐시 hit 요약을 출력')
+    parser.add_argument('--trace-file', default=TRACE_EXPORT_PATH or None,
+                        help='ID별 단계 trace를 한 줄씩 추가할 파일 경로 (기본값: config.TRACE_EXPORT_PATH, 비어 있으면 기록하지 않음)')
+    parser.add_argument('--trace-format', choices=TRACE_FORMATS, default=TRACE_EXPORT_FORMAT,
+                        help=f'--trace-file 형식: jsonl 또는 OpenTelemetry OTLP/JSON(otel) (기본값: {TRACE_EXPORT_FORMAT})')
+    parser.add_argument('--fast', action='store_true',
+                        help='의미 추출과 분석을 구조화 출력(format 스키마) LLM 호출 한 번으로 수행하고 검색/패치 생성은 생략\n'
+                             '(--id-range 결과는 ./result/Fast에 저장되며 전체 파이프라인 결과와 판정을 비교)')
+    parser.add_argument('--with-repair', action='store_true', help='--fast 모드에서도 취약으로 판정되면 패치를 생성')
+    parser.add_argument('--compare-to',
+                        help='--fast --id-range 실행 후 판정을 비교할 전체 파이프라인 결과 디렉터리 (기본값: ./result/RAG, --disable-rag이면 ./result/No-RAG)')
+    parser.add_argument('--no-chunking', action='store_true',
+                        help='큰 Java 파일도 메소드 단위로 나누지 않고 파일 전체를 분석 (기본값: config.CODE_CHUNKING_ENABLED)')
+    parser.add_argument('--top-units', type=int, default=CODE_CHUNKING_TOP_UNITS,
+                        help=f'큰 Java 파일에서 분석할 관련도 상위 메소드 수 (기본값: {CODE_CHUNKING_TOP_UNITS})')
+    parser.add_argument('--semantics', choices=['llm', 'codet5'], default=SEMANTICS_BACKEND,
+                        help='기능적 의미 추출 방식: LLM 호출(llm) 또는 로컬 CodeT5 요약 모델(codet5, torch/transformers 필요)\n'
+                             f'(--fast 모드에서는 사용하지 않음, 기본값: {SEMANTICS_BACKEND})')
+
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help=f'콘솔 로그 레벨. DEBUG이면 프롬프트/LLM 응답/분석 결과 전체를 출력 (기본값: {LOG_LEVEL})')
+    parser.add_argument('--log-dir', default=LOG_DIR or None,
+                        help=f'ID별 로그 파일(<DIR>/<ID>.log)을 저장할 디렉터리, 파일에는 {SAMPLE_LOG_LEVEL} 레벨 이상을 기록 (기본값: config.LOG_DIR)')
+    parser.add_argument('--prompt-archive', default=PROMPT_ARCHIVE_PATH or None,
+                        help='LLM 프롬프트/응답을 gzip 압축 JSONL로 보관할 파일 경로 (기본값: config.PROMPT_ARCHIVE_PATH, 비어 있으면 보관하지 않음)')
 
     args = parser.parse_args()
+    configure_logging(args.log_level, log_dir=args.log_dir, sample_level=SAMPLE_LOG_LEVEL,
+                      prompt_archive=args.prompt_archive)
+
+    if args.workers < 1:
+        parser.error("--workers 값은 1 이상이어야 합니다.")
+    if (args.with_repair or args.compare_to) and not args.fast:
+        parser.error("--with-repair / --compare-to 옵션은 --fast와 함께 사용해야 합니다.")
+    if args.top_units < 1:
+        parser.error("--top-units 값은 1 이상이어야 합니다.")
+    if args.deadline < 0:
+        parser.error("--deadline 값은 0 이상이어야 합니다.")
+    if args.max_inflight is not None:
+        if args.max_inflight < 1:
+            parser.error("--max-inflight 값은 1 이상이어야 합니다.")
+        get_default_transport().set_max_inflight(args.max_inflight)
 
     # VulnerabilityProcessor 객체 생성 (모드에 상관없이 공통)
-    processor = VulnerabilityProcessor(enable_rag=not args.disable_rag)
+    llm_cache = None
+    if LLM_CACHE_ENABLED and not args.no_cache:
+        try:
+            llm_cache = LLMCache(path=args.cache_path, read_only=args.cache_read_only)
+        except FileNotFoundError as e:
+            logger.warning("LLM 캐시를 사용하지 않습니다: %s", e)
+
+    trace_exporter = TraceExporter(args.trace_file, args.trace_format) if args.trace_file else None
+    profile = TraceProfile() if args.profile else None
+
+    processor = VulnerabilityProcessor(enable_rag=not args.disable_rag, llm_cache=llm_cache, retrieval_mode=args.retrieval,
+                                       backend=args.backend, chunking=CODE_CHUNKING_ENABLED and not args.no_chunking,
+                                       chunk_top_units=args.top_units, fast=args.fast, fast_repair=args.with_repair,
+                                       semantics_backend=args.semantics)
 
     # --- 실행 모드 분기 ---
     
@@ -93,64 +332,110 @@ def main():
         except ValueError as e:
             parser.error(f"잘못된 ID 범위 형식입니다. '시작-끝' 형태로 입력하세요. (예: '1-79'). 상세: {e}")
 
-        result_base_dir = "./result/RAG" if not args.disable_rag else "./result/No-RAG"
+        full_result_dir = "./result/RAG" if not args.disable_rag else "./result/No-RAG"
+        result_base_dir = "./result/Fast" if args.fast else full_result_dir
         os.makedirs(result_base_dir, exist_ok=True)
         
-        print(f"대량 분석 모드를 시작합니다. (ID: {start_id}~{end_id})")
-        print(f"결과 저장 위치: {result_base_dir}")
-        print("-" * 50)
-
-        for current_id in range(start_id, end_id + 1):
-            try:
-                print(f"\n{'='*20} ID: {current_id} 처리 시작 {'='*20}")
-                code_snippet = load_code_from_json(args.json_file, str(current_id))
-                
-                if code_snippet is None:
-                    print(f"--- ID: {current_id} 데이터를 찾을 수 없어 건너뜁니다. ---")
-                    continue
-
-                final_result = processor.run_analysis_pipeline(code_snippet)
-                
-                output_filepath = os.path.join(result_base_dir, f"{current_id}.json")
-                with open(output_filepath, 'w', encoding='utf-8') as f:
-                    json.dump(final_result, f, indent=4, ensure_ascii=False)
-                
-                print(f"--- ID: {current_id} 처리 완료 및 결과 저장 성공: {output_filepath} ---")
-
-            except Exception as e:
-                print(f"\n!!!!!! ID: {current_id} 처리 중 에러 발생. 건너뜁니다. !!!!!!")
-                print(f"에러 상세: {e}", file=sys.stderr)
-                continue
-        
-        print(f"\n{'='*20} 모든 작업이 완료되었습니다. {'='*20}")
+        logger.info("대량 분석 모드를 시작합니다. (ID: %d~%d)", start_id, end_id)
+        logger.info("결과 저장 위치: %s", result_base_dir)
+        logger.info("-" * 50)
+
+        # 데이터셋은 여기서 한 번만 파싱/인덱싱되고 이후 ID 조회는 인덱스를 사용한다
+        try:
+            get_dataset(args.json_file, persist_index=args.persist_index)
+        except Exception as e:
+            logger.error("데이터셋을 불러오는 중 에러가 발생했습니다: %s", e)
+            sys.exit(1)
+
+        # 실행 기록(manifest)을 바탕으로 이어서 처리할 ID 선택
+        manifest = RunManifest(os.path.join(result_base_dir, "manifest.jsonl"))
+        id_list = manifest.select_ids(range(start_id, end_id + 1), resume=args.resume, retry_failed=args.retry_failed)
+        if args.resume or args.retry_failed:
+            logger.info("처리 대상 ID: %d개 (전체 %d개 중)", len(id_list), end_id - start_id + 1)
+
+        if args.use_async:
+            logger.info("asyncio 동시 처리 수: %d", args.workers)
+            asyncio.run(run_batch_async(processor, args.json_file, id_list, result_base_dir, args.workers,
+                                        args.persist_index, manifest,
+                                        max_inflight=args.max_inflight or OLLAMA_MAX_INFLIGHT,
+                                        deadline=args.deadline, trace_exporter=trace_exporter, profile=profile))
+        elif args.workers == 1:
+            for current_id in id_list:
+                process_single_id(processor, args.json_file, current_id, result_base_dir, args.persist_index, manifest,
+                                  trace_exporter, profile)
+        else:
+            logger.info("동시 실행 워커 수: %d", args.workers)
+
+            # 각 ID의 로그는 처리 완료 시점에 한 덩어리로 출력된다
+            with OrderedTaskOutput() as task_output:
+                def run_task(current_id):
+                    with task_output.capture():
+                        return process_single_id(processor, args.json_file, current_id, result_base_dir, args.persist_index,
+                                                 manifest, trace_exporter, profile)
+
+                with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                    list(executor.map(run_task, id_list))
+
+        if not args.use_async:
+            _log_generation_summary(processor.rag_system.ollama_client.get_stats())
+            _log_host_summary(processor.rag_system.ollama_client.get_host_stats())
+        logger.info("실행 기록: %s (%s)", manifest.summary(), manifest.path)
+        if llm_cache is not None:
+            cache_stats = llm_cache.get_stats()
+            logger.info("LLM 캐시: hit %d / miss %d (hit rate %.1f%%, %d개 항목, %d bytes)",
+                        cache_stats['hits'], cache_stats['misses'], cache_stats['hit_rate'] * 100,
+                        cache_stats['entries'], cache_stats['total_bytes'])
+        if trace_exporter is not None:
+            logger.info("trace 기록: %s (%s)", trace_exporter.path, trace_exporter.trace_format)
+        if profile is not None:
+            logger.info("\n%s", profile.format())
+        if args.fast:
+            # 같은 데이터셋/ID 범위에 대한 전체 파이프라인 결과가 있으면 판정 일치율을 보고
+            reference_dir = args.compare_to or full_result_dir
+            if os.path.isdir(reference_dir):
+                report = compare_result_dirs(reference_dir, result_base_dir, range(start_id, end_id + 1))
+                logger.info("\n%s", format_report(report))
+            else:
+                logger.info("비교할 전체 파이프라인 결과가 없습니다: %s", reference_dir)
+        logger.info("%s 모든 작업이 완료되었습니다. %s", "="*20, "="*20)
 
     # 2. 단일 처리 모드 (JSON 파일에서)
     elif args.json_file and args.id:
         if args.code:
             parser.error("--json-file 옵션과 직접 코드 입력은 동시에 사용할 수 없습니다.")
         try:
-            code_snippet = load_code_from_json(args.json_file, args.id)
+            code_snippet = load_code_from_json(args.json_file, args.id, args.persist_index)
             if code_snippet is None:
                  raise FileNotFoundError(f"ID '{args.id}'에 해당하는 데이터를 찾을 수 없습니다.")
 
-            print(f"\n코드를 성공적으로 로드했습니다. (Source: {args.json_file}, id: {args.id})")
-            print("-" * 50)
+            logger.info("코드를 성공적으로 로드했습니다. (Source: %s, id: %s)", args.json_file, args.id)
+            logger.info("-" * 50)
             
-            final_result = processor.run_analysis_pipeline(code_snippet)
+            tracer = Tracer(attributes={"sample_id": args.id})
+            with sample_logging(args.id):
+                final_result = processor.run_analysis_pipeline(code_snippet, tracer=tracer)
+            _finish_trace(tracer, trace_exporter, profile)
 
             print("\n\n" + "="*20 + " FINAL REPORT " + "="*20)
             print(json.dumps(final_result, indent=4, ensure_ascii=False))
             print("="*54)
+            if profile is not None:
+                logger.info("\n%s", profile.format())
         except Exception as e:
-            print(f"\n프로그램 실행 중 에러가 발생했습니다: {e}", file=sys.stderr)
+            logger.error("프로그램 실행 중 에러가 발생했습니다: %s", e)
             sys.exit(1)
 
     # 3. 단일 처리 모드 (직접 코드 입력)
     elif args.code:
-        final_result = processor.run_analysis_pipeline(args.code)
+        tracer = Tracer()
+        with sample_logging("code"):
+            final_result = processor.run_analysis_pipeline(args.code, tracer=tracer)
+        _finish_trace(tracer, trace_exporter, profile)
         print("\n\n" + "="*20 + " FINAL REPORT " + "="*20)
         print(json.dumps(final_result, indent=4, ensure_ascii=False))
         print("="*54)
+        if profile is not None:
+            logger.info("\n%s", profile.format())
         
     # 4. 아무 인자도 없는 경우
     else:
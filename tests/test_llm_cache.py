@@ -0,0 +1,43 @@
+# LLMCache의 LRU 제거와 전체 크기(running total) 관리를 확인
+
+import time
+
+from llm_cache import LLMCache
+
+
+def test_put_evicts_least_recently_used_entries(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=25)
+    for key in ("a", "b", "c"):
+        cache.put(key, "x" * 10)
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["total_bytes"] == 20
+
+
+def test_replacing_a_key_updates_the_total(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=100)
+    cache.put("a", "x" * 40)
+    cache.put("a", "x" * 10)
+    cache.put("b", "x" * 60)
+    # 덮어쓴 "a"는 10바이트로 계산되므로 제거되는 항목이 없음
+    assert cache.get_stats()["evictions"] == 0
+    assert cache.get_stats()["total_bytes"] == 70
+
+
+def test_total_is_loaded_once_and_put_does_not_scan_the_table(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = LLMCache(path, max_bytes=1000)
+    first.put("a", "x" * 300)
+    first.close()
+
+    cache = LLMCache(path, max_bytes=1000)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    cache.put("b", "x" * 300)
+    assert not any("SUM(" in statement or "ORDER BY" in statement for statement in statements)
+
+    cache.put("c", "x" * 500)
+    assert cache.get("a") is None
+    assert cache.get_stats()["total_bytes"] == 800
@@ -0,0 +1,125 @@
+# 두 포트에 띄운 ollama_stub 서버로 OllamaHostPool + OllamaTransport의 장애 전환, 모델 라우팅, 헬스 복구를 확인
+
+import time
+
+import pytest
+
+from ollama_pool import OllamaHostPool, affinity_key, host_affinity
+from ollama_stub import OllamaResponder, OllamaStubServer
+from ollama_utils import OllamaClient, OllamaTransport
+
+
+class EchoResponder(OllamaResponder):
+    def __init__(self, models=None, fail=False):
+        self._models = models
+        self.fail = fail
+
+    def models(self):
+        return self._models
+
+    def generate(self, body):
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return "ok"
+
+
+def make_client(*servers, health_interval=30.0):
+    pool = OllamaHostPool([server.url for server in servers], health_interval=health_interval, failure_threshold=1)
+    return OllamaClient(OllamaTransport(pool=pool, max_retries=2, backoff_base=0.0))
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def servers():
+    first = OllamaStubServer(EchoResponder()).start()
+    second = OllamaStubServer(EchoResponder()).start()
+    yield first, second
+    for server in (first, second):
+        server.stop()
+
+
+def test_requests_are_spread_over_hosts(servers):
+    client = make_client(*servers)
+    for _ in range(10):
+        assert client.generate_completion("x") == "ok"
+    assert [server.requests.get("/api/generate", 0) for server in servers] == [5, 5]
+
+
+def test_server_error_fails_over_and_marks_host_unhealthy(servers):
+    first, second = servers
+    first.responder.fail = True
+    client = make_client(first, second)
+
+    for _ in range(6):
+        assert client.generate_completion("x") == "ok"
+
+    # 첫 5xx 이후 장애로 표시되어 더 이상 선택되지 않음 (failure_threshold=1)
+    assert first.requests["/api/generate"] == 1
+    assert second.requests["/api/generate"] == 6
+    hosts = {host["url"]: host for host in client.transport.pool.snapshot()}
+    assert hosts[first.url]["healthy"] is False
+    assert client.transport.stats.snapshot()["/api/generate"]["retries"] == 1
+
+
+def test_connection_error_fails_over(servers):
+    first, second = servers
+    client = make_client(first, second)
+    client.generate_completion("x")  # 첫 헬스 체크 (두 호스트 모두 정상)
+    first.stop()
+
+    for _ in range(4):
+        assert client.generate_completion("x") == "ok"
+    hosts = {host["url"]: host for host in client.transport.pool.snapshot()}
+    assert hosts[first.url]["healthy"] is False
+
+
+def test_model_filter_routes_to_hosts_with_the_model():
+    with OllamaStubServer(EchoResponder(models=["llama3:latest"])) as llama, \
+            OllamaStubServer(EchoResponder(models=["qwen2.5-coder:7b"])) as qwen:
+        client = make_client(llama, qwen)
+        for _ in range(4):
+            client.generate_completion("x", model="llama3")
+            client.generate_completion("x", model="qwen2.5-coder:7b")
+        assert llama.requests["/api/generate"] == 4
+        assert qwen.requests["/api/generate"] == 4
+
+
+def test_unhealthy_host_recovers_after_health_check(servers):
+    first, second = servers
+    first.responder.fail = True
+    client = make_client(first, second, health_interval=0.1)
+    pool = client.transport.pool
+
+    client.generate_completion("x")
+    client.generate_completion("x")
+    assert not {host["url"]: host for host in pool.snapshot()}[first.url]["healthy"]
+
+    first.responder.fail = False
+    time.sleep(0.15)
+    # 주기가 지난 헬스 체크는 요청 스레드가 아닌 백그라운드 스레드에서 수행됨
+    client.generate_completion("x")
+    assert wait_until(lambda: {host["url"]: host for host in pool.snapshot()}[first.url]["healthy"])
+
+    before = first.requests["/api/generate"]
+    for _ in range(4):
+        client.generate_completion("x")
+    assert first.requests["/api/generate"] > before
+
+
+def test_affinity_keeps_a_sample_on_one_host(servers):
+    client = make_client(*servers)
+    for sample in range(4):
+        with host_affinity(affinity_key(f"class Sample{sample} {{}}")):
+            counts = [server.requests.get("/api/generate", 0) for server in servers]
+            for _ in range(3):
+                client.generate_completion("x")
+            added = [server.requests.get("/api/generate", 0) - count for server, count in zip(servers, counts)]
+            assert sorted(added) == [0, 3]
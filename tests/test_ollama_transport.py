@@ -0,0 +1,236 @@
+# 로컬 가짜 Ollama 서버(와 ollama_stub)로 OllamaClient(OllamaTransport)/AsyncOllamaClient의 5xx/연결 끊김 재시도, 백오프,
+# keep-alive 연결 재사용, 통계를 확인
+
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import async_ollama_utils
+from async_ollama_utils import AsyncOllamaClient
+from ollama_stub import OllamaResponder, OllamaStubServer
+from ollama_utils import OllamaClient, OllamaTransport
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.fake.connections += 1
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._send_json(200, {})
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        fake.requests.append(self.path)
+        action = fake.failures.pop(0) if fake.failures else None
+        if action == "reset":
+            # 응답 없이 연결을 끊음 (서버 재시작, 프록시 타임아웃 등)
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if action is not None:
+            self._send_json(action, {"error": "model crashed"})
+            return
+        if self.path == "/api/embeddings":
+            self._send_json(200, {"embedding": [float(len(body.get("prompt", ""))), 1.0]})
+            return
+        # /api/generate, /api/chat: NDJSON 스트리밍
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        field = "message" if self.path == "/api/chat" else "response"
+        for piece, done in (("hel", False), ("lo", False), ("", True)):
+            message = {"done": done, field: {"role": "assistant", "content": piece} if field == "message" else piece}
+            data = (json.dumps(message) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOllama:
+    """failures: POST 요청마다 앞에서부터 하나씩 꺼내 쓰는 동작 (HTTP 상태 코드 또는 "reset")"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.requests = []
+        self.connections = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllamaHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def backoff_delays(monkeypatch):
+    """백오프 대기 시간을 실제로 기다리지 않고 기록 (full jitter의 상한값을 사용)"""
+    delays = []
+
+    async def record(self, attempt):
+        delays.append(self._backoff_delay(attempt))
+
+    monkeypatch.setattr(async_ollama_utils.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(AsyncOllamaClient, "_backoff", record)
+    return delays
+
+
+def make_client(server, **kwargs):
+    return OllamaClient(OllamaTransport(hosts=[server.url], **kwargs))
+
+
+def test_server_errors_are_retried_with_exponential_backoff(backoff_delays):
+    with FakeOllama(failures=[500, 503, 502]) as server:
+        client = make_client(server, max_retries=4, backoff_base=0.5, backoff_max=1.5)
+        assert client.generate_embedding("abc") == [3.0, 1.0]
+
+    assert server.requests == ["/api/embeddings"] * 4
+    assert backoff_delays == [0.5, 1.0, 1.5]
+    stats = client.get_stats()["/api/embeddings"]
+    assert (stats["calls"], stats["errors"], stats["retries"]) == (4, 3, 3)
+
+
+def test_connection_reset_is_retried(backoff_delays):
+    with FakeOllama(failures=["reset"]) as server:
+        client = make_client(server, max_retries=2, backoff_base=0.1)
+        assert client.generate_completion("x") == "hello"
+
+    assert server.requests == ["/api/generate"] * 2
+    assert client.get_stats()["/api/generate"]["retries"] == 1
+
+
+def test_server_error_is_returned_after_max_retries(backoff_delays):
+    with FakeOllama(failures=[500] * 5) as server:
+        client = make_client(server, max_retries=2, backoff_base=0.1)
+        with pytest.raises(Exception, match="model crashed"):
+            client.generate_embedding("x")
+
+    assert len(server.requests) == 3
+    assert len(backoff_delays) == 2
+
+
+def test_client_errors_are_not_retried(backoff_delays):
+    with FakeOllama(failures=[404]) as server:
+        client = make_client(server, max_retries=3)
+        with pytest.raises(Exception):
+            client.generate_embedding("x")
+
+    assert len(server.requests) == 1
+    assert backoff_delays == []
+
+
+def test_keep_alive_connection_is_reused():
+    with FakeOllama() as server:
+        client = make_client(server)
+        for _ in range(5):
+            client.generate_embedding("x")
+
+    assert server.connections == 1
+    stats = client.get_stats()["/api/embeddings"]
+    assert stats["calls"] == 5 and stats["bytes_sent"] > 0 and stats["bytes_received"] > 0
+
+
+def test_streaming_calls_return_the_full_text():
+    with FakeOllama() as server:
+        client = make_client(server)
+        assert client.generate_completion("x") == "hello"
+        assert client.chat([{"role": "user", "content": "x"}]) == "hello"
+
+    assert client.get_stats()["/api/chat"]["calls"] == 1
+
+
+class JSONResponder(OllamaResponder):
+    """처음 failures번의 생성 요청은 HTTP 500으로 응답"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+
+    def generate(self, body):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("out of memory")
+        return '{"ok": true}'
+
+    def embed(self, texts, model):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_streaming_json_is_retried_on_server_error(backoff_delays):
+    with OllamaStubServer(JSONResponder(failures=1)) as server:
+        client = OllamaClient(OllamaTransport(hosts=[server.url], max_retries=2, backoff_base=0.1))
+        parsed, raw, metrics = client.generate_json("x")
+
+    assert parsed == {"ok": True}
+    assert server.requests["/api/generate"] == 2
+
+
+def test_streamed_connections_are_reused():
+    with OllamaStubServer(JSONResponder()) as server:
+        client = OllamaClient(OllamaTransport(hosts=[server.url]))
+        for _ in range(5):
+            client.generate_completion("x")
+            client.generate_json("x", stop_on_json=False)
+        client.generate_embeddings(["a", "bb"])
+        client.generate_embedding("c")
+
+    # 헬스 체크(GET /api/tags)와 끝까지 읽은 스트림을 포함해 모든 요청이 하나의 연결을 사용
+    assert sum(server.requests.values()) == 12
+    assert server.connections == 1
+
+
+def test_early_stop_drops_the_connection():
+    # 조기 종료한 스트림은 연결을 닫아 Ollama가 생성을 중단하게 하며, 슬롯과 호스트는 반납됨
+    with OllamaStubServer(JSONResponder()) as server:
+        transport = OllamaTransport(hosts=[server.url], max_inflight=1)
+        client = OllamaClient(transport)
+        for _ in range(3):
+            parsed, _, metrics = client.generate_json("x", stop_on_json=True)
+            assert parsed == {"ok": True} and metrics["early_stop"]
+
+    assert server.connections == 3
+    assert transport.pool.snapshot()[0]["outstanding"] == 0
+
+
+def test_async_keep_alive_connection_is_reused():
+    async def run(url):
+        async with AsyncOllamaClient(hosts=[url]) as client:
+            for _ in range(3):
+                await client.generate_completion("x")
+                await client.generate_json("x", stop_on_json=False)
+                await client.chat([{"role": "user", "content": "x"}])
+            await client.generate_embeddings(["a", "bb"])
+
+    with OllamaStubServer(JSONResponder()) as server:
+        asyncio.run(run(server.url))
+
+    assert sum(server.requests.values()) == 10
+    assert server.connections == 1
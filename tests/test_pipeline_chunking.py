@@ -0,0 +1,111 @@
+# 큰 Java 파일의 분석 파이프라인: 의미 추출은 outline으로, 분석/수리는 검색된 CVE와 관련도가 높은 메소드 슬라이스로
+
+import asyncio
+import os
+from types import SimpleNamespace
+
+from process import VulnerabilityProcessor
+from rag import VulRAG
+
+
+RENDER_LINES = "\n".join(f"        html.append(\"<td>\" + row[{idx}] + \"</td>\");" for idx in range(20))
+
+SOURCE = f"""package demo;
+
+import java.io.*;
+
+public class ReportService {{
+    private final StringBuilder html = new StringBuilder();
+
+    public String render(String[] row) {{
+{RENDER_LINES}
+        return html.toString();
+    }}
+
+    public Object loadSnapshot(InputStream input) throws Exception {{
+        ObjectInputStream stream = new ObjectInputStream(input);
+        return stream.readObject();
+    }}
+
+    public int size() {{
+        return html.length();
+    }}
+}}
+"""
+
+CVE_CONTEXT = {
+    "vulnerability_causes": "untrusted data passed to ObjectInputStream readObject deserialization",
+    "fixing_solutions": "validate classes with an ObjectInputFilter before readObject",
+    "functional_semantics": "restores a snapshot object from a stream",
+}
+
+
+class RecordingRAG:
+    """LLM/검색 대신 단계별 입력을 기록하고 고정된 결과를 돌려주는 VulRAG 대역"""
+
+    semantics_backend = "llm"
+
+    def __init__(self):
+        self.calls = {}
+
+    async def aextract_functional_semantics(self, code):
+        self.calls["semantics"] = code
+        return {"purpose": "Builds HTML reports and loads snapshots", "behavior": ["render rows", "load snapshot"]}
+
+    async def asearch(self, query, mode):
+        return [{"_source": {"metadata": CVE_CONTEXT}}]
+
+    async def aanalyze_and_get_json(self, code, rag_context, functional_semantics):
+        self.calls["analysis"] = code
+        return {"vulnerable_sections": [{"vulnerable_lines": [3]}]}
+
+    async def arag_generate_repair_plan(self, code, analysis_result, functional_semantics):
+        self.calls["repair"] = code
+        return {"repair_operations": []}
+
+
+def run(rag):
+    processor = VulnerabilityProcessor(rag_system=rag, chunk_min_lines=10, chunk_top_units=1, patch_validation=False)
+    return asyncio.run(processor.arun_analysis_pipeline(SOURCE))
+
+
+def test_analyzed_methods_are_ranked_against_the_retrieved_cve():
+    rag = RecordingRAG()
+    result = run(rag)
+
+    # 가장 긴 render()가 아니라 검색된 CVE(역직렬화)와 관련된 메소드를 분석
+    assert "readObject" in rag.calls["analysis"]
+    assert "html.append" not in rag.calls["analysis"]
+    assert [unit["name"] for unit in result["code_slice"]["analyzed_units"]] == ["ReportService.loadSnapshot"]
+
+
+def test_semantics_are_extracted_from_the_outline():
+    rag = RecordingRAG()
+    run(rag)
+
+    assert "public String render(String[] row) {" in rag.calls["semantics"]
+    assert "html.append" not in rag.calls["semantics"]
+
+
+def test_analysis_and_repair_share_the_code_prefix():
+    rag = RecordingRAG()
+    run(rag)
+    assert rag.calls["analysis"] == rag.calls["repair"]
+
+    # 두 프롬프트는 코드와 의미 정보까지 같은 접두부로 시작하므로 서버의 KV 캐시가 재사용됨
+    semantics = {"purpose": "Loads snapshots", "behavior": ["load snapshot"]}
+    builder = SimpleNamespace(enable_rag=True)
+    analysis = VulRAG._build_analysis_prompt(builder, rag.calls["analysis"], CVE_CONTEXT, semantics)
+    repair = VulRAG._build_repair_plan_prompt(builder, rag.calls["repair"], {"vulnerable_sections": []}, semantics)
+    shared = os.path.commonprefix([analysis, repair])
+    assert rag.calls["analysis"] in shared and "Loads snapshots" in shared
+
+
+def test_sync_pipeline_runs_the_async_implementation():
+    # RecordingRAG에는 a* 메소드만 있으므로 동기 API가 같은 비동기 구현을 실행해야 통과
+    rag = RecordingRAG()
+    processor = VulnerabilityProcessor(rag_system=rag, chunk_min_lines=10, chunk_top_units=1, patch_validation=False)
+    result = processor.run_analysis_pipeline(SOURCE)
+
+    assert result["status"] == "vulnerable_and_plan_generated"
+    assert rag.calls["analysis"] == rag.calls["repair"]
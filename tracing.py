@@ -0,0 +1,251 @@
+# tracing.py (분석 파이프라인 단계별 지연 시간 / 토큰 계측)
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+TRACE_FORMATS = ("jsonl", "otel")
+
+# 현재 실행 중인 span (스레드/asyncio 태스크마다 독립적이며 asyncio.to_thread로 넘긴 작업에도 전달됨)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """하나의 단계(또는 LLM 호출/검색 요청)의 실행 시간과 속성을 기록합니다."""
+
+    def __init__(self, name: str, tracer: "Tracer", parent_id: Optional[str] = None,
+                 attributes: Dict[str, Any] = None):
+        self.name = name
+        self.tracer = tracer
+        self.trace_id = tracer.trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self.attributes[key] = value
+
+    def add(self, key: str, amount) -> None:
+        """수치 속성을 누적합니다 (한 단계에서 여러 번 호출되는 값)."""
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self) -> None:
+        if self.end_time_ns is None:
+            self.duration = time.perf_counter() - self._started
+            self.end_time_ns = self.start_time_ns + int(self.duration * 1e9)
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_ns": self.start_time_ns,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+    def to_otel(self) -> Dict[str, Any]:
+        """OTLP/JSON span 형식 (resourceSpans[].scopeSpans[].spans[]의 원소)"""
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": [{"key": key, "value": _otel_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error is not None else {"code": 1},
+        }
+        if self.parent_id:
+            record["parentSpanId"] = self.parent_id
+        return record
+
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, ensure_ascii=False, default=str)}
+
+
+class Tracer:
+    """
+    샘플(ID) 하나의 trace. span()으로 연 블록 안에서 호출되는 코드는 current_span()으로
+    자신이 속한 span에 속성(토큰 수, ES took, 캐시 hit 등)을 기록할 수 있습니다.
+    """
+
+    def __init__(self, name: str = "analysis_pipeline", attributes: Dict[str, Any] = None):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = dict(attributes or {})
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        span = Span(name, self, parent.span_id if parent is not None and parent.tracer is self else None, attributes)
+        with self._lock:
+            self.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {"trace_id": self.trace_id, "name": self.name, "attributes": self.attributes, "spans": spans}
+
+    def to_otel(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest 형식 (OTel Collector의 otlpjsonfile 수신기에서 읽을 수 있음)"""
+        with self._lock:
+            spans = [span.to_otel() for span in self.spans]
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "vul-rag"}}] +
+                         [{"key": key, "value": _otel_value(value)} for key, value in self.attributes.items()]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def child_span(name: str, **attributes):
+    """현재 span 아래에 하위 span을 엽니다. trace 밖에서 호출되면 아무것도 기록하지 않습니다 (None을 yield)."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with parent.tracer.span(name, **attributes) as span:
+        yield span
+
+
+def set_span_attribute(key: str, value: Any) -> None:
+    """현재 span이 있으면 속성을 기록합니다 (trace 밖에서 호출되면 무시)."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(key, value)
+
+
+def add_span_attribute(key: str, amount) -> None:
+    span = _current_span.get()
+    if span is not None:
+        span.add(key, amount)
+
+
+class TraceExporter:
+    """trace를 파일에 한 줄씩 추가합니다. jsonl은 Tracer.to_dict(), otel은 OTLP/JSON 형식."""
+
+    def __init__(self, path: str, trace_format: str = "jsonl"):
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"지원하지 않는 trace 형식입니다: {trace_format} (가능: {', '.join(TRACE_FORMATS)})")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.trace_format = trace_format
+        self._lock = threading.Lock()
+
+    def export(self, tracer: Tracer) -> None:
+        record = tracer.to_otel() if self.trace_format == "otel" else tracer.to_dict()
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class TraceProfile:
+    """여러 trace의 span을 이름별로 모아 --profile 요약(소요 시간 분포, 토큰 수, 캐시 hit)을 만듭니다."""
+
+    SUMMED_ATTRIBUTES = ("prompt_chars", "prompt_eval_count", "eval_count", "prompt_eval_duration_ms", "eval_duration_ms",
+                         "es_took_ms", "cache_hits", "cache_misses", "llm_calls")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self.traces = 0
+
+    def add(self, tracer: Tracer) -> None:
+        with self._lock:
+            self.traces += 1
+            for span in tracer.spans:
+                self._durations.setdefault(span.name, []).append(span.duration)
+                totals = self._totals.setdefault(span.name, {})
+                for key in self.SUMMED_ATTRIBUTES:
+                    value = span.attributes.get(key)
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        totals[key] = totals.get(key, 0) + value
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, durations in self._durations.items():
+                values = sorted(durations)
+                result[name] = {
+                    "count": len(values),
+                    "total": sum(values),
+                    "mean": sum(values) / len(values),
+                    "p50": _percentile(values, 0.5),
+                    "p90": _percentile(values, 0.9),
+                    "p95": _percentile(values, 0.95),
+                    "p99": _percentile(values, 0.99),
+                    "max": values[-1],
+                    **self._totals.get(name, {}),
+                }
+            return result
+
+    def format(self) -> str:
+        summary = self.summary()
+        if not summary:
+            return "프로파일: 기록된 span이 없습니다."
+        root_total = sum(item["total"] for name, item in summary.items() if name == "analysis_pipeline") or None
+        lines = [f"프로파일 (trace {self.traces}개)",
+                 f"{'span':<22}{'count':>7}{'total(s)':>10}{'mean':>9}{'p50':>9}{'p95':>9}{'share':>8}"
+                 f"{'prompt_chr':>12}{'prompt_tok':>12}{'compl_tok':>11}{'es_took':>9}{'cache':>10}"]
+        for name, item in sorted(summary.items(), key=lambda kv: -kv[1]["total"]):
+            share = f"{item['total'] / root_total:.0%}" if root_total else "-"
+            cache = (f"{int(item.get('cache_hits', 0))}/{int(item.get('cache_hits', 0) + item.get('cache_misses', 0))}"
+                     if "cache_hits" in item or "cache_misses" in item else "-")
+            lines.append(
+                f"{name:<22}{item['count']:>7}{item['total']:>10.2f}{item['mean']:>9.3f}{item['p50']:>9.3f}"
+                f"{item['p95']:>9.3f}{share:>8}{int(item.get('prompt_chars', 0)):>12}{int(item.get('prompt_eval_count', 0)):>12}"
+                f"{int(item.get('eval_count', 0)):>11}{int(item.get('es_took_ms', 0)):>9}{cache:>10}"
+            )
+        return "\n".join(lines)
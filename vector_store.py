@@ -0,0 +1,184 @@
+# vector_store.py (Elasticsearch 없이 동작하는 내장 검색 백엔드)
+
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+from config import EMBEDDED_INDEX_DIR, EMBEDDED_INDEX_DTYPE
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+INFO_FILE = "index_info.json"
+
+_KNN_BLOCK_ROWS = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _flatten_text(value: Any) -> str:
+    """dict/list 안의 문자열 값을 모두 이어붙입니다."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(_flatten_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_flatten_text(v) for v in value)
+    return ""
+
+
+def bm25_text(metadata: Dict[str, Any]) -> str:
+    """ES 경로와 같이 vulnerability_causes.abstract_description을 우선 사용하고, 없으면 causes 전체를 사용합니다."""
+    causes = metadata.get("vulnerability_causes", {})
+    if isinstance(causes, dict) and causes.get("abstract_description"):
+        return _flatten_text(causes["abstract_description"])
+    return _flatten_text(causes)
+
+
+class BM25Index:
+    """vulnerability_causes 텍스트에 대한 메모리 내 BM25 (포스팅 리스트 + numpy 누적)."""
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for doc_idx, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings[term]
+                docs.append(doc_idx)
+                tfs.append(tf)
+
+        self.num_docs = len(lengths)
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        avg_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        # 문서 길이 정규화 항은 질의와 무관하므로 미리 계산
+        self._length_norm = k1 * (1 - b + b * self.doc_lengths / avg_length) if avg_length else np.full(self.num_docs, k1, dtype=np.float32)
+        self.postings = {
+            term: (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+
+    def scores(self, query_text: str) -> np.ndarray:
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(tokenize(query_text)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            idf = math.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+        return scores
+
+
+def _top_k(scores: np.ndarray, size: int) -> np.ndarray:
+    size = min(size, len(scores))
+    if size <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, size - 1)[:size]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class EmbeddedKnowledgeIndex:
+    """
+    index_knowledge.py가 생성한 디렉터리(임베딩 행렬 + 문서 JSONL)를 불러와
+    ES와 같은 형태의 hit 목록({"_id", "_score", "_source"})을 반환하는 검색 백엔드.
+    임베딩 행렬은 L2 정규화된 상태로 저장되며 memory-map으로 읽습니다.
+    """
+
+    def __init__(self, index_dir: str = EMBEDDED_INDEX_DIR):
+        self.index_dir = index_dir
+        embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        if not os.path.exists(embeddings_path):
+            raise FileNotFoundError(f"내장 검색 인덱스를 찾을 수 없습니다: {index_dir} (python index_knowledge.py --backend embedded 로 생성)")
+
+        self.embeddings = np.load(embeddings_path, mmap_mode='r')
+        self.documents: List[Dict[str, Any]] = []
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.documents.append(json.loads(line))
+        if len(self.documents) != self.embeddings.shape[0]:
+            raise ValueError(f"문서 수({len(self.documents)})와 임베딩 수({self.embeddings.shape[0]})가 일치하지 않습니다.")
+
+        self.bm25 = BM25Index(bm25_text(doc["metadata"]) for doc in self.documents)
+
+    def _hits(self, indices: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        hits = []
+        for idx in indices:
+            doc = self.documents[idx]
+            hits.append({
+                "_id": doc["_id"],
+                "_score": float(scores[idx]),
+                "_source": {"content": doc["content"], "metadata": doc["metadata"]},
+            })
+        return hits
+
+    def bm25_search(self, query_text: str, size: int = 10) -> List[Dict[str, Any]]:
+        scores = self.bm25.scores(query_text)
+        indices = [idx for idx in _top_k(scores, size) if scores[idx] > 0]
+        return self._hits(indices, scores)
+
+    def knn_search(self, query_vector: List[float], size: int = 10) -> List[Dict[str, Any]]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or len(self.documents) == 0:
+            return []
+        query /= norm
+        if self.embeddings.dtype == np.float32:
+            scores = self.embeddings.dot(query)
+        else:
+            # float16은 BLAS를 쓰지 못하므로 블록 단위로 float32로 올려 계산 (메모리 사용량 제한)
+            scores = np.empty(len(self.documents), dtype=np.float32)
+            for start in range(0, len(scores), _KNN_BLOCK_ROWS):
+                block = self.embeddings[start:start + _KNN_BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32).dot(query)
+        # ES script_score와 같은 점수 범위(cosine + 1.0)를 사용
+        scores = scores + 1.0
+        return self._hits(_top_k(scores, size), scores)
+
+
+def load_existing_vectors(index_dir: str = EMBEDDED_INDEX_DIR) -> Dict[str, np.ndarray]:
+    """기존 내장 인덱스의 {문서 _id: 임베딩 행(memory-map)}을 반환합니다. 인덱스가 없으면 빈 dict."""
+    try:
+        index = EmbeddedKnowledgeIndex(index_dir)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {doc["_id"]: index.embeddings[row] for row, doc in enumerate(index.documents)}
+
+
+def build_embedded_index(documents: Iterable[Tuple[str, str, Dict[str, Any], List[float]]],
+                         index_dir: str = EMBEDDED_INDEX_DIR,
+                         dtype: str = EMBEDDED_INDEX_DTYPE) -> int:
+    """
+    (문서 id, 텍스트, 메타데이터, 임베딩) 목록으로 내장 인덱스를 생성합니다.
+    임베딩은 L2 정규화 후 dtype(float32/float16)으로 저장합니다. 저장한 문서 수를 반환합니다.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = []
+    documents_tmp = os.path.join(index_dir, DOCUMENTS_FILE + ".tmp")
+    with open(documents_tmp, 'w', encoding='utf-8') as f:
+        for doc_id, text, metadata, embedding in documents:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+            f.write(json.dumps({"_id": doc_id, "content": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+    matrix = np.vstack(vectors).astype(dtype) if vectors else np.zeros((0, 0), dtype=dtype)
+    embeddings_tmp = os.path.join(index_dir, EMBEDDINGS_FILE + ".tmp")
+    with open(embeddings_tmp, 'wb') as f:
+        np.save(f, matrix)
+
+    os.replace(embeddings_tmp, os.path.join(index_dir, EMBEDDINGS_FILE))
+    os.replace(documents_tmp, os.path.join(index_dir, DOCUMENTS_FILE))
+    with open(os.path.join(index_dir, INFO_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"count": len(vectors), "dims": int(matrix.shape[1]) if vectors else 0, "dtype": dtype}, f)
+    return len(vectors)